@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'quizzes.middleware.CompressionMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -108,7 +109,7 @@ CORS_ALLOW_HEADERS = [
 ]
 # Additional CORS settings for preflight requests
 CORS_PREFLIGHT_MAX_AGE = 86400
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'X-Catalog-Seq']
 
 # CSRF settings for cross-origin requests
 csrf_origins_str = os.getenv('CSRF_TRUSTED_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000')
@@ -193,6 +194,18 @@ MEDIA_ROOT = BASE_DIR / "media"
 # Upload limits (protect against very large files)
 # 5 MB max per file; allow small overhead for request wrapper
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
+# Bulk question imports (quizzes/importers.py) larger than this are refused
+IMPORT_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+# Responses at least this large are brotli/gzip compressed when the client
+# accepts it (see quizzes/middleware.py)
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Background jobs (quizzes/jobs.py), executed by `manage.py run_jobs`.
+# JOBS_INLINE runs each job in-process right after it is queued instead.
+JOBS_INLINE = os.getenv('JOBS_INLINE', 'False').lower() in ('true', '1', 'yes')
+JOBS_RETRY_BASE_DELAY = 2  # seconds; doubles per attempt
+JOBS_STALE_AFTER = 600  # seconds without a heartbeat before a running job is recovered
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -207,6 +220,39 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # orjson-backed JSON when installed, stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'quizzes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'quizzes.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token-bucket throttles only act on views that declare a throttle scope
+    # (see quizzes/throttling.py); rates are "<scope>_user" and "<scope>_ip".
+    'DEFAULT_THROTTLE_CLASSES': [
+        'quizzes.throttling.UserTokenBucketThrottle',
+        'quizzes.throttling.IPTokenBucketThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'comment_user': '10/min',
+        'comment_ip': '30/min',
+        'reaction_user': '60/min',
+        'reaction_ip': '120/min',
+        'answer_user': '30/min',
+        'answer_ip': '60/min',
+        'message_user': '30/min',
+        'message_ip': '60/min',
+        'share_user': '30/min',
+        'share_ip': '60/min',
+        'upload_user': '30/hour',
+        'upload_ip': '60/hour',
+        # Live joins are anonymous and CSRF-exempt; a whole class may join
+        # from behind one NAT address
+        'live_join_ip': '600/min',
+    },
 }
 
 # Session settings for cross-origin requests
@@ -215,6 +261,79 @@ SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'False').lower() in (
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 1209600  # 2 weeks
 
+# Sessions are read from the cache and written through to the database, so a
+# cache miss (restart) still finds the session. They use the "shared" cache
+# below, so a logout in one worker ends the session in all of them.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
+SESSION_CACHE_ALIAS = 'shared'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quizwizz',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Second tier of quizzes.caching.read_cache, shared by every process on
+    # the host (web workers and run_jobs). Its add() must be atomic: it is
+    # the cross-process fill lock
+    'shared': {
+        'BACKEND': 'quizzes.cache_backends.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', str(BASE_DIR / 'cache')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Resolves the session's user from the shared cache instead of the auth_user
+# table (quizzes/auth_backends.py); entries are dropped on logout, save and
+# delete. ModelBackend stays listed so sessions that were created before
+# the cached backend keep working.
+AUTHENTICATION_BACKENDS = [
+    'quizzes.auth_backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+AUTH_USER_CACHE_TTL = 300  # seconds
+
+# Two-tier read cache for the quiz list, tags, user directory and favorites
+CACHE_DEFAULT_TTL = 300  # seconds
+CACHE_LOCAL_MAX_ENTRIES = 1000  # per-process LRU size
+CACHE_VERSION_CHECK_INTERVAL = 1.0  # seconds a process trusts its namespace versions
+
+# Per-process identity cache of users, tags and quizzes (quizzes/identity.py).
+# Each process checks the IdentityVersion table this often for edits made
+# by other processes; the TTL bounds writes that bypass save(). An edit
+# invalidates only its row's bucket
+IDENTITY_CACHE_CHECK_INTERVAL = 1.0  # seconds
+IDENTITY_CACHE_TTL = 600  # seconds
+IDENTITY_CACHE_MAX_ENTRIES = 10000  # per model
+IDENTITY_CACHE_BUCKETS = 64  # per model
+
+# Answer stats (quizzes/answer_stats.py) are buffered per process and
+# written in batches of this many answers, or this many seconds after the
+# first buffered answer
+ANSWER_STATS_FLUSH_SIZE = 500
+ANSWER_STATS_FLUSH_INTERVAL = 5.0  # seconds
+
+# Catalog change feed (quizzes/changes.py): tombstones of deleted quizzes
+# and tags are kept this long; clients further behind reload the list
+CATALOG_TOMBSTONE_RETENTION_DAYS = 30
+
+# Messages older than this are moved to compressed archive runs by
+# `manage.py archive_messages` (quizzes/archive.py) and only read back
+# through /api/messages/history/?archived=1
+MESSAGE_RETENTION_DAYS = 365
+
+# Near-duplicate detection (quizzes/similarity.py): the estimated Jaccard
+# similarity of question/quiz text above which a new quiz is flagged as a
+# possible copy. Rebuild the index with `manage.py index_similarity`
+DUPLICATE_SIMILARITY_THRESHOLD = 0.7
+
+# Live sessions (quizzes/live.py) are held in memory by the ASGI process;
+# run it as a single worker or route each session code to one worker
+LIVE_MAX_PLAYERS = 1000
+LIVE_DEFAULT_TIME_LIMIT = 20  # seconds per question
+LIVE_FINISHED_TTL = 600  # seconds finished sessions stay readable
+LIVE_IDLE_TTL = 3600  # seconds an unfinished session survives without a state change
+
 # CSRF settings
 CSRF_COOKIE_SAMESITE = None
 CSRF_COOKIE_SECURE = os.getenv('CSRF_COOKIE_SECURE', 'False').lower() in ('true', '1', 'yes')
@@ -1,31 +1,198 @@
+"""Admin for the quiz tables, built to stay fast on large tables.
+
+- Change lists use ``EstimatedCountPaginator`` and skip the unfiltered
+  total, so a page never runs ``COUNT(*)`` over a whole table.
+- Foreign keys are edited through autocomplete or raw id widgets instead of
+  ``<select>``s holding every row, and list pages join the rows they show.
+- A quiz's questions are edited a page at a time; choices are edited on the
+  question's own page.
+- The comment list filters by quiz without listing every quiz.
+"""
+
+from functools import cached_property
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.forms.models import BaseInlineFormSet
+
+from .models import BackgroundJob, Choice, Comment, Gap, Question, Quiz, Tag
+
+# Below this many rows a change list shows the exact count; above it the
+# count is estimated (unfiltered) or capped (filtered)
+EXACT_COUNT_LIMIT = 10000
+QUESTIONS_PER_PAGE = 25
+
+
+def estimated_count(model, using="default"):
+    """Cheap row-count estimate for ``model``'s table, or None if unknown."""
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+        elif connection.vendor == "sqlite":
+            # Read off the end of the rowid b-tree; over-counts by deleted rows
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] and row[0] > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts at most ``EXACT_COUNT_LIMIT`` rows.
+
+    An unfiltered list past the limit reports the table estimate; a
+    filtered one stops counting at the limit, so only its first pages are
+    reachable and narrowing the filter reaches the rest.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > EXACT_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:EXACT_COUNT_LIMIT].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # The "N total" next to a filtered count is another full COUNT(*)
+    show_full_result_count = False
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Edits one page of the related rows; ``page`` is set by the inline."""
+
+    page = 1
+    per_page = QUESTIONS_PER_PAGE
+    total = 0
+
+    def get_queryset(self):
+        if not hasattr(self, "_paged_queryset"):
+            start = (self.page - 1) * self.per_page
+            self._paged_queryset = super().get_queryset()[start:start + self.per_page]
+            self._queryset = self._paged_queryset
+        return self._paged_queryset
 
-from .models import Choice, Comment, Question, Quiz, Tag
+    @property
+    def num_pages(self):
+        return max(-(-self.total // self.per_page), 1)
+
+    @property
+    def page_range(self):
+        return range(1, self.num_pages + 1)
 
 
 class ChoiceInline(admin.TabularInline):
     model = Choice
     extra = 0
+    raw_id_fields = ("gap",)
+
 
+class GapInline(admin.TabularInline):
+    model = Gap
+    extra = 0
 
-class QuestionInline(admin.StackedInline):
+
+class QuestionInline(admin.TabularInline):
     model = Question
     extra = 0
+    fields = ("order", "type", "text")
+    formset = PaginatedInlineFormSet
+    show_change_link = True
+    template = "admin/quizzes/paginated_tabular.html"
+    page_param = "questions_page"
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        try:
+            formset.page = max(int(request.GET.get(self.page_param, 1)), 1)
+        except ValueError:
+            formset.page = 1
+        # The denormalized counter saves a COUNT(*) over the quiz's questions
+        formset.total = obj.question_count if obj else 0
+        formset.page_param = self.page_param
+        return formset
 
 
 @admin.register(Quiz)
-class QuizAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "author")
+class QuizAdmin(LargeTableAdmin):
+    list_display = ("id", "name", "author", "question_count", "created_at")
+    list_select_related = ("author",)
     search_fields = ("id", "name", "author__username")
+    autocomplete_fields = ("author", "tags")
+    readonly_fields = ("question_count", "comment_count", "favorite_count", "share_count")
     inlines = [QuestionInline]
 
 
+@admin.register(Question)
+class QuestionAdmin(LargeTableAdmin):
+    list_display = ("id", "quiz", "order", "type")
+    list_select_related = ("quiz",)
+    list_filter = ("type",)
+    search_fields = ("id", "quiz__id")
+    autocomplete_fields = ("quiz",)
+    ordering = ("-pk",)
+    inlines = [GapInline, ChoiceInline]
+
+
+@admin.register(Choice)
+class ChoiceAdmin(LargeTableAdmin):
+    list_display = ("__str__", "question", "text", "is_correct")
+    list_select_related = ("question",)
+    search_fields = ("question__id",)
+    autocomplete_fields = ("question",)
+    raw_id_fields = ("gap",)
+    # The model's "index" ordering would sort the whole table
+    ordering = ("-pk",)
+
+
+class CommentQuizFilter(admin.SimpleListFilter):
+    """Filter by quiz without listing every quiz.
+
+    Offers the most-commented quizzes plus the selected one; any other quiz
+    is reached with ``?quiz=<id>``.
+    """
+
+    title = "quiz"
+    parameter_name = "quiz"
+    limit = 10
+
+    def lookups(self, request, model_admin):
+        quizzes = dict(Quiz.objects.order_by("-comment_count").values_list("id", "name")[:self.limit])
+        selected = self.value()
+        if selected and selected not in quizzes:
+            quizzes.update(Quiz.objects.filter(id=selected).values_list("id", "name"))
+        return list(quizzes.items())
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(quiz_id=self.value())
+        return queryset
+
+
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ("quiz", "user", "created_at")
-    list_filter = ("quiz", "created_at")
+    list_select_related = ("quiz", "user")
+    list_filter = (CommentQuizFilter, "created_at")
     search_fields = ("text", "user__username", "quiz__name")
+    autocomplete_fields = ("quiz", "user")
+    # Newest first by primary key, which needs no sort
+    ordering = ("-pk",)
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(LargeTableAdmin):
+    list_display = ("id", "task", "status", "priority", "attempts", "run_at", "finished_at")
+    list_filter = ("status", "task")
+    search_fields = ("task", "idempotency_key")
 
 
-admin.site.register(Tag)
-admin.site.register(Choice)
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
@@ -0,0 +1,183 @@
+"""Per-question answer statistics with write-behind counters.
+
+Play-throughs are graded when submitted and counted in a per-process
+buffer; nothing is written per answer. ``flush`` turns everything counted
+since the last flush into a few statements: one INSERT for rows that
+don't exist yet, then one UPDATE per table (per ``BATCH_SIZE`` rows) that
+adds each row's delta with a ``CASE``.
+
+- A flush runs once ``ANSWER_STATS_FLUSH_SIZE`` answers are pending, on a
+  timer ``ANSWER_STATS_FLUSH_INTERVAL`` seconds after the first pending
+  answer, and when the process exits.
+- Every process has its own buffer; their deltas add up in the table.
+- Counts still buffered in a process that dies are lost. The numbers are
+  advisory, so that is preferred over a write per answer.
+"""
+
+import atexit
+import logging
+import operator
+import threading
+from collections import Counter
+from functools import reduce
+
+from django.conf import settings
+from django.db import connections, models, transaction
+
+from .models import Choice, OptionStat, Question, QuestionStat
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = getattr(settings, "ANSWER_STATS_FLUSH_SIZE", 500)
+FLUSH_INTERVAL = getattr(settings, "ANSWER_STATS_FLUSH_INTERVAL", 5.0)
+# Rows per UPDATE; keeps the CASE and its parameters well under SQLite's limits
+BATCH_SIZE = 200
+
+
+def answer_key(quiz_id, question_ids):
+    """``{question_id: [(index, is_correct, gap_id), ...]}`` for grading."""
+    key = {}
+    rows = Choice.objects.filter(question__quiz_id=quiz_id, question_id__in=question_ids).values_list(
+        "question_id", "index", "is_correct", "gap_id"
+    )
+    for question_id, index, is_correct, gap_id in rows:
+        key.setdefault(question_id, []).append((index, is_correct, gap_id))
+    return key
+
+
+def known_selection(options, selected):
+    """``(indices, all_known)`` for a submitted selection.
+
+    ``indices`` keeps each option of the question at most once, in the order
+    picked, so it never holds more than ``len(options)`` entries; indices
+    that aren't options of the question are dropped and make ``all_known``
+    false. Only ``indices`` may reach the stats tables.
+    """
+    known = {index for index, _, _ in options}
+    indices = list(dict.fromkeys(index for index in selected if index in known))
+    return indices[:len(options)], len(indices) == len(set(selected))
+
+
+def grade(options, selected):
+    """Whether ``selected`` option indices answer the question correctly.
+
+    Multiple choice needs exactly the correct set; a gap question needs one
+    correct option picked in every gap.
+    """
+    chosen = set(selected)
+    correct = {index for index, is_correct, _ in options if is_correct}
+    gap_of = {index: gap for index, _, gap in options}
+    gaps = {gap for gap in gap_of.values() if gap is not None}
+    if not gaps:
+        return chosen == correct
+    return chosen <= correct and sorted(gap_of[index] for index in chosen) == sorted(gaps)
+
+
+class AnswerStatsBuffer:
+    def __init__(self, flush_size=FLUSH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._timer = None
+        self._reset()
+
+    def _reset(self):
+        self._questions = {}  # question_id -> [quiz_id, answers, correct]
+        self._options = Counter()  # (quiz_id, question_id, index) -> selections
+        self._pending = 0
+
+    def record(self, quiz_id, question_id, selected, correct):
+        with self._lock:
+            entry = self._questions.setdefault(question_id, [quiz_id, 0, 0])
+            entry[1] += 1
+            entry[2] += int(correct)
+            for index in set(selected):
+                self._options[(quiz_id, question_id, index)] += 1
+            self._pending += 1
+            full = self._pending >= self.flush_size
+            if not full and self._timer is None and self.flush_interval:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def flush(self):
+        """Write the buffered counts; returns the number of answers flushed."""
+        with self._lock:
+            questions, options, pending = self._questions, self._options, self._pending
+            self._reset()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not questions:
+            return 0
+        try:
+            _write(questions, options)
+        except Exception:
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for question_id, (quiz_id, answers, correct) in questions.items():
+                    entry = self._questions.setdefault(question_id, [quiz_id, 0, 0])
+                    entry[1] += answers
+                    entry[2] += correct
+                self._options.update(options)
+                self._pending += pending
+            raise
+        return pending
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing answer stats failed")
+        finally:
+            # This thread opened its own connection; don't leak it
+            connections.close_all()
+
+
+def _batches(items):
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+def _add(field, rows):
+    """``field + CASE WHEN <row> THEN <delta> ... ELSE 0 END``."""
+    whens = [models.When(lookup, then=models.Value(delta)) for lookup, delta in rows]
+    return models.F(field) + models.Case(*whens, default=models.Value(0))
+
+
+def _write(questions, options):
+    # Questions deleted since their answers were counted would fail the FK
+    live = set(Question.objects.filter(pk__in=questions).values_list("pk", flat=True))
+    question_rows = [(pk, entry) for pk, entry in questions.items() if pk in live]
+    option_rows = [(key, n) for key, n in options.items() if key[1] in live]
+
+    with transaction.atomic():
+        QuestionStat.objects.bulk_create(
+            [QuestionStat(question_id=pk, quiz_id=quiz_id) for pk, (quiz_id, _, _) in question_rows],
+            ignore_conflicts=True,
+        )
+        for batch in _batches(question_rows):
+            QuestionStat.objects.filter(question_id__in=[pk for pk, _ in batch]).update(
+                answers=_add("answers", [(models.Q(question_id=pk), answers) for pk, (_, answers, _) in batch]),
+                correct=_add("correct", [(models.Q(question_id=pk), correct) for pk, (_, _, correct) in batch]),
+            )
+
+        OptionStat.objects.bulk_create(
+            [OptionStat(quiz_id=quiz_id, question_id=pk, index=index) for (quiz_id, pk, index), _ in option_rows],
+            ignore_conflicts=True,
+        )
+        for batch in _batches(option_rows):
+            lookups = [(models.Q(question_id=pk, index=index), n) for (_, pk, index), n in batch]
+            OptionStat.objects.filter(reduce(operator.or_, (lookup for lookup, _ in lookups))).update(
+                selections=_add("selections", lookups),
+            )
+
+
+answer_stats = AnswerStatsBuffer()
+atexit.register(answer_stats.flush)
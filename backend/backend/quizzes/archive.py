@@ -0,0 +1,200 @@
+"""Message retention: move old conversation history into compressed runs.
+
+``manage.py archive_messages`` moves messages older than
+``MESSAGE_RETENTION_DAYS`` out of ``Message`` into ``MessageArchive``
+rows, so the inbox, unread and conversation queries only ever touch recent
+messages.
+
+- Each batch is one transaction that archives up to ``batch_size`` of one
+  conversation's oldest messages as a single zlib-compressed JSON run and
+  deletes them from ``Message``.
+- A conversation is archived strictly from its lowest id up, so its
+  archived ids are always below its live ones and ``history`` can page
+  through the live rows first and the archive after them.
+- ``history`` only decompresses archive runs when the caller asks for
+  archived messages and the live rows are exhausted.
+- ``archived_partners`` lists the partners whose whole conversation is
+  archived, so the inbox can still lead to that history.
+"""
+
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from .models import Message, MessageArchive
+
+RETENTION = timedelta(days=getattr(settings, "MESSAGE_RETENTION_DAYS", 365))
+BATCH_SIZE = 500
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+_timestamp = serializers.DateTimeField()
+
+
+def _pair_filter(user_id, other_id):
+    return models.Q(sender_id=user_id, recipient_id=other_id) | models.Q(sender_id=other_id, recipient_id=user_id)
+
+
+def archive_batch(cutoff, batch_size=BATCH_SIZE):
+    """Archive one run of the conversation holding the oldest expired
+    message; returns how many messages moved (0 when nothing is left)."""
+    with transaction.atomic():
+        oldest = (
+            Message.objects.filter(created_at__lt=cutoff)
+            .order_by("id")
+            .values("sender_id", "recipient_id")
+            .first()
+        )
+        if oldest is None:
+            return 0
+        low, high = sorted((oldest["sender_id"], oldest["recipient_id"]))
+        rows = list(
+            Message.objects.filter(_pair_filter(low, high))
+            .order_by("id")
+            .values_list("id", "sender_id", "content", "created_at", "is_read")[:batch_size]
+        )
+        # Cut after the last expired row, so the archived ids stay a prefix
+        # of the conversation even if timestamps and ids disagree slightly
+        expired = [n for n, row in enumerate(rows) if row[3] < cutoff]
+        if not expired:
+            return 0
+        rows = rows[:expired[-1] + 1]
+        MessageArchive.objects.create(
+            user_low_id=low,
+            user_high_id=high,
+            first_id=rows[0][0],
+            last_id=rows[-1][0],
+            first_at=rows[0][3],
+            last_at=rows[-1][3],
+            count=len(rows),
+            data=zlib.compress(json.dumps(
+                [[pk, sender, content, created.isoformat(), is_read] for pk, sender, content, created, is_read in rows],
+                separators=(",", ":"),
+            ).encode()),
+        )
+        Message.objects.filter(id__in=[row[0] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_expired(retention=RETENTION, batch_size=BATCH_SIZE):
+    """Archive everything older than ``retention``; ``(messages, runs)``."""
+    cutoff = timezone.now() - retention
+    moved = runs = 0
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            return moved, runs
+        moved += count
+        runs += 1
+
+
+def _unpack(run, users):
+    """A run's messages as ``MessageSerializer``-shaped dicts, oldest first."""
+    low, high = users[run.user_low_id], users[run.user_high_id]
+    messages = []
+    for pk, sender_id, content, created_at, is_read in json.loads(zlib.decompress(run.data)):
+        sender, recipient = (low, high) if sender_id == low["id"] else (high, low)
+        messages.append({
+            "id": pk,
+            "sender": sender,
+            "recipient": recipient,
+            "content": content,
+            "created_at": _timestamp.to_representation(parse_datetime(created_at)),
+            "is_read": is_read,
+            "archived": True,
+        })
+    return messages
+
+
+def history(user, other_id, before_id=None, limit=PAGE_SIZE, include_archived=False):
+    """One page of the conversation, newest first, before ``before_id``.
+
+    Returns ``(messages oldest first, next before_id or None, archived)``;
+    ``archived`` says older messages are in the archive but were not read
+    because ``include_archived`` was off.
+    """
+    from .serializers import MessageSerializer
+
+    live = Message.objects.filter(_pair_filter(user.id, other_id))
+    if before_id is not None:
+        live = live.filter(id__lt=before_id)
+    rows = list(live.select_related("sender", "recipient").order_by("-id")[:limit + 1])
+    page = MessageSerializer(rows[:limit], many=True).data
+    if len(rows) > limit:
+        return page[::-1], page[-1]["id"], False
+
+    low, high = sorted((user.id, int(other_id)))
+    runs = MessageArchive.objects.filter(user_low_id=low, user_high_id=high)
+    if before_id is not None:
+        runs = runs.filter(first_id__lt=before_id)
+    if not include_archived:
+        return page[::-1], None, runs.exists()
+
+    users = {u["id"]: u for u in User.objects.filter(id__in=(low, high)).values("id", "username")}
+    older = []
+    cursor = page[-1]["id"] if page else before_id
+    # Newest run first; decompress only as many as the page needs
+    for run in runs.order_by("-last_id").iterator(chunk_size=4):
+        older.extend(m for m in reversed(_unpack(run, users)) if cursor is None or m["id"] < cursor)
+        if len(page) + len(older) > limit:
+            break
+    page = [*page, *older]
+    more = len(page) > limit
+    page = page[:limit]
+    return page[::-1], page[-1]["id"] if more else None, False
+
+
+def archived_partners(user, limit):
+    """Up to ``limit`` partners of ``user`` with no live messages left,
+    most recently archived message first, as ``conversations`` entries.
+
+    The preview comes from the newest run; archived messages are not
+    counted as unread.
+    """
+    live = Message.objects.filter(
+        models.Q(sender_id=user.id, recipient_id=models.OuterRef("partner_id"))
+        | models.Q(sender_id=models.OuterRef("partner_id"), recipient_id=user.id)
+    )
+    partners = list(
+        MessageArchive.objects.filter(models.Q(user_low_id=user.id) | models.Q(user_high_id=user.id))
+        .annotate(partner_id=models.Case(
+            models.When(user_low_id=user.id, then=models.F("user_high_id")),
+            default=models.F("user_low_id"),
+        ))
+        .filter(~models.Exists(live))
+        .values("partner_id")
+        .annotate(last_id=models.Max("last_id"))
+        .order_by("-last_id")[:limit]
+    )
+    newest_runs = models.Q(pk__in=[])
+    for row in partners:
+        low, high = sorted((user.id, row["partner_id"]))
+        newest_runs |= models.Q(user_low_id=low, user_high_id=high, last_id=row["last_id"])
+    latest = {
+        last_id: json.loads(zlib.decompress(data))[-1]
+        for last_id, data in MessageArchive.objects.filter(newest_runs).values_list("last_id", "data")
+    }
+    names = dict(User.objects.filter(id__in=[row["partner_id"] for row in partners]).values_list("id", "username"))
+
+    entries = []
+    for row in partners:
+        pk, sender_id, content, created_at, _ = latest[row["last_id"]]
+        entries.append({
+            "user": {"id": row["partner_id"], "username": names.get(row["partner_id"])},
+            "last_message": {
+                "id": pk,
+                "sender_id": sender_id,
+                "content": content,
+                "created_at": parse_datetime(created_at),
+            },
+            "unread_count": 0,
+            "archived": True,
+        })
+    return entries
@@ -0,0 +1,104 @@
+"""Async versions of the hot read endpoints.
+
+These are plain Django async views (DRF viewsets are sync-only) served by
+``backend.asgi``. Each view loads everything it needs through the async ORM
+up front, so the DRF serializers that build the payload run on in-memory
+objects and never issue a query from the event loop.
+"""
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import ValidationError
+
+from .models import Message, Quiz, QuizShare
+from .renderers import FastJSONRenderer
+from .serializers import MessageSerializer, QuizListSerializer, QuizSerializer, QuizShareSerializer, UserSerializer
+from .views import filter_since
+
+
+def _json(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+async def _resolve_user(request, fallback_param):
+    """Session user, or the demo ``?<fallback_param>=`` user like the sync views."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return user
+    fallback_id = request.GET.get(fallback_param)
+    if fallback_id:
+        return await User.objects.filter(id=fallback_id).afirst()
+    return None
+
+
+@require_GET
+async def quiz_list(request):
+    quizzes = (
+        Quiz.objects.select_related("author")
+        .prefetch_related("tags")
+        .order_by("name")
+    )
+    rows = [quiz async for quiz in quizzes]
+    return _json(QuizListSerializer(rows, many=True).data)
+
+
+@require_GET
+async def quiz_detail(request, id):
+    quiz = await (
+        Quiz.objects.select_related("author")
+        .prefetch_related("tags", "questions__options", "questions__gaps")
+        .filter(id=id)
+        .afirst()
+    )
+    if quiz is None:
+        return _json({"detail": "Not found."}, status=404)
+    return _json(QuizSerializer(quiz).data)
+
+
+@require_GET
+async def conversation(request):
+    other_user_id = request.GET.get("user_id")
+    if not other_user_id:
+        return _json({"detail": "user_id parameter required"}, status=400)
+
+    user = await _resolve_user(request, "sender_id")
+    if user is None:
+        return _json({"detail": "Authentication required"}, status=401)
+
+    messages = Message.objects.filter(
+        models.Q(sender=user, recipient_id=other_user_id) |
+        models.Q(sender_id=other_user_id, recipient=user)
+    )
+    try:
+        messages = filter_since(messages, request.GET)
+    except ValidationError as exc:
+        return _json(exc.detail, status=400)
+    messages = messages.select_related("sender", "recipient").order_by("created_at")
+    rows = [message async for message in messages]
+    return _json(MessageSerializer(rows, many=True).data)
+
+
+@require_GET
+async def shares_received(request):
+    user = await _resolve_user(request, "user_id")
+    if user is None:
+        return _json({"shares": []})
+
+    shares = (
+        QuizShare.objects.filter(recipient=user)
+        .select_related("sender", "recipient", "quiz", "quiz__author")
+        .prefetch_related("quiz__tags")
+        .order_by("-created_at")
+    )
+    rows = [share async for share in shares]
+    return _json(QuizShareSerializer(rows, many=True).data)
+
+
+@require_GET
+async def current_user(request):
+    user = await request.auser()
+    if user.is_authenticated:
+        return _json({"user": UserSerializer(user).data})
+    return _json({"user": None})
@@ -0,0 +1,78 @@
+"""Authentication backend with a cached ``get_user``.
+
+``django.contrib.auth`` calls ``get_user`` on every request that carries a
+session, which costs one ``auth_user`` query per call. The user row is kept
+in the ``shared`` cache instead, keyed by user id so every session of the
+same user shares one entry.
+
+The shared tier is a directory on disk, so the password hash is never
+written to it. The entry holds the other columns plus the session auth
+hash (an HMAC of the password hash, which the session already stores)
+that ``django.contrib.auth`` compares on each request; the rebuilt user
+has ``password`` deferred and loads it only if something reads it. ``signals.py`` drops the entry on logout and
+whenever the user is saved (which covers password changes) or deleted.
+The shared tier is seen by every worker, so a deactivation or password
+change applies to all of them at once. The TTL bounds staleness from
+writes that bypass ``save()``, such as ``QuerySet.update``.
+
+``ModelBackend`` stays listed after this backend so that sessions created
+before it keep resolving. It would only repeat the same password check,
+so a failed check ends authentication here.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import PermissionDenied
+
+USER_CACHE_TTL = getattr(settings, "AUTH_USER_CACHE_TTL", 300)
+CACHE_ALIAS = "shared"
+
+
+def user_cache_key(user_id):
+    return f"auth:user:v2:{user_id}"
+
+
+def forget_user(user_id):
+    caches[CACHE_ALIAS].delete(user_cache_key(user_id))
+
+
+def _cached_fields():
+    return [field.attname for field in User._meta.concrete_fields if field.attname != "password"]
+
+
+def _to_entry(user):
+    return {
+        "fields": {name: getattr(user, name) for name in _cached_fields()},
+        "session_auth_hash": user.get_session_auth_hash(),
+    }
+
+
+def _from_entry(entry):
+    fields = entry["fields"]
+    user = User.from_db("default", list(fields), list(fields.values()))
+    session_auth_hash = entry["session_auth_hash"]
+    user.get_session_auth_hash = lambda: session_auth_hash
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username=username, password=password, **kwargs)
+        if user is None and password is not None:
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        cache = caches[CACHE_ALIAS]
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, _to_entry(user), USER_CACHE_TTL)
+        else:
+            user = _from_entry(entry)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,81 @@
+"""File-based cache backend with an atomic ``add``.
+
+Django's ``FileBasedCache.add`` checks for the key and then writes it, so
+two processes can both "add" the same key. ``read_cache`` uses ``add`` on
+the shared tier as its cross-process fill lock, which needs exactly one
+winner. Here the entry is written to a temporary file and hard-linked into
+place; ``os.link`` fails if the target exists, so only one process can
+create a given key.
+
+A live entry is only ever read, never moved, so it can't briefly vanish
+and let a third process in. An expired one is renamed aside before it is
+removed, so two processes replacing the same dead lock can't delete each
+other's fresh one.
+"""
+
+import os
+import pickle
+import tempfile
+import time
+import uuid
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache as BaseFileBasedCache
+
+
+class FileBasedCache(BaseFileBasedCache):
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, "wb") as f:
+                self._write_content(f, timeout, value)
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    if not self._remove_if_expired(fname):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _remove_if_expired(self, fname):
+        """Remove ``fname`` if it has expired; False if a live entry is there."""
+        try:
+            with open(fname, "rb") as f:
+                if not self._has_expired(f):
+                    return False
+        except FileNotFoundError:
+            return True
+        aside = f"{fname}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(fname, aside)
+        except FileNotFoundError:
+            return True
+        try:
+            with open(aside, "rb") as f:
+                if self._has_expired(f):
+                    return True
+            # Replaced since the check above: put it back unless it was
+            # replaced again
+            try:
+                os.link(aside, fname)
+            except FileExistsError:
+                pass
+            return False
+        finally:
+            if os.path.exists(aside):
+                os.remove(aside)
+
+    @staticmethod
+    def _has_expired(f):
+        # Unlike ``_is_expired`` this never deletes the file it reads
+        try:
+            expiry = pickle.load(f)
+        except EOFError:
+            expiry = 0  # an empty file counts as expired, as in Django
+        return expiry is not None and expiry < time.time()
@@ -0,0 +1,230 @@
+"""Two-tier cache for hot read endpoints.
+
+Reads go to a per-process LRU first, then to the ``shared`` cache alias (a
+filesystem cache by default, so every worker on the host sees the same
+entries), and only then to the database.
+
+- Keys are versioned per namespace (``quizzes``, ``tags``, ``users``,
+  ``favorites:<user_id>``). ``invalidate`` writes a fresh random version
+  to the shared tier, which orphans every entry built under any earlier
+  version in both tiers; the signal handlers in ``signals.py`` call it on
+  model save and delete. Versions are never incremented, so two
+  concurrent invalidations can't both land on the same new version.
+- Each process re-reads a namespace version at most every
+  ``CACHE_VERSION_CHECK_INTERVAL`` seconds, which bounds how long another
+  process can serve a local entry after an invalidation.
+- A miss is computed once: threads in a process serialize on a striped
+  lock, and processes on a lock key added to the shared tier. This needs
+  an atomic ``add``, which the stock file-based backend lacks; use
+  ``quizzes.cache_backends.FileBasedCache`` or Redis. Waiters poll for
+  the winner's value.
+- ``stats`` reports per-namespace hit rates for this process.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULT_TTL = getattr(settings, "CACHE_DEFAULT_TTL", 300)
+LOCAL_MAX_ENTRIES = getattr(settings, "CACHE_LOCAL_MAX_ENTRIES", 1000)
+VERSION_CHECK_INTERVAL = getattr(settings, "CACHE_VERSION_CHECK_INTERVAL", 1.0)
+LOCK_TIMEOUT = 10
+LOCK_STRIPES = 64
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """Thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    def __init__(self, alias="shared", max_entries=LOCAL_MAX_ENTRIES):
+        self.alias = alias
+        self.local = LocalLRU(max_entries)
+        self._versions = {}
+        self._versions_lock = threading.Lock()
+        # Re-entrant so a producer can read another key on the same stripe
+        self._stripes = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        self._stats = defaultdict(lambda: defaultdict(int))
+        self._stats_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    # Versions
+
+    def _version_key(self, namespace):
+        return f"cachever:{namespace}"
+
+    def version(self, namespace):
+        now = time.monotonic()
+        cached = self._versions.get(namespace)
+        if cached is not None and now - cached[1] < VERSION_CHECK_INTERVAL:
+            return cached[0]
+        key = self._version_key(namespace)
+        version = self.shared.get(key)
+        if version is None:
+            # Random, so a wiped shared tier can't reissue a version that
+            # old local entries were stored under
+            self.shared.add(key, uuid.uuid4().hex, None)
+            version = self.shared.get(key)
+        with self._versions_lock:
+            self._versions[namespace] = (version, now)
+        return version
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            version = uuid.uuid4().hex
+            self.shared.set(self._version_key(namespace), version, None)
+            with self._versions_lock:
+                self._versions[namespace] = (version, time.monotonic())
+
+    def invalidate_on_commit(self, *namespaces):
+        """Invalidate once the current transaction commits, so a concurrent
+        read can't re-cache the rows that are about to change."""
+        transaction.on_commit(lambda: self.invalidate(*namespaces))
+
+    def make_key(self, namespaces, key):
+        versions = ":".join(f"{ns}.{self.version(ns)}" for ns in namespaces)
+        return f"{versions}:{key}"
+
+    # Reads
+
+    def _count(self, namespace, outcome):
+        with self._stats_lock:
+            self._stats[namespace][outcome] += 1
+
+    def _lookup(self, full_key, ttl):
+        value = self.local.get(full_key)
+        if value is not _MISSING:
+            return value, "local_hits"
+        value = self.shared.get(full_key, _MISSING)
+        if value is not _MISSING:
+            self.local.set(full_key, value, ttl)
+            return value, "shared_hits"
+        return _MISSING, None
+
+    def get_or_set(self, namespaces, key, producer, ttl=DEFAULT_TTL):
+        """Return the cached value for ``key`` or store ``producer()``.
+
+        ``namespaces`` lists every namespace the value depends on; bumping
+        any of them invalidates it. The first namespace is the stats bucket.
+        """
+        if isinstance(namespaces, str):
+            namespaces = (namespaces,)
+        label = namespaces[0].split(":", 1)[0]
+        full_key = self.make_key(namespaces, key)
+
+        value, outcome = self._lookup(full_key, ttl)
+        if value is not _MISSING:
+            self._count(label, outcome)
+            return value
+
+        with self._stripes[hash(full_key) % LOCK_STRIPES]:
+            # Another thread may have filled it while we waited
+            value, outcome = self._lookup(full_key, ttl)
+            if value is not _MISSING:
+                self._count(label, "coalesced")
+                return value
+
+            lock_key = f"lock:{full_key}"
+            token = uuid.uuid4().hex
+            if not self.shared.add(lock_key, token, LOCK_TIMEOUT):
+                value = self._wait_for(full_key, ttl)
+                if value is not _MISSING:
+                    self._count(label, "coalesced")
+                    return value
+                # The holder died or is too slow; compute it ourselves
+            try:
+                value = producer()
+                self.shared.set(full_key, value, ttl)
+                self.local.set(full_key, value, ttl)
+                self._count(label, "misses")
+            finally:
+                if self.shared.get(lock_key) == token:
+                    self.shared.delete(lock_key)
+        return value
+
+    def _wait_for(self, full_key, ttl):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            value = self.shared.get(full_key, _MISSING)
+            if value is not _MISSING:
+                self.local.set(full_key, value, ttl)
+                return value
+            if self.shared.get(f"lock:{full_key}") is None:
+                return _MISSING
+            delay = min(delay * 2, 0.2)
+        return _MISSING
+
+    def clear(self):
+        """Empty both tiers and forget known versions."""
+        self.local.clear()
+        with self._versions_lock:
+            self._versions.clear()
+        self.shared.clear()
+
+    # Stats
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = {ns: dict(counts) for ns, counts in self._stats.items()}
+        report = {}
+        for namespace, counts in sorted(snapshot.items()):
+            hits = counts.get("local_hits", 0) + counts.get("shared_hits", 0) + counts.get("coalesced", 0)
+            total = hits + counts.get("misses", 0)
+            report[namespace] = {
+                "local_hits": counts.get("local_hits", 0),
+                "shared_hits": counts.get("shared_hits", 0),
+                "coalesced": counts.get("coalesced", 0),
+                "misses": counts.get("misses", 0),
+                "hit_rate": round(hits / total, 3) if total else None,
+            }
+        return {"local_entries": len(self.local), "namespaces": report}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+
+read_cache = TwoTierCache()
@@ -0,0 +1,108 @@
+"""Catalog change feed for incremental client sync.
+
+Every quiz and tag change takes the next sequence number in
+``CatalogChange``, one row per object, so a client that remembers the
+highest ``seq`` it has applied can ask for everything after it instead of
+re-downloading the quiz list.
+
+- The signal handlers in ``signals.py`` record saves, deletes and tag
+  changes; ``counters.bump`` records the card counters (question count,
+  likes, dislikes) it updates in place.
+- Changes are recorded inside the writing transaction. SQLite runs one
+  write transaction at a time, so sequence numbers become visible in order.
+- Deletes leave a tombstone. ``compact`` drops tombstones older than
+  ``CATALOG_TOMBSTONE_RETENTION_DAYS`` and records the highest sequence it
+  removed; a client asking from before that horizon is told to reload.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import CatalogChange, CatalogCompaction, Quiz, Tag
+
+TOMBSTONE_RETENTION = timedelta(days=getattr(settings, "CATALOG_TOMBSTONE_RETENTION_DAYS", 30))
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 1000
+
+
+def record(kind, object_ids, deleted=False):
+    """Give each of ``object_ids`` a new sequence number."""
+    object_ids = {str(pk) for pk in object_ids}
+    if not object_ids:
+        return
+    # Joins the caller's transaction when there is one; no savepoint needed
+    with transaction.atomic(savepoint=False):
+        CatalogChange.objects.filter(kind=kind, object_id__in=object_ids).delete()
+        CatalogChange.objects.bulk_create(
+            [CatalogChange(kind=kind, object_id=pk, deleted=deleted) for pk in sorted(object_ids)]
+        )
+    if deleted:
+        # At most one compaction a day, and only once something was deleted
+        enqueue(
+            "quizzes.compact_catalog_changes",
+            idempotency_key=f"compact-catalog:{timezone.now().date().isoformat()}",
+        )
+
+
+def latest():
+    """Highest sequence number handed out so far (0 when none)."""
+    # The newest row may have been a tombstone that compaction removed
+    return max(CatalogChange.objects.aggregate(seq=models.Max("seq"))["seq"] or 0, horizon())
+
+
+def horizon():
+    return CatalogCompaction.objects.aggregate(seq=models.Max("horizon"))["seq"] or 0
+
+
+def feed(since, limit=PAGE_SIZE):
+    """Changes after ``since``, oldest first, as list-serializer payloads.
+
+    ``seq`` is the position to ask from next; ``more`` says whether another
+    page is waiting. With ``reset`` the client has to reload the list.
+    """
+    from .serializers import QuizListSerializer, prime_cards
+
+    if since < horizon():
+        return {"reset": True, "seq": latest(), "more": False}
+
+    rows = list(CatalogChange.objects.filter(seq__gt=since).order_by("seq")[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    changed, deleted = {}, {}
+    for row in rows:
+        (deleted if row.deleted else changed).setdefault(row.kind, []).append(row.object_id)
+
+    quizzes, tags = [], []
+    if changed.get(CatalogChange.QUIZ):
+        quizzes = QuizListSerializer(
+            prime_cards(Quiz.objects.filter(pk__in=changed[CatalogChange.QUIZ]).order_by("name")),
+            many=True,
+        ).data
+    if changed.get(CatalogChange.TAG):
+        tags = list(Tag.objects.filter(pk__in=changed[CatalogChange.TAG]).order_by("name").values("id", "name"))
+    return {
+        "reset": False,
+        "seq": rows[-1].seq if rows else since,
+        "more": more,
+        "quizzes": quizzes,
+        "deleted_quizzes": deleted.get(CatalogChange.QUIZ, []),
+        "tags": tags,
+        "deleted_tags": [int(pk) for pk in deleted.get(CatalogChange.TAG, [])],
+    }
+
+
+def compact(retention=TOMBSTONE_RETENTION):
+    """Drop tombstones older than ``retention``; returns how many went."""
+    cutoff = timezone.now() - retention
+    with transaction.atomic():
+        expired = CatalogChange.objects.filter(deleted=True, changed_at__lt=cutoff)
+        newest = expired.aggregate(seq=models.Max("seq"))["seq"]
+        if newest is None:
+            return 0
+        removed, _ = expired.filter(seq__lte=newest).delete()
+        CatalogCompaction.objects.create(horizon=newest, removed=removed)
+    return removed
@@ -0,0 +1,105 @@
+"""Denormalized per-quiz counters.
+
+``Quiz.question_count``, ``comment_count``, ``favorite_count``,
+``share_count``, ``likes`` and ``dislikes`` are adjusted in place with
+``F()`` expressions on each write path, so list pages read them straight
+off the quiz row. ``recount`` rebuilds the counts that have related tables
+in a single UPDATE; it backs the ``repair_counters`` command and the
+user-deletion cascade, where the rows being removed are spread over many
+quizzes.
+"""
+
+from django.db import models
+from django.db.models.functions import Coalesce, Greatest
+
+from . import changes
+from .caching import read_cache
+from .models import CatalogChange, Comment, Favorite, Question, Quiz, QuizShare
+
+COUNTERS = {
+    "question_count": Question,
+    "comment_count": Comment,
+    "favorite_count": Favorite,
+    "share_count": QuizShare,
+}
+
+
+# Counters shown on quiz cards, which the catalog change feed carries
+CARD_FIELDS = {"question_count", "likes", "dislikes"}
+
+
+def bump(quiz_id, **deltas):
+    """Add ``deltas`` (``comment_count=1``, ``likes=-1`` etc.) to one
+    quiz's counters; returns the number of quizzes updated (0 or 1)."""
+    updates = {}
+    for field, delta in deltas.items():
+        if delta > 0:
+            updates[field] = models.F(field) + delta
+        elif delta < 0:
+            updates[field] = Greatest(models.F(field) + delta, 0)
+    if not updates:
+        return 0
+    updated = Quiz.objects.filter(pk=quiz_id).update(**updates)
+    if updated:
+        # QuerySet.update sends no signals; quiz cards show these counts
+        read_cache.invalidate_on_commit("quizzes")
+        if CARD_FIELDS & updates.keys():
+            changes.record(CatalogChange.QUIZ, [quiz_id])
+    return updated
+
+
+def actual(field):
+    """Correlated COUNT(*) of the rows behind ``field`` for the outer quiz."""
+    rows = (
+        COUNTERS[field].objects.filter(quiz=models.OuterRef("pk"))
+        .order_by()
+        .values("quiz")
+        .annotate(n=models.Count("pk"))
+        .values("n")
+    )
+    return Coalesce(models.Subquery(rows), 0)
+
+
+def recount(quiz_ids=None, fields=None):
+    """Correct the counters that differ from the related tables; returns the
+    number of quizzes corrected.
+
+    Only drifted quizzes are written, and only those whose question count
+    changed get a catalog change, so a repair run doesn't make every client
+    reload the whole catalog.
+    """
+    fields = list(fields or COUNTERS)
+    stale = drifted(fields)
+    if quiz_ids is not None:
+        stale = stale.filter(pk__in=quiz_ids)
+    card_counts = ["question_count", "actual_question_count"] if "question_count" in fields else []
+    rows = list(stale.values("pk", *card_counts))
+    if not rows:
+        return 0
+    updated = Quiz.objects.filter(pk__in=[row["pk"] for row in rows]).update(
+        **{field: actual(field) for field in fields}
+    )
+    read_cache.invalidate_on_commit("quizzes")
+    cards = [
+        row["pk"] for row in rows
+        if card_counts and row["question_count"] != row["actual_question_count"]
+    ]
+    if cards:
+        changes.record(CatalogChange.QUIZ, cards)
+    return updated
+
+
+def drifted(fields=None):
+    """Quizzes whose stored counters differ from the related tables.
+
+    Each row carries ``actual_<field>`` annotations next to the stored values.
+    """
+    fields = list(fields or COUNTERS)
+    mismatch = models.Q()
+    for field in fields:
+        mismatch |= ~models.Q(**{field: models.F(f"actual_{field}")})
+    return (
+        Quiz.objects.annotate(**{f"actual_{field}": actual(field) for field in fields})
+        .filter(mismatch)
+        .order_by("pk")
+    )
@@ -0,0 +1,120 @@
+"""Streaming quiz export.
+
+Each exporter yields the file as byte chunks while walking the quiz's
+questions with ``.iterator(chunk_size=...)``, so memory use does not grow
+with the number of questions. Output is deterministic for an unchanged
+quiz, which is what lets ``Range`` requests resume a download: ``snapshot``
+writes one pass into a spooled file (in memory up to ``SPOOL_SIZE``, on
+disk past it) and the ``ETag``, ``Content-Length`` and the streamed bytes
+all come from that same copy.
+"""
+
+import csv
+import hashlib
+import tempfile
+
+from .models import Question
+from .renderers import FastJSONRenderer
+from .serializers import QuestionSerializer
+
+CHUNK_SIZE = 200
+SPOOL_SIZE = 1024 * 1024
+READ_SIZE = 64 * 1024
+
+CSV_COLUMNS = (
+    "question_id",
+    "order",
+    "text",
+    "image_url",
+    "explanation",
+    "option_index",
+    "option_text",
+    "option_is_correct",
+    "option_image_url",
+    "type",
+    "option_gap",
+    "gap_explanation",
+)
+
+
+def iter_questions(quiz):
+    return (
+        Question.objects.filter(quiz=quiz)
+        .order_by("order", "id")
+        .prefetch_related("options", "gaps")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def iter_quiz_json(quiz):
+    render = FastJSONRenderer().render
+    header = render({
+        "id": quiz.id,
+        "name": quiz.name,
+        "author": quiz.author.username,
+        "description": quiz.description,
+        "icon": quiz.icon,
+        "tags": [tag.name for tag in quiz.tags.all()],
+    })
+    # Re-open the header object so questions can be appended one by one
+    yield header[:-1] + b',"questions":['
+    for position, question in enumerate(iter_questions(quiz)):
+        prefix = b"," if position else b""
+        yield prefix + render(QuestionSerializer(question).data)
+    yield b"]}"
+
+
+class _Line:
+    """File-like object for csv.writer that hands back the written row."""
+
+    def write(self, value):
+        return value
+
+
+def iter_quiz_csv(quiz):
+    writer = csv.writer(_Line())
+    yield writer.writerow(CSV_COLUMNS).encode("utf-8")
+    for question in iter_questions(quiz):
+        base = [question.id, question.order, question.text, question.image_url, question.explanation]
+        gaps = {gap.pk: gap for gap in question.gaps.all()}
+        options = question.options.all()
+        if not options:
+            yield writer.writerow(base + ["", "", "", "", question.type, "", ""]).encode("utf-8")
+        for option in options:
+            gap = gaps.get(option.gap_id)
+            row = base + [option.index, option.text, int(option.is_correct), option.image_url, question.type]
+            row += [gap.index, gap.explanation] if gap else ["", ""]
+            yield writer.writerow(row).encode("utf-8")
+
+
+EXPORTERS = {
+    "json": (iter_quiz_json, "application/json"),
+    "csv": (iter_quiz_csv, "text/csv; charset=utf-8"),
+}
+
+
+def snapshot(chunks):
+    """Write a stream to a spooled file; return ``(file, total_bytes, etag)``."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    digest = hashlib.sha1()
+    total = 0
+    for chunk in chunks:
+        spool.write(chunk)
+        digest.update(chunk)
+        total += len(chunk)
+    return spool, total, f'"{digest.hexdigest()}"'
+
+
+def read_range(spool, start, end):
+    """Yield bytes ``start..end`` (inclusive) of a snapshot, then close it."""
+    try:
+        spool.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = spool.read(min(READ_SIZE, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
+    finally:
+        spool.close()
@@ -0,0 +1,58 @@
+"""Fill-in-the-gap question structure.
+
+Older clients stored gap questions as flat options whose text carried the
+gap number (``__G{n}__text``) and packed the per-gap explanations into
+``Question.explanation`` as a JSON object. Questions are now stored with a
+``type`` and ``Gap`` rows, and ``decode_legacy`` turns the old encoding
+into that structure for the serializers and the importer.
+
+Plain Python with no Django imports, like ``import_rows``, so the import
+workers can call it.
+"""
+
+import json
+import re
+
+LEGACY_MARKER = re.compile(r"^__G(\d+)__(.*)$", re.DOTALL)
+
+
+def decode_legacy(options, explanation=""):
+    """Split ``__G{n}__`` options into ``(options, gaps, explanation)``.
+
+    The returned options are copies with the marker removed and ``gap`` set
+    to ``n``; ``gaps`` lists ``{"index", "explanation"}`` per gap number in
+    ascending order. A JSON-object explanation is consumed as the per-gap
+    explanations, anything else is kept as the question's explanation.
+    Returns ``None`` when no option carries a marker.
+    """
+    decoded, numbers = [], set()
+    for option in options or []:
+        match = LEGACY_MARKER.match(option.get("text") or "")
+        if match:
+            numbers.add(int(match.group(1)))
+            option = {**option, "text": match.group(2), "gap": int(match.group(1))}
+        decoded.append(option)
+    if not numbers:
+        return None
+
+    explanations = {}
+    try:
+        packed = json.loads(explanation) if explanation else None
+    except ValueError:
+        packed = None
+    if isinstance(packed, dict):
+        explanations = {str(key): str(value) for key, value in packed.items()}
+        explanation = ""
+    gaps = [{"index": n, "explanation": explanations.get(str(n), "")} for n in sorted(numbers)]
+    return decoded, gaps, explanation
+
+
+def flatten(gaps):
+    """Turn nested ``[{"index", "explanation", "options": [...]}]`` into
+    ``(options, gaps)`` with ``gap`` set on each option."""
+    options, flat = [], []
+    for position, gap in enumerate(gaps):
+        index = gap.get("index", position)
+        flat.append({"index": index, "explanation": gap.get("explanation") or ""})
+        options.extend({**option, "gap": index} for option in gap.get("options") or [])
+    return options, flat
@@ -0,0 +1,139 @@
+"""Per-process identity cache for hot ``User``, ``Tag`` and ``Quiz`` rows.
+
+Quiz cards name their author and tags, and the same few hundred users and
+tags are loaded again for every list that is not served from the read
+cache. This keeps one copy of each row per process, keyed by primary key,
+so serializers resolve them without a join or a query.
+
+- Only the fields listed in ``CACHED_FIELDS`` are loaded. Quiz counters
+  change through ``QuerySet.update`` and are never cached here.
+- Rows are split into ``IDENTITY_CACHE_BUCKETS`` buckets per model by a
+  hash of the primary key, each with its own map and its own
+  ``IdentityVersion`` row. A save or delete bumps only its row's bucket in
+  the writing transaction, so concurrent edits of different rows rarely
+  touch the same version row and one edit drops one bucket, not the model.
+- Every process re-reads the versions (one indexed query) at most every
+  ``IDENTITY_CACHE_CHECK_INTERVAL`` seconds and drops the buckets whose
+  version moved. An edit is therefore visible everywhere within that
+  interval, and immediately in the process that made it.
+- Writes that bypass ``save()``/``delete()`` are bounded by
+  ``IDENTITY_CACHE_TTL``.
+"""
+
+import copy
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import models, transaction
+
+from .caching import _MISSING, LocalLRU
+from .models import IdentityVersion, Quiz, Tag
+
+CHECK_INTERVAL = getattr(settings, "IDENTITY_CACHE_CHECK_INTERVAL", 1.0)
+TTL = getattr(settings, "IDENTITY_CACHE_TTL", 600)
+MAX_ENTRIES = getattr(settings, "IDENTITY_CACHE_MAX_ENTRIES", 10000)
+BUCKETS = getattr(settings, "IDENTITY_CACHE_BUCKETS", 64)
+
+CACHED_FIELDS = {
+    User: ("id", "username"),
+    Tag: ("id", "name"),
+    Quiz: ("id", "name", "author_id", "icon"),
+}
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def bucket(name, pk):
+    """The ``IdentityVersion`` name covering ``pk``; stable across processes."""
+    return f"{name}:{zlib.crc32(str(pk).encode()) % BUCKETS}"
+
+
+class IdentityCache:
+    def __init__(self, fields=CACHED_FIELDS, max_entries=MAX_ENTRIES):
+        self.fields = {label(model): (model, names) for model, names in fields.items()}
+        self._buckets = [f"{name}:{index}" for name in self.fields for index in range(BUCKETS)]
+        self._maps = {key: LocalLRU(max(1, max_entries // BUCKETS)) for key in self._buckets}
+        # Bumped whenever a bucket is dropped, so a load that started before
+        # the drop doesn't put the old rows back
+        self._generations = dict.fromkeys(self._buckets, 0)
+        self._versions = {}
+        self._checked = None
+        self._lock = threading.Lock()
+
+    # Reads
+
+    def get(self, model, pk):
+        """The cached row for ``pk`` (a copy), or None if it doesn't exist."""
+        return self.get_many(model, [pk]).get(pk)
+
+    def get_many(self, model, pks):
+        """``{pk: row}`` for the ``pks`` that exist; one query for the misses."""
+        name = label(model)
+        self._sync()
+        rows, missing = {}, {}
+        for pk in pks:
+            key = bucket(name, pk)
+            row = self._maps[key].get(pk)
+            if row is _MISSING:
+                missing[pk] = (key, self._generations[key])
+            else:
+                rows[pk] = copy.copy(row)
+        if missing:
+            loaded = model._default_manager.only(*self.fields[name][1]).in_bulk(list(missing))
+            with self._lock:
+                for pk, row in loaded.items():
+                    key, generation = missing[pk]
+                    if generation == self._generations[key]:
+                        self._maps[key].set(pk, row, TTL)
+            rows.update((pk, copy.copy(row)) for pk, row in loaded.items())
+        return rows
+
+    # Invalidation
+
+    def invalidate(self, model, pk):
+        """Bump the version of ``pk``'s bucket, in the caller's transaction
+        if any.
+
+        This process drops its own copies of the bucket right away; the
+        others do on their next version check after the commit.
+        """
+        key = bucket(label(model), pk)
+        updated = IdentityVersion.objects.filter(name=key).update(version=models.F("version") + 1)
+        if not updated:
+            IdentityVersion.objects.get_or_create(name=key, defaults={"version": 1})
+        # Now for this transaction's own reads, and again at commit in case
+        # another thread re-read the old row in between
+        self._drop(key)
+        transaction.on_commit(lambda: self._drop(key))
+
+    def _drop(self, key):
+        with self._lock:
+            self._generations[key] += 1
+            self._maps[key].clear()
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < CHECK_INTERVAL:
+            return
+        self._checked = now
+        versions = dict(IdentityVersion.objects.filter(name__in=self._buckets).values_list("name", "version"))
+        for key in self._buckets:
+            version = versions.get(key, 0)
+            if self._versions.get(key, version) != version:
+                self._drop(key)
+            self._versions[key] = version
+
+    def clear(self):
+        """Forget everything this process holds (tests, shell)."""
+        for key in self._buckets:
+            self._drop(key)
+        self._checked = None
+        self._versions.clear()
+
+
+identity = IdentityCache()
@@ -0,0 +1,324 @@
+"""Parsing and validation for bulk question imports.
+
+Everything here is plain Python with no Django imports, so validation can
+run in worker processes without setting Django up in each of them.
+
+Rows are grouped into questions first; each group is validated on its own
+and turns into either a normalized question dict or a list of row-level
+errors. CSV files use the same columns as the CSV export; JSON files use
+the export layout (``{"name": ..., "questions": [...]}``). Both are read
+from the spooled upload as a stream, one question at a time.
+"""
+
+import csv
+import io
+import json
+
+from .gaps import decode_legacy, flatten
+
+TEXT_MAX = 255
+URL_MAX = 512
+TRUE_VALUES = {"1", "true", "yes", "y"}
+FALSE_VALUES = {"0", "false", "no", "n", ""}
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole can't be read (bad encoding, JSON, header)."""
+
+
+READ_SIZE = 64 * 1024
+META_KEYS = ("name", "description", "icon", "tags")
+
+
+def _text(source):
+    """Text view of the binary ``source`` from its start."""
+    source.seek(0)
+    return io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+
+
+def _csv_groups(source):
+    text = _text(source)
+    try:
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or "text" not in reader.fieldnames:
+            raise ImportFormatError("CSV header must include at least a 'text' column.")
+        group, current_key = [], object()
+        for row in reader:
+            line_no = reader.line_num
+            key = row.get("question_id") or f"line-{line_no}"
+            if key != current_key and group:
+                yield group
+                group = []
+            current_key = key
+            group.append((line_no, row))
+        if group:
+            yield group
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f"File is not valid UTF-8: {exc}")
+    finally:
+        text.detach()
+
+
+def parse_csv(source):
+    """Return ``(meta, total, groups)`` for a seekable binary file.
+
+    ``groups`` is a generator of ``[(line_no, row_dict), ...]`` lists read
+    from the file as it goes; consecutive rows with the same
+    ``question_id`` belong to one question. A first pass counts the groups,
+    so encoding and header errors surface before anything is imported.
+    """
+    total = sum(1 for _ in _csv_groups(source))
+    return {}, total, _csv_groups(source)
+
+
+class _JSONReader:
+    """Decodes a JSON document value by value from a text stream, keeping
+    only the value being decoded in memory."""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, text):
+        self.text = text
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.text.read(READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """The next non-blank character, or "" at the end of the file."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ImportFormatError(f"Invalid JSON: expected {char!r}, found {found or 'end of file'!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+                # A number at the end of the buffer may continue in the
+                # next read; anything else after it proves it complete
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError as exc:
+                if self.eof:
+                    raise ImportFormatError(f"Invalid JSON: {exc}")
+            self._fill()
+
+    def items(self):
+        """Yield ``(position, item)`` for the array starting here."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        position = 0
+        while True:
+            position += 1
+            yield position, self.value()
+            separator = self.peek()
+            self.expect(separator if separator in ",]" else ",")
+            if separator == "]":
+                return
+
+
+def _json_groups(source, meta):
+    """Yield one-item groups for the questions, filling ``meta`` with the
+    top-level fields met on the way."""
+    text = _text(source)
+    try:
+        reader = _JSONReader(text)
+        start = reader.peek()
+        if start == "[":
+            for position, item in reader.items():
+                yield [(position, item)]
+        elif start == "{":
+            reader.expect("{")
+            found = False
+            while reader.peek() != "}":
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise ImportFormatError("Invalid JSON: object keys must be strings")
+                reader.expect(":")
+                if key == "questions" and reader.peek() == "[":
+                    found = True
+                    for position, item in reader.items():
+                        yield [(position, item)]
+                else:
+                    value = reader.value()
+                    if key in META_KEYS:
+                        meta[key] = value
+                if reader.peek() != ",":
+                    break
+                reader.pos += 1
+            reader.expect("}")
+            if not found:
+                raise ImportFormatError("JSON must be a list of questions or an object with a 'questions' list.")
+        else:
+            raise ImportFormatError("JSON must be a list of questions or an object with a 'questions' list.")
+        if reader.peek():
+            raise ImportFormatError("Invalid JSON: extra data after the document")
+    except UnicodeDecodeError as exc:
+        raise ImportFormatError(f"File is not valid UTF-8: {exc}")
+    finally:
+        text.detach()
+
+
+def parse_json(source):
+    """Return ``(meta, total, groups)`` for a seekable binary file.
+
+    Accepts a list of questions or the export layout; each question is its
+    own one-item group. Questions are decoded one at a time, in a counting
+    pass that also collects the quiz fields and then again as ``groups``
+    is consumed.
+    """
+    meta = {}
+    total = sum(1 for _ in _json_groups(source, meta))
+    return meta, total, _json_groups(source, {})
+
+
+PARSERS = {"csv": parse_csv, "json": parse_json}
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    normalized = str(value).strip().lower()
+    if normalized in TRUE_VALUES:
+        return True
+    if normalized in FALSE_VALUES:
+        return False
+    raise ValueError(f"is_correct must be true/false, got {value!r}")
+
+
+def _check_length(value, limit, field):
+    if len(value) > limit:
+        raise ValueError(f"{field} is longer than {limit} characters")
+    return value
+
+
+def _csv_question(group):
+    first_line, first = group[0]
+    question = {
+        "row": first_line,
+        "text": (first.get("text") or "").strip(),
+        "image_url": _check_length((first.get("image_url") or "").strip(), URL_MAX, "image_url"),
+        "explanation": first.get("explanation") or "",
+        "options": [],
+    }
+    errors = []
+    gaps = {}
+    for line_no, row in group:
+        option_text = row.get("option_text")
+        if option_text is None or (option_text == "" and not row.get("option_index")):
+            continue
+        try:
+            index = row.get("option_index")
+            option = {
+                "index": int(index) if index not in (None, "") else len(question["options"]),
+                "text": _check_length(option_text, TEXT_MAX, "option_text"),
+                "is_correct": _flag(row.get("option_is_correct", "")),
+                "image_url": _check_length((row.get("option_image_url") or "").strip(), URL_MAX, "option_image_url"),
+            }
+            if row.get("option_gap") not in (None, ""):
+                option["gap"] = int(row["option_gap"])
+                gaps.setdefault(option["gap"], row.get("gap_explanation") or "")
+            question["options"].append(option)
+        except ValueError as exc:
+            errors.append({"row": line_no, "error": str(exc)})
+    if gaps:
+        question["gaps"] = [{"index": n, "explanation": gaps[n]} for n in sorted(gaps)]
+    return question, errors
+
+
+def _json_question(group):
+    position, item = group[0]
+    if not isinstance(item, dict):
+        raise ValueError("question must be an object")
+    question = {
+        "row": position,
+        "text": str(item.get("text") or "").strip(),
+        "image_url": _check_length(str(item.get("image_url") or ""), URL_MAX, "image_url"),
+        "explanation": str(item.get("explanation") or ""),
+        "options": [],
+    }
+    options = item.get("options") or []
+    gaps = item.get("gaps")
+    if gaps:
+        if not isinstance(gaps, list) or not all(isinstance(gap, dict) for gap in gaps):
+            raise ValueError("gaps must be a list of objects")
+        # The export repeats gap options in the flat list; take them from the gaps
+        options, question["gaps"] = flatten(gaps)
+    correct = set(item.get("correct_indices") or [])
+    for offset, option in enumerate(options):
+        if isinstance(option, str):
+            option = {"text": option}
+        if not isinstance(option, dict):
+            raise ValueError(f"option {offset} must be an object or string")
+        index = int(option.get("index", offset))
+        parsed = {
+            "index": index,
+            "text": _check_length(str(option.get("text", "")), TEXT_MAX, "option text"),
+            "is_correct": _flag(option.get("is_correct", index in correct)),
+            "image_url": _check_length(str(option.get("image_url") or ""), URL_MAX, "option image_url"),
+        }
+        if "gap" in option:
+            parsed["gap"] = int(option["gap"])
+        question["options"].append(parsed)
+    return question, []
+
+
+def validate_group(kind, group):
+    """Validate one question's rows; returns ``(question_or_None, errors)``."""
+    try:
+        question, errors = (_csv_question if kind == "csv" else _json_question)(group)
+    except (TypeError, ValueError) as exc:
+        return None, [{"row": group[0][0], "error": str(exc)}]
+
+    if "gaps" not in question:
+        # Files exported before gap questions had their own structure
+        legacy = decode_legacy(question["options"], question["explanation"])
+        if legacy is not None:
+            question["options"], question["gaps"], question["explanation"] = legacy
+
+    row = question["row"]
+    if not question["text"]:
+        errors.append({"row": row, "error": "question text is required"})
+    if not question["options"]:
+        errors.append({"row": row, "error": "question needs at least one option"})
+    indices = [option["index"] for option in question["options"]]
+    if len(indices) != len(set(indices)):
+        errors.append({"row": row, "error": "option indices must be unique"})
+    if question["options"] and not any(option["is_correct"] for option in question["options"]):
+        errors.append({"row": row, "error": "question needs at least one correct option"})
+    if errors:
+        return None, errors
+    return question, []
+
+
+def validate_chunk(kind, groups):
+    """Validate a list of groups; used as the process-pool work unit."""
+    valid, errors = [], []
+    for group in groups:
+        question, group_errors = validate_group(kind, group)
+        if question is not None:
+            valid.append(question)
+        errors.extend(group_errors)
+    return valid, errors
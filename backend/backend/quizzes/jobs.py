@@ -0,0 +1,280 @@
+"""Database-backed background job queue.
+
+Work is recorded as ``BackgroundJob`` rows and executed by the
+``run_jobs`` management command, so no external broker is needed.
+
+- ``@task`` registers a function under a name; ``enqueue`` schedules it
+  with a JSON payload, a priority and an optional idempotency key.
+- Workers claim a job with a conditional UPDATE, which is safe across
+  threads and processes on SQLite as well as server databases.
+- A failing job is retried with exponential backoff until
+  ``max_attempts`` is reached.
+- A running job's ``heartbeat_at`` is refreshed by its worker every third
+  of the worker's stale window (``JOBS_STALE_AFTER`` unless ``run_jobs``
+  is given ``--stale-after``). ``requeue_stale`` only touches jobs whose
+  heartbeat has expired, counts the lost run as an attempt and fails the
+  job once ``max_attempts`` is used up. The outcome of a run is only
+  written while the job is still locked by the worker that ran it.
+- ``queue_stats`` reports queue depth and job latency.
+
+With ``JOBS_INLINE = True`` jobs run in-process right after the enqueuing
+transaction commits, which is handy for tests and single-process setups.
+"""
+
+import logging
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = getattr(settings, "JOBS_RETRY_BASE_DELAY", 2)
+RETRY_MAX_DELAY = getattr(settings, "JOBS_RETRY_MAX_DELAY", 3600)
+STALE_AFTER = getattr(settings, "JOBS_STALE_AFTER", 600)
+
+_registry = {}
+
+
+def task(name, *, priority=0, max_attempts=5):
+    """Register ``fn`` as a job handler; it is called with ``**payload``."""
+
+    def decorator(fn):
+        fn.task_name = name
+        fn.default_priority = priority
+        fn.default_max_attempts = max_attempts
+        _registry[name] = fn
+        return fn
+
+    return decorator
+
+
+def enqueue(name, payload=None, *, priority=None, idempotency_key=None, max_attempts=None, delay=0):
+    """Queue ``name`` and return its job.
+
+    With an ``idempotency_key`` that was already used, the existing job is
+    returned and nothing new is queued.
+    """
+    handler = _registry[name]
+    if idempotency_key:
+        existing = BackgroundJob.objects.filter(idempotency_key=idempotency_key).first()
+        if existing is not None:
+            return existing
+    try:
+        with transaction.atomic():
+            job = BackgroundJob.objects.create(
+                task=name,
+                payload=payload or {},
+                priority=handler.default_priority if priority is None else priority,
+                max_attempts=max_attempts or handler.default_max_attempts,
+                idempotency_key=idempotency_key or None,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        return BackgroundJob.objects.get(idempotency_key=idempotency_key)
+
+    if getattr(settings, "JOBS_INLINE", False):
+        transaction.on_commit(lambda: run_job_inline(job.pk))
+    return job
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{threading.get_ident()}"
+
+
+def claim(worker):
+    """Mark the next due job as running for ``worker`` and return it."""
+    for _ in range(5):
+        candidate = (
+            BackgroundJob.objects.filter(status=BackgroundJob.QUEUED, run_at__lte=timezone.now())
+            .order_by("-priority", "run_at", "id")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        now = timezone.now()
+        claimed = BackgroundJob.objects.filter(id=candidate, status=BackgroundJob.QUEUED).update(
+            status=BackgroundJob.RUNNING,
+            locked_by=worker,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=models.F("attempts") + 1,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(id=candidate)
+        # Another worker won the race; try the next candidate
+    return None
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+class Heartbeat:
+    """Refresh ``job``'s ``heartbeat_at`` from a side thread while it runs."""
+
+    def __init__(self, job, interval=STALE_AFTER / 3):
+        self.job = job
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f"job-heartbeat-{job.pk}", daemon=True)
+
+    def _beat(self):
+        try:
+            while not self._stop.wait(self.interval):
+                alive = BackgroundJob.objects.filter(
+                    pk=self.job.pk, status=BackgroundJob.RUNNING, locked_by=self.job.locked_by
+                ).update(heartbeat_at=timezone.now())
+                if not alive:
+                    return
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def execute(job, stale_after=STALE_AFTER):
+    """Run a claimed job and record the outcome.
+
+    ``stale_after`` is the window ``requeue_stale`` is run with; the job's
+    heartbeat is refreshed three times within it.
+
+    Returns False if the job failed, or if it was taken away from this
+    worker as stale while it ran (its outcome is then not recorded).
+    """
+    handler = _registry.get(job.task)
+    # Only the worker that still holds the job may record how it ended
+    mine = BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.RUNNING, locked_by=job.locked_by)
+    try:
+        if handler is None:
+            raise LookupError(f"No task registered as {job.task!r}")
+        with Heartbeat(job, interval=stale_after / 3):
+            handler(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.task, job.attempts)
+        if job.attempts < job.max_attempts and handler is not None:
+            mine.update(
+                status=BackgroundJob.QUEUED,
+                last_error=error,
+                locked_by="",
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+        else:
+            mine.update(
+                status=BackgroundJob.FAILED,
+                last_error=error,
+                finished_at=timezone.now(),
+            )
+        return False
+    if not mine.update(status=BackgroundJob.DONE, finished_at=timezone.now()):
+        logger.warning("Job %s (%s) finished after it was given up as stale", job.pk, job.task)
+        return False
+    return True
+
+
+def run_job_inline(job_id):
+    now = timezone.now()
+    claimed = BackgroundJob.objects.filter(id=job_id, status=BackgroundJob.QUEUED).update(
+        status=BackgroundJob.RUNNING,
+        locked_by="inline",
+        started_at=now,
+        heartbeat_at=now,
+        attempts=models.F("attempts") + 1,
+    )
+    if claimed:
+        execute(BackgroundJob.objects.get(id=job_id))
+
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Recover running jobs whose worker stopped sending heartbeats.
+
+    The lost run already counted as an attempt when it was claimed, so a
+    job with attempts left is queued again and one without is failed.
+    Returns ``(requeued, failed)``.
+    """
+    now = timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status=BackgroundJob.RUNNING, heartbeat_at__lt=now - timedelta(seconds=stale_after)
+    )
+    failed = stale.filter(attempts__gte=models.F("max_attempts")).update(
+        status=BackgroundJob.FAILED,
+        last_error=f"Worker stopped sending heartbeats for {stale_after}s",
+        finished_at=now,
+    )
+    requeued = stale.filter(attempts__lt=models.F("max_attempts")).update(
+        status=BackgroundJob.QUEUED, locked_by="", run_at=now
+    )
+    return requeued, failed
+
+
+def run_worker(stop_event, poll_interval=1.0, once=False, stale_after=STALE_AFTER):
+    """Claim and execute jobs until ``stop_event`` is set (or the queue drains with ``once``)."""
+    worker = worker_id()
+    try:
+        while not stop_event.is_set():
+            job = claim(worker)
+            if job is None:
+                if once:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            execute(job, stale_after)
+    finally:
+        connection.close()
+
+
+def queue_stats(window=timedelta(hours=1)):
+    """Queue depth per status and priority, plus latency over ``window``."""
+    now = timezone.now()
+    depth = dict(
+        BackgroundJob.objects.values_list("status").annotate(n=models.Count("id")).order_by()
+    )
+    queued_by_priority = dict(
+        BackgroundJob.objects.filter(status=BackgroundJob.QUEUED)
+        .values_list("priority")
+        .annotate(n=models.Count("id"))
+        .order_by()
+    )
+    oldest = (
+        BackgroundJob.objects.filter(status=BackgroundJob.QUEUED, run_at__lte=now)
+        .aggregate(oldest=models.Min("run_at"))["oldest"]
+    )
+
+    recent = BackgroundJob.objects.filter(status=BackgroundJob.DONE, finished_at__gte=now - window)
+    wait = models.ExpressionWrapper(models.F("started_at") - models.F("run_at"), output_field=models.DurationField())
+    run = models.ExpressionWrapper(models.F("finished_at") - models.F("started_at"), output_field=models.DurationField())
+    timings = recent.aggregate(
+        completed=models.Count("id"),
+        wait_avg=models.Avg(wait),
+        wait_max=models.Max(wait),
+        run_avg=models.Avg(run),
+        run_max=models.Max(run),
+    )
+
+    def seconds(value):
+        return round(value.total_seconds(), 3) if value is not None else None
+
+    return {
+        "depth": {status: depth.get(status, 0) for status, _ in BackgroundJob.STATUS_CHOICES},
+        "queued_by_priority": queued_by_priority,
+        "oldest_queued_seconds": seconds(now - oldest) if oldest else None,
+        "completed_last_window": timings["completed"],
+        "wait_seconds": {"avg": seconds(timings["wait_avg"]), "max": seconds(timings["wait_max"])},
+        "run_seconds": {"avg": seconds(timings["run_avg"]), "max": seconds(timings["run_max"])},
+    }
@@ -0,0 +1,314 @@
+"""In-memory state for live multiplayer quiz sessions.
+
+A host opens a session for a quiz and moves it through
+``lobby -> question -> reveal -> question -> ... -> finished``; players join
+with a display name and answer the open question. Everything lives in this
+process until the session finishes, when ``live_views`` writes the results
+in one batch.
+
+- Every state change bumps ``LiveSession.version`` and wakes all waiting
+  long-polls at once through ``Broadcast``, which works across event loops
+  and threads (each waiter is resolved on its own loop).
+- Answers are scored on arrival: ``MAX_POINTS`` for a correct answer given
+  instantly, falling linearly to half of that at the time limit.
+- Scores stay hidden while a question is open; the leaderboard is sorted
+  lazily on the first poll after each reveal.
+
+Finished sessions stay readable for ``FINISHED_TTL`` seconds; a session
+the host leaves without a state change for ``IDLE_TTL`` seconds is dropped
+without saving results, so abandoned lobbies don't pile up.
+
+Sessions are held in this process only, so live sessions need the ASGI app
+to run as a single worker (or with sticky routing by session code).
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+
+from django.conf import settings
+
+from .answer_stats import grade, known_selection
+
+MAX_PLAYERS = getattr(settings, "LIVE_MAX_PLAYERS", 1000)
+DEFAULT_TIME_LIMIT = getattr(settings, "LIVE_DEFAULT_TIME_LIMIT", 20)
+# Finished sessions stay readable this long so late polls see the results
+FINISHED_TTL = getattr(settings, "LIVE_FINISHED_TTL", 600)
+# Unfinished sessions are dropped after this long without a state change
+IDLE_TTL = getattr(settings, "LIVE_IDLE_TTL", 3600)
+MAX_POINTS = 1000
+LEADERBOARD_SIZE = 10
+CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+
+LOBBY = "lobby"
+QUESTION = "question"
+REVEAL = "reveal"
+FINISHED = "finished"
+
+
+class LiveError(Exception):
+    """A request that doesn't fit the session's current state."""
+
+
+class Broadcast:
+    """Wake every waiter at once; waiters may sit on different event loops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    async def wait_until(self, predicate, timeout):
+        """Wait until ``predicate()`` holds or ``timeout`` seconds pass.
+
+        The waiter is registered before the predicate is checked, so a
+        notification between the two is never missed.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            future = loop.create_future()
+            waiter = (loop, future)
+            with self._lock:
+                self._waiters.add(waiter)
+            try:
+                remaining = deadline - loop.time()
+                if predicate() or remaining <= 0:
+                    return predicate()
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return predicate()
+            finally:
+                with self._lock:
+                    self._waiters.discard(waiter)
+
+    def notify_all(self):
+        with self._lock:
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def __len__(self):
+        return len(self._waiters)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Player:
+    __slots__ = ("id", "token", "name", "user_id", "score", "correct", "answers")
+
+    def __init__(self, name, user_id=None):
+        self.id = secrets.token_hex(6)
+        self.token = secrets.token_urlsafe(16)
+        self.name = name
+        self.user_id = user_id
+        self.score = 0
+        self.correct = 0
+        self.answers = {}  # question_id -> {"selected", "correct", "ms", "points"}
+
+
+class LiveSession:
+    def __init__(self, quiz, questions, host_id, time_limit=DEFAULT_TIME_LIMIT):
+        self.code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(6))
+        self.quiz_id = quiz.id
+        self.quiz_name = quiz.name
+        self.host_id = host_id
+        self.time_limit = time_limit
+        # [(public question dict, answer key for grade())]
+        self.questions = questions
+        self.status = LOBBY
+        self.index = -1
+        self.version = 0
+        self.players = {}
+        self.started_at = time.time()
+        self.finished_at = None
+        self.changed_at = time.monotonic()
+        self._question_opened = None
+        self._lock = threading.Lock()
+        self._leaderboard = None
+        self._persisted = False
+        self.record_id = None
+        self.changed = Broadcast()
+
+    # Host actions
+
+    def advance(self):
+        """Open the next question, reveal the open one, or finish."""
+        with self._lock:
+            if self.status == FINISHED:
+                raise LiveError("The session has finished.")
+            if self.status == QUESTION:
+                self.status = REVEAL
+            elif self.index + 1 < len(self.questions):
+                self.index += 1
+                self.status = QUESTION
+                self._question_opened = time.monotonic()
+            else:
+                self._finish()
+            self._changed()
+        return self.status
+
+    def finish(self):
+        with self._lock:
+            if self.status != FINISHED:
+                self._finish()
+                self._changed()
+
+    def _finish(self):
+        self.status = FINISHED
+        self.finished_at = time.time()
+
+    def claim_persist(self):
+        """True exactly once, for whoever should save the finished session."""
+        with self._lock:
+            if self.status != FINISHED or self._persisted:
+                return False
+            self._persisted = True
+            return True
+
+    def _changed(self):
+        self.version += 1
+        self.changed_at = time.monotonic()
+        self._leaderboard = None
+        self.changed.notify_all()
+
+    def expired(self):
+        if self.finished_at is not None:
+            return time.time() - self.finished_at > FINISHED_TTL
+        return time.monotonic() - self.changed_at > IDLE_TTL
+
+    # Players
+
+    def join(self, name, user_id=None):
+        with self._lock:
+            if self.status == FINISHED:
+                raise LiveError("The session has finished.")
+            if len(self.players) >= MAX_PLAYERS:
+                raise LiveError("The session is full.")
+            player = Player(name, user_id)
+            self.players[player.id] = player
+            self._leaderboard = None
+        return player
+
+    def player(self, player_id, token):
+        player = self.players.get(player_id)
+        if player is None or not secrets.compare_digest(player.token, token or ""):
+            raise LiveError("Unknown player.")
+        return player
+
+    def answer(self, player, selected):
+        """Score ``player``'s answer to the open question; one per question.
+
+        Only known option indices are kept, each once, since they end up in
+        the quiz's answer stats.
+        """
+        if not isinstance(selected, list) or not all(type(index) is int for index in selected):
+            raise LiveError("selected must be a list of option indices.")
+        with self._lock:
+            if self.status != QUESTION:
+                raise LiveError("No question is open.")
+            question, key = self.questions[self.index]
+            if question["id"] in player.answers:
+                raise LiveError("Already answered.")
+            elapsed = time.monotonic() - self._question_opened
+            if elapsed > self.time_limit:
+                raise LiveError("Time is up.")
+            selected, all_known = known_selection(key, selected)
+            correct = all_known and grade(key, selected)
+            points = round(MAX_POINTS * (1 - 0.5 * elapsed / self.time_limit)) if correct else 0
+            player.answers[question["id"]] = {
+                "selected": selected,
+                "correct": correct,
+                "ms": int(elapsed * 1000),
+                "points": points,
+            }
+            player.score += points
+            player.correct += int(correct)
+            self._leaderboard = None
+        return points
+
+    # Reads
+
+    def ranking(self):
+        """``(players best first, {player_id: rank})``."""
+        ranking = self._leaderboard
+        if ranking is None:
+            board = sorted(self.players.values(), key=lambda p: (-p.score, p.name, p.id))
+            ranking = (board, {p.id: rank for rank, p in enumerate(board, start=1)})
+            self._leaderboard = ranking
+        return ranking
+
+    def state(self, player=None):
+        """Snapshot for polls.
+
+        While a question is open neither the answer nor the scores are
+        shown, so the leaderboard is only sorted once per reveal.
+        """
+        data = {
+            "code": self.code,
+            "quiz_id": self.quiz_id,
+            "quiz_name": self.quiz_name,
+            "status": self.status,
+            "version": self.version,
+            "question_index": self.index,
+            "total_questions": len(self.questions),
+            "time_limit": self.time_limit,
+            "players": len(self.players),
+        }
+        if self.status in (QUESTION, REVEAL):
+            question, key = self.questions[self.index]
+            data["question"] = question
+        if self.status == QUESTION:
+            data["remaining_ms"] = max(
+                int((self.time_limit - (time.monotonic() - self._question_opened)) * 1000), 0
+            )
+            if player is not None:
+                data["you"] = {"name": player.name, "answered": question["id"] in player.answers}
+            return data
+
+        if self.status == REVEAL:
+            data["correct_indices"] = [index for index, is_correct, _ in key if is_correct]
+        board, ranks = self.ranking()
+        data["leaderboard"] = [
+            {"rank": rank, "name": p.name, "score": p.score}
+            for rank, p in enumerate(board[:LEADERBOARD_SIZE], start=1)
+        ]
+        if player is not None:
+            data["you"] = {"name": player.name, "score": player.score, "rank": ranks[player.id]}
+            if self.status == REVEAL:
+                data["you"]["last_answer"] = player.answers.get(question["id"])
+        return data
+
+
+class SessionRegistry:
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def add(self, session):
+        with self._lock:
+            self._purge()
+            while session.code in self._sessions:
+                session.code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(6))
+            self._sessions[session.code] = session
+        return session
+
+    def get(self, code):
+        session = self._sessions.get((code or "").upper())
+        if session is None or session.expired():
+            return None
+        return session
+
+    def _purge(self):
+        for code in [c for c, s in self._sessions.items() if s.expired()]:
+            del self._sessions[code]
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+
+sessions = SessionRegistry()
@@ -0,0 +1,256 @@
+"""Async endpoints for live multiplayer sessions (state in ``live.py``).
+
+Players follow a session by long-polling ``GET /api/live/<code>/`` with the
+last ``version`` they saw; the request returns as soon as the host changes
+the state, so a question reaches every player at once without a request
+per player per second. Player requests carry the ``player_id``/``token``
+handed out on join instead of a session cookie, so they are CSRF-exempt;
+host requests use the logged-in user. Joins are throttled per client
+address with the ``live_join`` rate, since anyone can call them.
+"""
+
+import json
+import math
+from datetime import datetime, timezone
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import live
+from .answer_stats import answer_stats
+from .async_views import _json
+from .models import LivePlayerResult, LiveSessionRecord, Quiz
+from .throttling import IPTokenBucketThrottle
+
+MAX_WAIT = 25  # seconds a poll may be held open
+NAME_MAX = 40
+
+
+def _body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _error(detail, status=400):
+    return _json({"detail": detail}, status=status)
+
+
+class _JoinThrottle(IPTokenBucketThrottle):
+    def get_scope(self, request, view):
+        return "live_join"
+
+
+def _throttled(request):
+    """A 429 response if the client has used up its joins, else None."""
+    throttle = _JoinThrottle()
+    if throttle.allow_request(request, None):
+        return None
+    response = _error("Request was throttled.", 429)
+    response["Retry-After"] = str(math.ceil(throttle.wait()))
+    return response
+
+
+async def _host_session(request, code):
+    """``(session, None)`` for the session's host, else ``(None, response)``."""
+    session = live.sessions.get(code)
+    if session is None:
+        return None, _error("Session not found.", 404)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return None, _error("Authentication required", 401)
+    if user.id != session.host_id:
+        return None, _error("Only the host can control the session.", 403)
+    return session, None
+
+
+def _questions(quiz):
+    """Public question payloads plus answer keys, in play order."""
+    questions = []
+    for question in quiz.questions.all():
+        options = list(question.options.all())
+        gap_index = {gap.pk: gap.index for gap in question.gaps.all()}
+        public = {
+            "id": question.id,
+            "type": question.type,
+            "text": question.text,
+            "image_url": question.image_url,
+            "options": [
+                {"index": option.index, "text": option.text, "image_url": option.image_url}
+                for option in options
+            ],
+        }
+        if gap_index:
+            public["gaps"] = [
+                {"index": index, "options": [o.index for o in options if o.gap_id == pk]}
+                for pk, index in sorted(gap_index.items(), key=lambda item: item[1])
+            ]
+        key = [(option.index, option.is_correct, option.gap_id) for option in options]
+        questions.append((public, key))
+    return questions
+
+
+def _persist(session):
+    """Write the finished session and every player's result in one transaction."""
+    board, ranks = session.ranking()
+    with transaction.atomic():
+        record = LiveSessionRecord.objects.create(
+            code=session.code,
+            quiz_id=session.quiz_id,
+            host_id=session.host_id,
+            started_at=datetime.fromtimestamp(session.started_at, timezone.utc),
+            finished_at=datetime.fromtimestamp(session.finished_at, timezone.utc),
+            question_count=len(session.questions),
+            player_count=len(board),
+        )
+        LivePlayerResult.objects.bulk_create(
+            [
+                LivePlayerResult(
+                    session=record,
+                    user_id=player.user_id,
+                    name=player.name,
+                    rank=ranks[player.id],
+                    score=player.score,
+                    correct=player.correct,
+                    answers=player.answers,
+                )
+                for player in board
+            ],
+            batch_size=500,
+        )
+    # Live answers count towards the quiz's answer stats as well
+    for player in board:
+        for question_id, answer in player.answers.items():
+            answer_stats.record(session.quiz_id, question_id, answer["selected"], answer["correct"])
+    return record
+
+
+async def _finished(session):
+    if session.claim_persist():
+        record = await sync_to_async(_persist)(session)
+        session.record_id = record.pk
+
+
+@require_POST
+async def create_session(request):
+    """Host a quiz. Body: ``{"quiz_id": ..., "time_limit": seconds}``."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return _error("Authentication required", 401)
+    data = _body(request)
+    if data is None or not isinstance(data.get("quiz_id"), str):
+        return _error("quiz_id is required.")
+    time_limit = data.get("time_limit", live.DEFAULT_TIME_LIMIT)
+    if not isinstance(time_limit, int) or not 5 <= time_limit <= 300:
+        return _error("time_limit must be between 5 and 300 seconds.")
+    quiz = await (
+        Quiz.objects.prefetch_related("questions__options", "questions__gaps")
+        .filter(id=data["quiz_id"])
+        .afirst()
+    )
+    if quiz is None:
+        return _error("Quiz not found.", 404)
+    questions = _questions(quiz)
+    if not questions:
+        return _error("The quiz has no questions.")
+    session = live.sessions.add(live.LiveSession(quiz, questions, user.id, time_limit))
+    return _json(session.state(), status=201)
+
+
+@require_GET
+async def session_state(request, code):
+    """Current state; with ``?version=N&wait=S`` waits up to S seconds for
+    a newer version. ``player``/``token`` add the caller's own standing."""
+    session = live.sessions.get(code)
+    if session is None:
+        return _error("Session not found.", 404)
+    player = None
+    if request.GET.get("player"):
+        try:
+            player = session.player(request.GET["player"], request.GET.get("token"))
+        except live.LiveError as exc:
+            return _error(str(exc), 403)
+    try:
+        version = int(request.GET.get("version", -1))
+        wait = min(float(request.GET.get("wait", 0)), MAX_WAIT)
+    except ValueError:
+        return _error("version and wait must be numbers.")
+    if wait > 0:
+        await session.changed.wait_until(lambda: session.version > version, wait)
+    return _json(session.state(player))
+
+
+@csrf_exempt
+@require_POST
+async def join_session(request, code):
+    """Body: ``{"name": ...}``; returns the ``player_id`` and ``token``."""
+    throttled = _throttled(request)
+    if throttled:
+        return throttled
+    session = live.sessions.get(code)
+    if session is None:
+        return _error("Session not found.", 404)
+    data = _body(request) or {}
+    user = await request.auser()
+    name = str(data.get("name") or (user.username if user.is_authenticated else "")).strip()
+    if not name or len(name) > NAME_MAX:
+        return _error(f"name must be 1 to {NAME_MAX} characters.")
+    try:
+        player = session.join(name, user.id if user.is_authenticated else None)
+    except live.LiveError as exc:
+        return _error(str(exc), 409)
+    return _json({"player_id": player.id, "token": player.token, "state": session.state(player)}, status=201)
+
+
+@csrf_exempt
+@require_POST
+async def answer(request, code):
+    """Body: ``{"player_id", "token", "selected": [option indices]}``."""
+    session = live.sessions.get(code)
+    if session is None:
+        return _error("Session not found.", 404)
+    data = _body(request)
+    if data is None:
+        return _error("Invalid JSON body.")
+    selected = data.get("selected")
+    if not isinstance(selected, list) or not all(isinstance(index, int) for index in selected):
+        return _error("selected must be a list of option indices.")
+    try:
+        player = session.player(data.get("player_id"), data.get("token"))
+    except live.LiveError as exc:
+        return _error(str(exc), 403)
+    try:
+        session.answer(player, selected)
+    except live.LiveError as exc:
+        return _error(str(exc), 409)
+    return _json({"accepted": True})
+
+
+@require_POST
+async def advance(request, code):
+    """Host: open the next question, reveal the open one, or finish."""
+    session, error = await _host_session(request, code)
+    if error:
+        return error
+    try:
+        session.advance()
+    except live.LiveError as exc:
+        return _error(str(exc), 409)
+    if session.status == live.FINISHED:
+        await _finished(session)
+    return _json(session.state())
+
+
+@require_POST
+async def end_session(request, code):
+    """Host: finish now and save the results."""
+    session, error = await _host_session(request, code)
+    if error:
+        return error
+    session.finish()
+    await _finished(session)
+    return _json(session.state())
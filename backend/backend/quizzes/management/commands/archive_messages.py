@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.archive import BATCH_SIZE, RETENTION, archive_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Move messages older than the retention period out of the message "
+        "table into compressed per-conversation archive runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=RETENTION.days,
+            help=f"Archive messages older than this many days (default {RETENTION.days}).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Messages per transaction and archive run (default {BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--days and --batch-size must be positive.")
+        moved, runs = archive_expired(timedelta(days=options["days"]), options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} message(s) in {runs} run(s)."))
@@ -0,0 +1,121 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+PAIRS = {
+    "list": ("/api/quizzes/", "/api/async/quizzes/"),
+    "detail": ("/api/quizzes/{quiz}/", "/api/async/quizzes/{quiz}/"),
+    "current-user": ("/api/auth/current-user/", "/api/async/auth/current-user/"),
+}
+
+
+def _slow_queries(delay):
+    """execute_wrapper that adds ``delay`` seconds of blocking I/O per query."""
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+    return wrapper
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI, fixed worker threads) and async (ASGI, one event "
+        "loop) read endpoints at increasing numbers of concurrent requests."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoint", choices=sorted(PAIRS), default="detail")
+        parser.add_argument("--quiz", default="q-math-hard")
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", default="4,16,64")
+        parser.add_argument("--wsgi-workers", type=int, default=4)
+        parser.add_argument(
+            "--delay-ms", type=float, default=0.0,
+            help="Simulated per-query I/O latency added inside the DB driver.",
+        )
+
+    def handle(self, *args, **options):
+        # The in-process test clients always send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            self._bench(options)
+
+    def _bench(self, options):
+        sync_path, async_path = (p.format(quiz=options["quiz"]) for p in PAIRS[options["endpoint"]])
+        total = options["requests"]
+        delay = options["delay_ms"] / 1000
+        levels = [int(c) for c in options["concurrency"].split(",")]
+
+        self.stdout.write(
+            f"{total} requests, {options['wsgi_workers']} WSGI workers, "
+            f"{options['delay_ms']:.1f} ms simulated query latency"
+        )
+        self.stdout.write(f"{'mode':<6}{'in flight':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for level in levels:
+            workers = min(level, options["wsgi_workers"])
+            self._report("wsgi", workers, self._run_sync(sync_path, total, workers, delay))
+            self._report("asgi", level, asyncio.run(self._run_async(async_path, total, level, delay)))
+
+    def _report(self, mode, in_flight, result):
+        elapsed, latencies = result
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{mode:<6}{in_flight:>10}{len(latencies) / elapsed:>10.0f}"
+            f"{statistics.median(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}"
+        )
+
+    def _run_sync(self, path, total, workers, delay):
+        def one(_):
+            client = Client()
+            with connections["default"].execute_wrapper(_slow_queries(delay)):
+                start = time.perf_counter()
+                response = client.get(path)
+                latency = time.perf_counter() - start
+            connections.close_all()
+            assert response.status_code == 200, response.status_code
+            return latency
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(one, range(total)))
+        return time.perf_counter() - start, latencies
+
+    async def _run_async(self, path, total, concurrency, delay):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with gate:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latency = time.perf_counter() - start
+            assert response.status_code == 200, response.status_code
+            return latency
+
+        # The async ORM runs queries on Django's shared sync thread, so the
+        # wrapper has to be installed on that thread's connection.
+        from asgiref.sync import sync_to_async
+
+        wrapper = _slow_queries(delay)
+
+        def install():
+            connections["default"].execute_wrappers.append(wrapper)
+
+        def remove():
+            connections["default"].execute_wrappers.remove(wrapper)
+
+        await sync_to_async(install)()
+        try:
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(one() for _ in range(total)))
+            elapsed = time.perf_counter() - start
+        finally:
+            await sync_to_async(remove)()
+        return elapsed, list(latencies)
@@ -0,0 +1,118 @@
+import asyncio
+import random
+import statistics
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import AsyncClient
+from django.test.utils import override_settings
+
+from quizzes import live
+from quizzes.answer_stats import answer_stats
+from quizzes.live_views import _persist
+from quizzes.models import Quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Play a live session with many simulated players over the async "
+        "endpoints and report how long each broadcast takes to reach everyone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--players", type=int, default=500)
+        parser.add_argument("--quiz", default="q-math-hard")
+
+    def handle(self, *args, **options):
+        quiz = Quiz.objects.select_related("author").filter(id=options["quiz"]).first()
+        if quiz is None or quiz.author is None:
+            raise CommandError(f"Quiz {options['quiz']!r} not found or has no author.")
+        # The in-process test clients always send Host: testserver, and every
+        # simulated player joins from the same address
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], "live_join_ip": None}
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+        ):
+            session = asyncio.run(self._play(quiz, options["players"]))
+        live.sessions.clear()
+
+        # Time the final write, then roll it back so the benchmark leaves no rows
+        start = time.perf_counter()
+        with mock.patch.object(answer_stats, "record"), transaction.atomic():
+            _persist(session)
+            transaction.set_rollback(True)
+        self.stdout.write(f"persist {len(session.players)} results: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    async def _play(self, quiz, count):
+        host = AsyncClient()
+        await host.aforce_login(quiz.author)
+        response = await host.post("/api/live/", {"quiz_id": quiz.id}, content_type="application/json")
+        assert response.status_code == 201, response.content
+        code = response.json()["code"]
+        session = live.sessions.get(code)
+
+        client = AsyncClient()
+        players = []
+        start = time.perf_counter()
+        for n in range(count):
+            response = await client.post(
+                f"/api/live/{code}/join/", {"name": f"player{n}"}, content_type="application/json"
+            )
+            players.append(response.json())
+        self.stdout.write(f"{count} joins: {(time.perf_counter() - start) * 1000:.0f} ms")
+        self.stdout.write(f"{'step':<14}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'wall ms':>10}")
+
+        async def poll(player, version):
+            response = await client.get(
+                f"/api/live/{code}/",
+                {"version": version, "wait": 25, "player": player["player_id"], "token": player["token"]},
+            )
+            return time.perf_counter(), response.json()
+
+        async def broadcast(label):
+            version = session.version
+            polls = [asyncio.ensure_future(poll(player, version)) for player in players]
+            # Let every poll reach its wait before the host moves on
+            while len(session.changed) < count:
+                await asyncio.sleep(0.01)
+            sent = time.perf_counter()
+            await host.post(f"/api/live/{code}/next/")
+            results = await asyncio.gather(*polls)
+            assert all(state["version"] > version for _, state in results)
+            self._report(label, [received - sent for received, _ in results], time.perf_counter() - sent)
+            return results
+
+        for number in range(len(session.questions)):
+            _, state = (await broadcast(f"question {number + 1}"))[0]
+            indices = [option["index"] for option in state["question"]["options"]]
+            start = time.perf_counter()
+            answers = await asyncio.gather(*(
+                client.post(
+                    f"/api/live/{code}/answer/",
+                    {**player, "selected": [random.choice(indices)]},
+                    content_type="application/json",
+                )
+                for player in players
+            ))
+            assert all(response.status_code == 200 for response in answers)
+            self._report("  answers", [], time.perf_counter() - start)
+            await broadcast("  reveal")
+
+        # Finish without the view's persist; handle() times that separately
+        session.finish()
+        return session
+
+    def _report(self, label, latencies, wall):
+        if not latencies:
+            self.stdout.write(f"{label:<14}{'':>30}{wall * 1000:>10.0f}")
+            return
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<14}{statistics.median(latencies) * 1000:>10.1f}{p95 * 1000:>10.1f}"
+            f"{latencies[-1] * 1000:>10.1f}{wall * 1000:>10.0f}"
+        )
@@ -0,0 +1,91 @@
+import gzip
+import io
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from quizzes.middleware import brotli
+from quizzes.models import Choice, Question, Quiz
+from quizzes.renderers import FastJSONParser, FastJSONRenderer, orjson
+from quizzes.serializers import QuizSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize a synthetic quiz and compare stdlib vs orjson rendering and "
+        "gzip vs brotli payload sizes. Runs in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=500)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            data = self._build_payload(options["questions"], options["options"])
+            transaction.set_rollback(True)
+
+        repeat = options["repeat"]
+        self.stdout.write(f"QuizSerializer payload: {options['questions']} questions x {options['options']} options")
+
+        stdlib_ms, body = self._time(lambda: JSONRenderer().render(data), repeat)
+        self.stdout.write(f"  render  stdlib json      {stdlib_ms:8.2f} ms  {len(body):>9} bytes")
+        if orjson is not None:
+            fast_ms, fast_body = self._time(lambda: FastJSONRenderer().render(data), repeat)
+            self.stdout.write(
+                f"  render  orjson           {fast_ms:8.2f} ms  {len(fast_body):>9} bytes  "
+                f"({stdlib_ms / fast_ms:.1f}x faster)"
+            )
+            parse_ms, _ = self._time(lambda: JSONParser().parse(io.BytesIO(body)), repeat)
+            fast_parse_ms, _ = self._time(lambda: FastJSONParser().parse(io.BytesIO(body)), repeat)
+            self.stdout.write(f"  parse   stdlib json      {parse_ms:8.2f} ms")
+            self.stdout.write(
+                f"  parse   orjson           {fast_parse_ms:8.2f} ms  ({parse_ms / fast_parse_ms:.1f}x faster)"
+            )
+        else:
+            self.stdout.write("  orjson not installed; FastJSONRenderer falls back to stdlib")
+
+        gzip_ms, gz = self._time(lambda: gzip.compress(body, compresslevel=6, mtime=0), repeat)
+        self.stdout.write(
+            f"  gzip-6                   {gzip_ms:8.2f} ms  {len(gz):>9} bytes  ({len(gz) / len(body):.1%})"
+        )
+        if brotli is not None:
+            br_ms, br = self._time(lambda: brotli.compress(body, quality=4), repeat)
+            self.stdout.write(
+                f"  brotli-4                 {br_ms:8.2f} ms  {len(br):>9} bytes  ({len(br) / len(body):.1%})"
+            )
+        else:
+            self.stdout.write("  brotli not installed; responses fall back to gzip")
+
+    def _time(self, fn, repeat):
+        result = fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    def _build_payload(self, num_questions, num_options):
+        author, _ = User.objects.get_or_create(username="bench-render")
+        quiz = Quiz.objects.create(id="bench-render", name="Benchmark quiz", author=author)
+        questions = Question.objects.bulk_create(
+            Question(
+                id=f"bench-render-{i}",
+                quiz=quiz,
+                text=f"Question {i}: which of the following statements about topic {i} is correct?",
+                order=i,
+                explanation=f"Explanation for question {i}, covering why the right option is right.",
+            )
+            for i in range(num_questions)
+        )
+        Choice.objects.bulk_create(
+            Choice(question=q, index=j, text=f"Option {j} for {q.id}", is_correct=(j == 0))
+            for q in questions
+            for j in range(num_options)
+        )
+        quiz = Quiz.objects.prefetch_related("tags", "questions__options").get(id=quiz.id)
+        return QuizSerializer(quiz).data
@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from quizzes.throttling import IPTokenBucketThrottle, TokenBucketStore, UserTokenBucketThrottle
+
+
+class _View:
+    action = "comments"
+    throttle_scopes = {"comments": "comment"}
+
+
+class _User:
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class Command(BaseCommand):
+    help = "Measure per-request overhead of the token-bucket throttles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=100000)
+        parser.add_argument("--clients", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        clients = options["clients"]
+        factory = APIRequestFactory()
+        view = _View()
+
+        requests = []
+        for i in range(clients):
+            request = Request(factory.post("/api/quizzes/x/comments/", REMOTE_ADDR=f"10.0.{i // 256}.{i % 256}"))
+            request.user = _User(i) if i % 2 else AnonymousUser()
+            requests.append(request)
+
+        store = TokenBucketStore()
+        throttles = [cls() for cls in (UserTokenBucketThrottle, IPTokenBucketThrottle)]
+        for throttle in throttles:
+            throttle.store = store
+
+        start = time.perf_counter()
+        for i in range(iterations):
+            request = requests[i % clients]
+            for throttle in throttles:
+                throttle.allow_request(request, view)
+        elapsed = time.perf_counter() - start
+
+        per_request = elapsed / iterations * 1e6
+        self.stdout.write(
+            f"{iterations} requests over {clients} clients: "
+            f"{per_request:.2f} µs/request (user + ip throttles), {len(store)} buckets"
+        )
@@ -0,0 +1,50 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.import_rows import PARSERS
+from quizzes.importers import default_workers, run_import, save_upload
+from quizzes.models import ImportJob, Quiz
+
+
+class Command(BaseCommand):
+    help = "Import questions from a CSV or JSON file, validating rows in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--author", required=True, help="Username that will own the quiz.")
+        parser.add_argument("--quiz-id", help="Append to this existing quiz instead of creating one.")
+        parser.add_argument("--name", default="", help="Name for the new quiz.")
+        parser.add_argument("--workers", type=int, default=default_workers())
+
+    def handle(self, *args, **options):
+        kind = os.path.splitext(options["path"])[1].lower().lstrip(".")
+        if kind not in PARSERS:
+            raise CommandError("File must be .csv or .json")
+        try:
+            author = User.objects.get(username=options["author"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['author']!r}")
+        quiz = None
+        if options["quiz_id"]:
+            quiz = Quiz.objects.filter(id=options["quiz_id"], author=author).first()
+            if quiz is None:
+                raise CommandError(f"{author.username} has no quiz {options['quiz_id']!r}")
+
+        job = ImportJob.objects.create(author=author, quiz=quiz, format=kind, options={"name": options["name"]})
+        # run_import removes its spooled source file, so hand it a copy
+        with open(options["path"], "rb") as source:
+            save_upload(job, File(source))
+
+        job = run_import(job, workers=options["workers"])
+        self.stdout.write(f"Job {job.id}: {job.status}")
+        if job.detail:
+            self.stdout.write(job.detail)
+        self.stdout.write(
+            f"{job.imported_questions}/{job.total_rows} questions imported into {job.quiz_id}, "
+            f"{job.error_count} row errors"
+        )
+        for error in job.errors:
+            self.stdout.write(f"  row {error['row']}: {error['error']}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quizzes.models import Quiz
+from quizzes.similarity import index_quiz
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the near-duplicate index (MinHash signatures and LSH "
+        "buckets) for every quiz, or only the given ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--quiz",
+            action="append",
+            default=[],
+            help="Only reindex this quiz id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.order_by("id").only("id")
+        if options["quiz"]:
+            quizzes = quizzes.filter(id__in=options["quiz"])
+            missing = set(options["quiz"]) - set(quizzes.values_list("id", flat=True))
+            if missing:
+                raise CommandError(f"No quiz with id {', '.join(sorted(missing))}.")
+        count = 0
+        for quiz in quizzes.iterator(chunk_size=200):
+            index_quiz(quiz)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} quiz(zes)."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quizzes.counters import COUNTERS, drifted, recount
+
+
+class Command(BaseCommand):
+    help = "Check the denormalized quiz counters against the related tables and rebuild them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report drifted quizzes; exit with an error if any are found.",
+        )
+        parser.add_argument(
+            "--field",
+            action="append",
+            choices=sorted(COUNTERS),
+            help="Limit to one counter (repeatable). Defaults to all of them.",
+        )
+
+    def handle(self, *args, **options):
+        fields = options["field"] or list(COUNTERS)
+        stale = list(drifted(fields))
+        for quiz in stale:
+            diffs = ", ".join(
+                f"{field} {getattr(quiz, field)} -> {getattr(quiz, f'actual_{field}')}"
+                for field in fields
+                if getattr(quiz, field) != getattr(quiz, f"actual_{field}")
+            )
+            self.stdout.write(f"{quiz.pk}: {diffs}")
+
+        if options["verify"]:
+            if stale:
+                raise CommandError(f"{len(stale)} quiz(zes) have drifted counters.")
+            self.stdout.write(self.style.SUCCESS("All counters match."))
+            return
+
+        with transaction.atomic():
+            updated = recount(fields=fields)
+        self.stdout.write(self.style.SUCCESS(f"Corrected {updated} drifted quiz(zes)."))
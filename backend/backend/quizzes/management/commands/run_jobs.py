@@ -0,0 +1,60 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from quizzes.jobs import STALE_AFTER, requeue_stale, run_worker
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue with a pool of worker threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Worker threads.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due.")
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=STALE_AFTER,
+            help=(
+                "Seconds without a heartbeat before a running job is recovered; this "
+                "pool's workers beat every third of it. Use the same value for every "
+                "run_jobs process sharing the queue."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write("Stopping after current jobs...")
+            stop.set()
+
+        signal.signal(signal.SIGINT, shutdown)
+        signal.signal(signal.SIGTERM, shutdown)
+
+        requeued, failed = requeue_stale(options["stale_after"])
+        if requeued or failed:
+            self.stdout.write(f"Re-queued {requeued} and failed {failed} stale job(s)")
+
+        threads = [
+            threading.Thread(
+                target=run_worker,
+                args=(stop, options["poll_interval"], options["once"], options["stale_after"]),
+                name=f"job-worker-{n}",
+            )
+            for n in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {len(threads)} job worker(s)")
+        last_sweep = time.monotonic()
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1.0)
+            # Sweep for jobs orphaned by other worker processes meanwhile
+            if not stop.is_set() and time.monotonic() - last_sweep > options["stale_after"] / 2:
+                requeue_stale(options["stale_after"])
+                last_sweep = time.monotonic()
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_directory(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    UserDirectoryEntry = apps.get_model('quizzes', 'UserDirectoryEntry')
+    entries = (
+        UserDirectoryEntry(user_id=pk, username=username, username_normalized=username.casefold())
+        for pk, username in User.objects.values_list('id', 'username').iterator(chunk_size=2000)
+    )
+    UserDirectoryEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('quizzes', '0003_seed_quizzes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDirectoryEntry',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='directory_entry', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('username', models.CharField(max_length=150)),
+                ('username_normalized', models.CharField(max_length=150)),
+            ],
+            options={
+                'ordering': ['username_normalized', 'user'],
+                'indexes': [models.Index(fields=['username_normalized', 'user'], name='quizzes_use_usernam_01b102_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0004_user_directory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', '-created_at'], name='quizzes_mes_sender__53e657_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['recipient', 'sender', '-created_at'], name='quizzes_mes_recipie_9ef22e_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0005_message_conversation_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quizshare',
+            index=models.Index(fields=['sender', 'recipient', '-created_at'], name='quizzes_qui_sender__d7352b_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0006_quizshare_pair_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['quiz', 'order', 'id'], name='quizzes_que_quiz_id_f127ea_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:18
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    related = {
+        'question_count': apps.get_model('quizzes', 'Question'),
+        'comment_count': apps.get_model('quizzes', 'Comment'),
+        'favorite_count': apps.get_model('quizzes', 'Favorite'),
+        'share_count': apps.get_model('quizzes', 'QuizShare'),
+    }
+    Quiz.objects.update(**{
+        field: Coalesce(
+            models.Subquery(
+                model.objects.filter(quiz=models.OuterRef('pk'))
+                .order_by().values('quiz').annotate(n=models.Count('pk')).values('n')
+            ),
+            0,
+        )
+        for field, model in related.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0009_background_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='quiz',
+            name='share_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:20
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def dedupe_favorites(apps, schema_editor):
+    """Keep the oldest favorite per (user, quiz) so the constraint can be added."""
+    Favorite = apps.get_model('quizzes', 'Favorite')
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    keep = Favorite.objects.values('user', 'quiz').annotate(keep=models.Min('id')).values('keep')
+    _, deleted = Favorite.objects.exclude(id__in=keep).delete()
+    if deleted:
+        Quiz.objects.update(favorite_count=Coalesce(
+            models.Subquery(
+                Favorite.objects.filter(quiz=models.OuterRef('pk'))
+                .order_by().values('quiz').annotate(n=models.Count('pk')).values('n')
+            ),
+            0,
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0010_quiz_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_favorites, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['recipient', 'sender'], name='message_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['-created_at'], name='quizzes_qui_created_de7c58_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['author', 'name'], name='quizzes_qui_author__2c3a29_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizshare',
+            index=models.Index(fields=['recipient', '-created_at'], name='quizzes_qui_recipie_cf8b82_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'quiz'), name='unique_favorite_per_user'),
+        ),
+    ]
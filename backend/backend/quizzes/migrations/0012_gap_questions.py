@@ -0,0 +1,119 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:33
+
+import json
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+MARKER = re.compile(r'^__G(\d+)__(.*)$', re.DOTALL)
+BATCH = 500
+
+
+def _batches(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), BATCH):
+        yield ids[start:start + BATCH]
+
+
+def decode_gap_options(apps, schema_editor):
+    """Move ``__G{n}__`` option prefixes and JSON gap explanations into Gap rows."""
+    Choice = apps.get_model('quizzes', 'Choice')
+    Gap = apps.get_model('quizzes', 'Gap')
+    Question = apps.get_model('quizzes', 'Question')
+
+    question_ids = set(
+        Choice.objects.filter(text__startswith='__G').values_list('question_id', flat=True)
+    )
+    for batch in _batches(question_ids):
+        choices = [
+            choice for choice in Choice.objects.filter(question_id__in=batch, text__startswith='__G')
+            if MARKER.match(choice.text)
+        ]
+        numbers = {(choice.question_id, int(MARKER.match(choice.text).group(1))) for choice in choices}
+        questions = Question.objects.in_bulk({question_id for question_id, _ in numbers})
+
+        packed = {}
+        for question in questions.values():
+            try:
+                value = json.loads(question.explanation) if question.explanation else None
+            except ValueError:
+                value = None
+            if isinstance(value, dict):
+                packed[question.pk] = {str(key): str(text) for key, text in value.items()}
+                question.explanation = ''
+            question.type = 'fill_gap'
+
+        Gap.objects.bulk_create([
+            Gap(question_id=question_id, index=n, explanation=packed.get(question_id, {}).get(str(n), ''))
+            for question_id, n in sorted(numbers)
+        ])
+        gap_ids = {
+            (question_id, index): pk
+            for pk, question_id, index in Gap.objects.filter(question_id__in=questions).values_list('pk', 'question_id', 'index')
+        }
+        for choice in choices:
+            n, text = MARKER.match(choice.text).groups()
+            choice.gap_id = gap_ids[(choice.question_id, int(n))]
+            choice.text = text
+        Choice.objects.bulk_update(choices, ['text', 'gap'], batch_size=BATCH)
+        Question.objects.bulk_update(questions.values(), ['type', 'explanation'], batch_size=BATCH)
+
+
+def encode_gap_options(apps, schema_editor):
+    Choice = apps.get_model('quizzes', 'Choice')
+    Gap = apps.get_model('quizzes', 'Gap')
+    Question = apps.get_model('quizzes', 'Question')
+
+    question_ids = set(Gap.objects.values_list('question_id', flat=True))
+    for batch in _batches(question_ids):
+        gaps = {gap.pk: gap for gap in Gap.objects.filter(question_id__in=batch)}
+        choices = list(Choice.objects.filter(gap__in=gaps))
+        for choice in choices:
+            choice.text = f'__G{gaps[choice.gap_id].index}__{choice.text}'
+        Choice.objects.bulk_update(choices, ['text'], batch_size=BATCH)
+
+        # The old layout had room for either gap explanations or a plain one
+        packed = {}
+        for gap in gaps.values():
+            if gap.explanation:
+                packed.setdefault(gap.question_id, {})[str(gap.index)] = gap.explanation
+        questions = Question.objects.in_bulk(batch)
+        for question in questions.values():
+            if question.pk in packed:
+                question.explanation = json.dumps(packed[question.pk])
+        Question.objects.bulk_update(questions.values(), ['explanation'], batch_size=BATCH)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='type',
+            field=models.CharField(choices=[('basic', 'Multiple choice'), ('fill_gap', 'Fill in the gap')], default='basic', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='Gap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('explanation', models.TextField(blank=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gaps', to='quizzes.question')),
+            ],
+            options={
+                'ordering': ['index'],
+                'unique_together': {('question', 'index')},
+            },
+        ),
+        migrations.AddField(
+            model_name='choice',
+            name='gap',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='options', to='quizzes.gap'),
+        ),
+        migrations.RunPython(decode_gap_options, encode_gap_options),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    """Give every existing quiz and tag a sequence number so a feed read
+    from 0 covers the whole catalog."""
+    CatalogChange = apps.get_model('quizzes', 'CatalogChange')
+    Quiz = apps.get_model('quizzes', 'Quiz')
+    Tag = apps.get_model('quizzes', 'Tag')
+    for kind, model in (('tag', Tag), ('quiz', Quiz)):
+        CatalogChange.objects.bulk_create(
+            (CatalogChange(kind=kind, object_id=str(pk)) for pk in model.objects.order_by('pk').values_list('pk', flat=True).iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0014_live_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCompaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('horizon', models.BigIntegerField()),
+                ('removed', models.PositiveIntegerField(default=0)),
+                ('compacted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-horizon'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('quiz', 'Quiz'), ('tag', 'Tag')], max_length=8)),
+                ('object_id', models.CharField(max_length=100)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['seq'],
+                'indexes': [models.Index(condition=models.Q(('deleted', True)), fields=['changed_at'], name='catalog_tombstone_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='catalogchange',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_catalog_change'),
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:59
+
+from django.db import migrations, models
+
+
+def seed_versions(apps, schema_editor):
+    """One row per cached model, so invalidation is always a plain UPDATE."""
+    IdentityVersion = apps.get_model('quizzes', 'IdentityVersion')
+    IdentityVersion.objects.bulk_create(
+        [IdentityVersion(name=name) for name in ('auth.user', 'quizzes.quiz', 'quizzes.tag')]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0016_message_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentityVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0017_identity_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilaritySignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'Question'), ('quiz', 'Quiz')], max_length=8)),
+                ('object_id', models.CharField(max_length=100)),
+                ('signature', models.BinaryField()),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='quizzes.quiz')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarityBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('signature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='quizzes.similaritysignature')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='similaritysignature',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_similarity_signature'),
+        ),
+    ]
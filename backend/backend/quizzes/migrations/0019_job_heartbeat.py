@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:13
+
+from django.db import migrations, models
+
+
+def backfill_heartbeats(apps, schema_editor):
+    """Jobs already running count from their start, as they did before."""
+    BackgroundJob = apps.get_model('quizzes', 'BackgroundJob')
+    BackgroundJob.objects.filter(status='running').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0018_similarity_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0019_job_heartbeat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagearchive',
+            index=models.Index(fields=['user_high', 'user_low'], name='quizzes_mes_user_hi_945f3c_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0020_message_archive_partner_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='similaritybucket',
+            name='key',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='similaritybucket',
+            index=models.Index(fields=['key', 'signature'], name='quizzes_sim_key_3f903f_idx'),
+        ),
+    ]
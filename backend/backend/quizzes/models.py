@@ -1,5 +1,8 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Tag(models.Model):
@@ -22,17 +25,144 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.PositiveIntegerField(default=0)
     dislikes = models.PositiveIntegerField(default=0)
+    # Denormalized counts, maintained by ``counters.bump`` on every write path
+    # and rebuilt by ``manage.py repair_counters``
+    question_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    favorite_count = models.PositiveIntegerField(default=0)
+    share_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["-created_at"]),
+            # "My quizzes" lists one author's quizzes in the default name order
+            models.Index(fields=["author", "name"]),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
 
+class CatalogChange(models.Model):
+    """Latest change to one catalog object, for ``/api/quizzes/changes/``.
+
+    Each object keeps a single row; recording a change replaces it, so the
+    new row gets the next ``seq`` (SQLite AUTOINCREMENT never reuses one).
+    Deleted objects keep a tombstone until ``changes.compact`` drops it.
+    """
+
+    QUIZ = "quiz"
+    TAG = "tag"
+    KIND_CHOICES = [
+        (QUIZ, "Quiz"),
+        (TAG, "Tag"),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.CharField(max_length=100)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["seq"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_catalog_change"),
+        ]
+        indexes = [
+            # Tombstone compaction scans deletes by age
+            models.Index(fields=["changed_at"], condition=models.Q(deleted=True), name="catalog_tombstone_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.seq} {self.kind} {self.object_id}{' (deleted)' if self.deleted else ''}"
+
+
+class CatalogCompaction(models.Model):
+    """One tombstone compaction run. Clients that last synced before the
+    highest ``horizon`` may have missed a delete and must reload."""
+
+    horizon = models.BigIntegerField()
+    removed = models.PositiveIntegerField(default=0)
+    compacted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-horizon"]
+
+    def __str__(self) -> str:
+        return f"compacted up to #{self.horizon}"
+
+
+class SimilaritySignature(models.Model):
+    """MinHash signature of a question's text or of a whole quiz.
+
+    A quiz's signature is the element-wise minimum of its questions', i.e.
+    the signature of all their text together. Maintained by
+    ``similarity.index_quiz``.
+    """
+
+    QUESTION = "question"
+    QUIZ = "quiz"
+    KIND_CHOICES = [
+        (QUESTION, "Question"),
+        (QUIZ, "Quiz"),
+    ]
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    object_id = models.CharField(max_length=100)
+    quiz = models.ForeignKey(Quiz, related_name="+", on_delete=models.CASCADE)
+    signature = models.BinaryField()  # NUM_PERM little-endian uint32
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_similarity_signature"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.object_id}"
+
+
+class SimilarityBucket(models.Model):
+    """One LSH band of a signature. Signatures sharing any band key are
+    candidate duplicates, so a lookup is one index probe per band."""
+
+    signature = models.ForeignKey(SimilaritySignature, related_name="buckets", on_delete=models.CASCADE)
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            # Reads a bounded, ordered slice of one bucket (similarity._bucket_rows)
+            models.Index(fields=["key", "signature"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.signature_id}: {self.key}"
+
+
+class IdentityVersion(models.Model):
+    """Change counter per model and id bucket, polled by every process's
+    identity cache (``identity.py``) to drop rows another process has
+    changed."""
+
+    name = models.CharField(primary_key=True, max_length=100)  # "<model label>:<bucket>"
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.name} v{self.version}"
+
+
 class Question(models.Model):
+    BASIC = "basic"
+    FILL_GAP = "fill_gap"
+    TYPE_CHOICES = [
+        (BASIC, "Multiple choice"),
+        (FILL_GAP, "Fill in the gap"),
+    ]
+
     id = models.CharField(primary_key=True, max_length=100)
     quiz = models.ForeignKey(Quiz, related_name="questions", on_delete=models.CASCADE)
+    type = models.CharField(max_length=16, choices=TYPE_CHOICES, default=BASIC)
     text = models.TextField()
     order = models.PositiveIntegerField(default=0)
     image_url = models.CharField(max_length=512, blank=True)
@@ -40,13 +170,56 @@ class Question(models.Model):
 
     class Meta:
         ordering = ["order", "id"]
+        indexes = [
+            # Lets a page of questions be read straight off the index in play order
+            models.Index(fields=["quiz", "order", "id"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.quiz_id}: {self.text[:48]}"
 
+    def build_options(self, options, gaps=()):
+        """Unsaved ``(gap_rows, choice_rows)`` for this question.
+
+        ``options`` are choice field dicts, optionally with a ``gap`` index
+        into ``gaps`` (``{"index", "explanation"}`` dicts). Save the gap
+        rows first; ``bulk_create`` fills in the ids the choices point at.
+        """
+        gap_rows = {
+            gap["index"]: Gap(question=self, index=gap["index"], explanation=gap.get("explanation", ""))
+            for gap in gaps
+        }
+        choice_rows = []
+        for option in options:
+            fields = {key: value for key, value in option.items() if key != "gap"}
+            choice_rows.append(Choice(question=self, gap=gap_rows.get(option.get("gap")), **fields))
+        return list(gap_rows.values()), choice_rows
+
+
+class Gap(models.Model):
+    """One blank in a fill-in-the-gap question.
+
+    ``index`` is the blank's position in the question text; its options are
+    the question's choices that point here.
+    """
+
+    question = models.ForeignKey(Question, related_name="gaps", on_delete=models.CASCADE)
+    index = models.PositiveSmallIntegerField()
+    explanation = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["index"]
+        unique_together = ("question", "index")
+
+    def __str__(self) -> str:
+        return f"{self.question_id}[gap {self.index}]"
+
 
 class Choice(models.Model):
     question = models.ForeignKey(Question, related_name="options", on_delete=models.CASCADE)
+    # Set only for fill-in-the-gap questions; ``index`` stays unique across
+    # the whole question so answers are still graded by option index
+    gap = models.ForeignKey(Gap, related_name="options", null=True, blank=True, on_delete=models.CASCADE)
     text = models.CharField(max_length=255)
     index = models.PositiveIntegerField()
     is_correct = models.BooleanField(default=False)
@@ -60,6 +233,37 @@ class Choice(models.Model):
         return f"{self.question_id}[{self.index}]"
 
 
+class QuestionStat(models.Model):
+    """Answer counts for one question, aggregated from submitted play-throughs.
+
+    Written in batches by ``answer_stats.AnswerStatsBuffer.flush``; the
+    stats endpoint reads these rows as they are.
+    """
+
+    question = models.OneToOneField(Question, primary_key=True, related_name="stats", on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, related_name="question_stats", on_delete=models.CASCADE)
+    answers = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.question_id}: {self.correct}/{self.answers}"
+
+
+class OptionStat(models.Model):
+    """How often an option (by ``Choice.index``) was picked on a first attempt."""
+
+    question = models.ForeignKey(Question, related_name="option_stats", on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, related_name="option_stats", on_delete=models.CASCADE)
+    index = models.PositiveIntegerField()
+    selections = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("question", "index")
+
+    def __str__(self) -> str:
+        return f"{self.question_id}[{self.index}]: {self.selections}"
+
+
 class Message(models.Model):
     """Messages between users for chat functionality"""
     sender = models.ForeignKey(User, related_name="sent_messages", on_delete=models.CASCADE)
@@ -70,11 +274,57 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Cover both sides of a conversation so per-partner scans and the
+            # latest-message-per-partner window stay on an index.
+            models.Index(fields=["sender", "recipient", "-created_at"]),
+            models.Index(fields=["recipient", "sender", "-created_at"]),
+            # Unread badge counts. Partial rather than (recipient, is_read):
+            # Django compiles is_read=False to NOT "is_read", which SQLite
+            # can only match against an index condition, not a key column.
+            models.Index(
+                fields=["recipient", "sender"],
+                condition=models.Q(is_read=False),
+                name="message_unread_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"From {self.sender.username} to {self.recipient.username}: {self.content[:30]}"
 
 
+class MessageArchive(models.Model):
+    """A run of one conversation's oldest messages, moved out of ``Message``.
+
+    ``data`` is zlib-compressed JSON, one ``[id, sender_id, content,
+    created_at, is_read]`` row per message in id order. A conversation's
+    archived ids always sit below its live ones (see ``archive.py``).
+    """
+
+    # The pair, lower user id first, so either side finds the same rows
+    user_low = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    user_high = models.ForeignKey(User, related_name="+", on_delete=models.CASCADE)
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["user_low", "user_high", "-last_id"]
+        indexes = [
+            # Paging back through a conversation's archive, newest run first
+            models.Index(fields=["user_low", "user_high", "-last_id"]),
+            # Archived partners of the higher-id user (the inbox)
+            models.Index(fields=["user_high", "user_low"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_low_id}-{self.user_high_id}: {self.count} messages up to #{self.last_id}"
+
+
 class QuizShare(models.Model):
     """Track quiz sharing between users"""
     quiz = models.ForeignKey(Quiz, related_name="shares", on_delete=models.CASCADE)
@@ -87,6 +337,11 @@ class QuizShare(models.Model):
     class Meta:
         ordering = ["-created_at"]
         unique_together = ("quiz", "sender", "recipient")
+        indexes = [
+            models.Index(fields=["sender", "recipient", "-created_at"]),
+            # "Shared with me", newest first
+            models.Index(fields=["recipient", "-created_at"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.sender.username} shared '{self.quiz.name}' with {self.recipient.username}"
@@ -96,6 +351,39 @@ class Favorite(models.Model):
     """Favorite quizzes per user"""
     user = models.ForeignKey(User, related_name="favorites", on_delete=models.CASCADE)
     quiz = models.ForeignKey(Quiz, related_name="favorites", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "quiz"], name="unique_favorite_per_user"),
+        ]
+
+
+class UserDirectoryEntry(models.Model):
+    """Case-folded copy of each username for indexed prefix lookups.
+
+    Kept in sync with ``User`` by the signal handlers in ``signals.py``.
+    """
+
+    user = models.OneToOneField(
+        User, primary_key=True, related_name="directory_entry", on_delete=models.CASCADE
+    )
+    username = models.CharField(max_length=150)
+    username_normalized = models.CharField(max_length=150)
+
+    class Meta:
+        ordering = ["username_normalized", "user"]
+        indexes = [
+            models.Index(fields=["username_normalized", "user"]),
+        ]
+
+    @staticmethod
+    def normalize(username: str) -> str:
+        return username.casefold()
+
+    def __str__(self) -> str:
+        return self.username
+
+
 class Comment(models.Model):
     """User comments on quizzes"""
 
@@ -112,3 +400,120 @@ class Comment(models.Model):
 
     def __str__(self) -> str:
         return f"{self.user.username} on {self.quiz_id}: {self.text[:30]}"
+
+
+class LiveSessionRecord(models.Model):
+    """A finished live session (see ``live.py``); written once at the end."""
+
+    code = models.CharField(max_length=8)
+    quiz = models.ForeignKey(Quiz, related_name="live_sessions", on_delete=models.CASCADE)
+    host = models.ForeignKey(User, related_name="hosted_live_sessions", on_delete=models.CASCADE)
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField()
+    question_count = models.PositiveIntegerField(default=0)
+    player_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-finished_at"]
+
+    def __str__(self) -> str:
+        return f"{self.code} ({self.quiz_id})"
+
+
+class LivePlayerResult(models.Model):
+    session = models.ForeignKey(LiveSessionRecord, related_name="results", on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name="live_results", null=True, blank=True, on_delete=models.SET_NULL)
+    name = models.CharField(max_length=40)
+    rank = models.PositiveIntegerField()
+    score = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    # question_id -> {"selected", "correct", "ms", "points"}
+    answers = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        ordering = ["session", "rank"]
+        indexes = [
+            models.Index(fields=["session", "rank"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.session_id} #{self.rank} {self.name}"
+
+
+class ImportJob(models.Model):
+    """Progress and row-level errors of a bulk question import"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    author = models.ForeignKey(User, related_name="import_jobs", on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, related_name="import_jobs", null=True, blank=True, on_delete=models.SET_NULL)
+    format = models.CharField(max_length=8)
+    source_path = models.CharField(max_length=512, blank=True)
+    options = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING)
+    detail = models.TextField(blank=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    imported_questions = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"Import {self.id} ({self.status})"
+
+
+class BackgroundJob(models.Model):
+    """A unit of deferred work picked up by the ``run_jobs`` worker"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    task = models.CharField(max_length=128)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    idempotency_key = models.CharField(max_length=191, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a running job whose
+    # heartbeat is older than JOBS_STALE_AFTER belongs to a dead worker
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-priority", "run_at", "id"]
+        indexes = [
+            # Claim order: highest priority first, then oldest due job
+            models.Index(fields=["status", "-priority", "run_at", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.task} #{self.pk} ({self.status})"
@@ -1,8 +1,14 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 import uuid
 from django.contrib.auth.models import User
 
-from .models import Choice, Question, Quiz, Tag, Message, QuizShare, Favorite, Comment
+from . import similarity
+from .counters import bump, recount
+from .gaps import decode_legacy, flatten
+from .identity import identity
+from .models import Choice, Gap, Question, Quiz, Tag, Message, QuizShare, Favorite, Comment, ImportJob
 
 class ChoiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,12 +18,34 @@ class ChoiceSerializer(serializers.ModelSerializer):
 
 class QuestionSerializer(serializers.ModelSerializer):
     options = ChoiceSerializer(many=True)
+    gaps = serializers.SerializerMethodField()
     correct_index = serializers.SerializerMethodField()
     correct_indices = serializers.SerializerMethodField()  # For multiple correct answers
 
     class Meta:
         model = Question
-        fields = ("id", "text", "image_url", "explanation", "options", "correct_index", "correct_indices")
+        fields = ("id", "type", "text", "image_url", "explanation", "options", "gaps",
+                  "correct_index", "correct_indices")
+
+    def get_gaps(self, obj: Question) -> list:
+        """Per-gap explanation and options for fill-in-the-gap questions.
+
+        The options also appear in the flat ``options`` list, with the same
+        indices, so answers are graded the same way for both types.
+        """
+        if obj.type != Question.FILL_GAP:
+            return []
+        by_gap = defaultdict(list)
+        for option in obj.options.all():
+            by_gap[option.gap_id].append(option)
+        return [
+            {
+                "index": gap.index,
+                "explanation": gap.explanation,
+                "options": ChoiceSerializer(by_gap[gap.pk], many=True).data,
+            }
+            for gap in obj.gaps.all()
+        ]
 
     def get_correct_index(self, obj: Question) -> int:
         """Returns first correct index for backward compatibility"""
@@ -31,10 +59,59 @@ class QuestionSerializer(serializers.ModelSerializer):
         return [option.index for option in obj.options.all() if option.is_correct]
 
 
+class CachedUsernameField(serializers.Field):
+    """Username behind the foreign key ``relation``.
+
+    Read from the related row when the query joined it, otherwise from the
+    identity cache, so lists of quizzes need no join on ``auth_user``.
+    """
+
+    def __init__(self, relation, **kwargs):
+        self.relation = relation
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, obj):
+        field = obj._meta.get_field(self.relation)
+        if field.is_cached(obj):
+            return getattr(obj, self.relation).username
+        user = identity.get(User, getattr(obj, field.attname))
+        return user.username if user else None
+
+
+class TagNamesField(serializers.Field):
+    """A quiz's tag names, from ``prime_cards`` or the prefetched tags."""
+
+    def __init__(self, **kwargs):
+        super().__init__(source="*", read_only=True, **kwargs)
+
+    def to_representation(self, quiz):
+        names = getattr(quiz, "tag_names", None)
+        if names is None:
+            return [tag.name for tag in quiz.tags.all()]
+        return names
+
+
+def prime_cards(quizzes):
+    """Resolve the authors and tag names of ``quizzes`` through the identity
+    cache: one query for the tag links, plus one per model for rows the
+    cache doesn't hold yet. Returns the quizzes as a list."""
+    quizzes = list(quizzes)
+    identity.get_many(User, {quiz.author_id for quiz in quizzes})
+    links = defaultdict(list)
+    for quiz_id, tag_id in Quiz.tags.through.objects.filter(
+        quiz_id__in=[quiz.pk for quiz in quizzes]
+    ).values_list("quiz_id", "tag_id"):
+        links[quiz_id].append(tag_id)
+    tags = identity.get_many(Tag, {tag_id for ids in links.values() for tag_id in ids})
+    for quiz in quizzes:
+        quiz.tag_names = sorted(tags[tag_id].name for tag_id in links[quiz.pk] if tag_id in tags)
+    return quizzes
+
+
 class QuizSerializer(serializers.ModelSerializer):
     tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
     questions = QuestionSerializer(many=True)
-    author = serializers.CharField(source="author.username", read_only=True)
+    author = CachedUsernameField("author")
 
     class Meta:
         model = Quiz
@@ -42,40 +119,145 @@ class QuizSerializer(serializers.ModelSerializer):
 
 
 class QuizListSerializer(serializers.ModelSerializer):
-    tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
-    question_count = serializers.IntegerField(source="questions.count", read_only=True)
-    author = serializers.CharField(source="author.username", read_only=True)
+    tags = TagNamesField()
+    question_count = serializers.IntegerField(read_only=True)
+    author = CachedUsernameField("author")
 
     class Meta:
         model = Quiz
         fields = ("id", "name", "author", "icon", "tags", "question_count", "likes", "dislikes")
 
 
+class QuizHeaderSerializer(serializers.ModelSerializer):
+    """Quiz metadata without questions, for rendering the play screen shell"""
+    tags = TagNamesField()
+    author = CachedUsernameField("author")
+    multi_answer = serializers.BooleanField()
+
+    class Meta:
+        model = Quiz
+        fields = ("id", "name", "author", "description", "icon", "tags", "question_count",
+                  "comment_count", "favorite_count", "likes", "dislikes", "multi_answer")
+        read_only_fields = fields
+
+
 class ChoiceCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Choice
         fields = ("index", "text", "is_correct", "image_url")
 
 
-class QuestionCreateSerializer(serializers.ModelSerializer):
+class GapCreateSerializer(serializers.Serializer):
+    index = serializers.IntegerField(required=False, min_value=0)
+    explanation = serializers.CharField(required=False, allow_blank=True, default="")
     options = ChoiceCreateSerializer(many=True)
+
+
+class QuestionCreateSerializer(serializers.ModelSerializer):
+    options = ChoiceCreateSerializer(many=True, required=False)
+    # Fill-in-the-gap questions send their options grouped per gap instead
+    gaps = GapCreateSerializer(many=True, required=False, write_only=True)
     # Allow backend to auto-generate IDs when not provided
     id = serializers.CharField(required=False, allow_blank=True)
 
     class Meta:
         model = Question
-        fields = ("id", "text", "image_url", "explanation", "order", "options")
+        fields = ("id", "type", "text", "image_url", "explanation", "order", "options", "gaps")
+
+    def validate(self, attrs):
+        """Normalize gap questions to flat ``options`` tagged with a ``gap``
+        index plus a ``gaps`` list, accepting the old ``__G{n}__`` option
+        encoding from clients that still send it."""
+        if "gaps" in attrs:
+            attrs["options"], attrs["gaps"] = flatten(attrs["gaps"])
+        elif "options" in attrs:
+            legacy = decode_legacy(attrs["options"], attrs.get("explanation", ""))
+            if legacy is not None:
+                attrs["options"], attrs["gaps"], explanation = legacy
+                if "explanation" in attrs:
+                    attrs["explanation"] = explanation
+
+        current = self.instance.type if self.instance else Question.BASIC
+        if "gaps" in attrs:
+            attrs["type"] = Question.FILL_GAP
+            indices = [gap["index"] for gap in attrs["gaps"]]
+            if len(indices) != len(set(indices)):
+                raise serializers.ValidationError({"gaps": "Gap indices must be unique."})
+            self.validate_options(attrs["options"])
+        elif attrs.get("type", current) == Question.FILL_GAP:
+            if "options" in attrs or current != Question.FILL_GAP:
+                raise serializers.ValidationError({"gaps": "Fill-in-the-gap questions need gaps."})
+        elif "options" not in attrs and (self.instance is None or current != Question.BASIC):
+            raise serializers.ValidationError({"options": "This field is required."})
+        return attrs
 
     def create(self, validated_data):
         options_data = validated_data.pop("options", [])
+        gaps_data = validated_data.pop("gaps", [])
         # Always generate a unique question ID to avoid collisions
         validated_data.pop("id", None)
         validated_data["id"] = f"q-{uuid.uuid4().hex[:8]}"
         question = Question.objects.create(**validated_data)
-        for option_data in options_data:
-            Choice.objects.create(question=question, **option_data)
+        gap_rows, choice_rows = question.build_options(options_data, gaps_data)
+        Gap.objects.bulk_create(gap_rows)
+        Choice.objects.bulk_create(choice_rows)
         return question
 
+    def update(self, instance, validated_data):
+        """Save changed fields and sync options by ``index``.
+
+        Only options that were added, changed or dropped are written; the
+        question's ``id`` and ``order`` are left alone (see the reorder
+        helpers in the view). Sending ``gaps``, or changing ``type``,
+        replaces the gaps and options outright.
+        """
+        options_data = validated_data.pop("options", None)
+        gaps_data = validated_data.pop("gaps", None)
+        validated_data.pop("id", None)
+        validated_data.pop("order", None)
+        changed = [field for field, value in validated_data.items() if getattr(instance, field) != value]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+
+        if gaps_data is not None or "type" in changed:
+            Gap.objects.filter(question=instance).delete()
+            Choice.objects.filter(question=instance).delete()
+            gap_rows, choice_rows = instance.build_options(options_data or [], gaps_data or [])
+            Gap.objects.bulk_create(gap_rows)
+            Choice.objects.bulk_create(choice_rows)
+            instance._prefetched_objects_cache = {}
+        elif options_data is not None:
+            existing = {option.index: option for option in instance.options.all()}
+            incoming = {option["index"]: option for option in options_data}
+            stale = [existing[index].pk for index in existing.keys() - incoming.keys()]
+            if stale:
+                Choice.objects.filter(pk__in=stale).delete()
+            to_create, to_update = [], []
+            for index, data in incoming.items():
+                option = existing.get(index)
+                if option is None:
+                    to_create.append(Choice(question=instance, **data))
+                elif any(getattr(option, field) != value for field, value in data.items()):
+                    for field, value in data.items():
+                        setattr(option, field, value)
+                    to_update.append(option)
+            if to_create:
+                Choice.objects.bulk_create(to_create)
+            if to_update:
+                Choice.objects.bulk_update(to_update, ["text", "is_correct", "image_url"])
+            if stale or to_create or to_update:
+                # Drop the prefetch cache so the response shows the new options
+                instance._prefetched_objects_cache = {}
+        return instance
+
+    def validate_options(self, value):
+        indices = [option["index"] for option in value]
+        if len(indices) != len(set(indices)):
+            raise serializers.ValidationError("Option indices must be unique.")
+        return value
+
 
 class QuizCreateSerializer(serializers.ModelSerializer):
     questions = QuestionCreateSerializer(many=True, write_only=True)
@@ -100,7 +282,7 @@ class QuizCreateSerializer(serializers.ModelSerializer):
         if not validated_data.get("id"):
             validated_data["id"] = f"quiz-{uuid.uuid4().hex[:8]}"
         
-        quiz = Quiz.objects.create(**validated_data)
+        quiz = Quiz.objects.create(**validated_data, question_count=len(questions_data))
         
         # Create tags if they don't exist and set them
         tags = []
@@ -111,10 +293,13 @@ class QuizCreateSerializer(serializers.ModelSerializer):
         quiz.tags.set(tags)
         
         # Create questions
+        created = []
         for idx, question_data in enumerate(questions_data):
             question_data['quiz'] = quiz
             question_data['order'] = idx
-            QuestionCreateSerializer().create(question_data)
+            question = QuestionCreateSerializer().create(question_data)
+            created.append((question.pk, question.text))
+        similarity.index_quiz(quiz, created)
         
         return quiz
 
@@ -126,7 +311,7 @@ class QuizCreateSerializer(serializers.ModelSerializer):
         instance.name = validated_data.get('name', instance.name)
         instance.description = validated_data.get('description', instance.description)
         instance.icon = validated_data.get('icon', instance.icon)
-        instance.save()
+        instance.save(update_fields=["name", "description", "icon"])
         
         # Update tags
         tags = []
@@ -141,10 +326,15 @@ class QuizCreateSerializer(serializers.ModelSerializer):
         instance.questions.all().delete()
         
         # Create new questions
+        created = []
         for idx, question_data in enumerate(questions_data):
             question_data['quiz'] = instance
             question_data['order'] = idx
-            QuestionCreateSerializer().create(question_data)
+            question = QuestionCreateSerializer().create(question_data)
+            created.append((question.pk, question.text))
+        similarity.index_quiz(instance, created)
+        Quiz.objects.filter(pk=instance.pk).update(question_count=len(questions_data))
+        instance.question_count = len(questions_data)
         
         return instance
 
@@ -213,7 +403,62 @@ class QuizShareSerializer(serializers.ModelSerializer):
         recipient = User.objects.get(id=recipient_id)
         validated_data['recipient'] = recipient
         # sender will be set in the view from request.user
-        return super().create(validated_data)
+        share = super().create(validated_data)
+        bump(quiz.pk, share_count=1)
+        return share
+
+
+class QuizShareBulkSerializer(serializers.Serializer):
+    """Share one quiz with many recipients in a single request"""
+    quiz_id = serializers.CharField()
+    recipient_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=500
+    )
+    message = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate_quiz_id(self, value):
+        if not Quiz.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Quiz not found.")
+        return value
+
+    def create(self, validated_data):
+        quiz_id = validated_data["quiz_id"]
+        sender = validated_data["sender"]
+        recipient_ids = list(dict.fromkeys(validated_data["recipient_ids"]))
+
+        found = set(User.objects.filter(id__in=recipient_ids).values_list("id", flat=True))
+        existing = set(
+            QuizShare.objects.filter(
+                quiz_id=quiz_id, sender=sender, recipient_id__in=found
+            ).values_list("recipient_id", flat=True)
+        )
+        new_ids = [rid for rid in recipient_ids if rid in found and rid not in existing]
+
+        QuizShare.objects.bulk_create(
+            [
+                QuizShare(
+                    quiz_id=quiz_id,
+                    sender=sender,
+                    recipient_id=rid,
+                    message=validated_data["message"],
+                )
+                for rid in new_ids
+            ],
+            ignore_conflicts=True,
+        )
+        if new_ids:
+            # ignore_conflicts hides how many rows a concurrent request beat
+            # us to, so count instead of adding len(new_ids)
+            recount([quiz_id], fields=["share_count"])
+        return {
+            "quiz_id": quiz_id,
+            "shared": new_ids,
+            "already_shared": [rid for rid in recipient_ids if rid in existing],
+            "not_found": [rid for rid in recipient_ids if rid not in found],
+        }
+
+    def to_representation(self, instance):
+        return instance
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -229,7 +474,9 @@ class FavoriteSerializer(serializers.ModelSerializer):
         quiz_id = validated_data.pop("quiz_id")
         quiz = Quiz.objects.get(id=quiz_id)
         user = self.context.get("request").user
-        favorite, _ = Favorite.objects.get_or_create(user=user, quiz=quiz)
+        favorite, created = Favorite.objects.get_or_create(user=user, quiz=quiz)
+        if created:
+            bump(quiz.pk, favorite_count=1)
         return favorite
 
 
@@ -242,3 +489,14 @@ class FavoriteListSerializer(serializers.ModelSerializer):
         fields = ("id", "quiz")
         read_only_fields = ("id", "quiz")
 
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Progress report for a bulk question import"""
+    quiz_id = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ("id", "quiz_id", "format", "status", "detail", "total_rows", "processed_rows",
+                  "imported_questions", "error_count", "errors", "created_at", "finished_at")
+        read_only_fields = fields
@@ -0,0 +1,159 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import changes
+from .auth_backends import forget_user
+from .caching import read_cache
+from .counters import recount
+from .identity import identity
+from .models import CatalogChange, Comment, Favorite, Quiz, QuizShare, Tag, UserDirectoryEntry
+
+
+@receiver(post_save, sender=User)
+def sync_user_directory(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mirror the username into the directory table used for autocomplete."""
+    # Logins save only last_login; skip the write (and the cache invalidation)
+    if raw or (update_fields and "username" not in update_fields):
+        return
+    UserDirectoryEntry.objects.update_or_create(
+        user=instance,
+        defaults={
+            "username": instance.username,
+            "username_normalized": UserDirectoryEntry.normalize(instance.username),
+        },
+    )
+
+
+@receiver(pre_delete, sender=User)
+def recount_after_user_delete(sender, instance, using, **kwargs):
+    """Deleting a user cascades to comments, favorites and shares on other
+    people's quizzes; recount those quizzes once the delete has committed."""
+    quiz_ids = set()
+    for model, lookups in (
+        (Comment, ["user"]),
+        (Favorite, ["user"]),
+        (QuizShare, ["sender", "recipient"]),
+    ):
+        for lookup in lookups:
+            quiz_ids.update(
+                model.objects.using(using)
+                .filter(**{lookup: instance})
+                .exclude(quiz__author=instance)
+                .values_list("quiz_id", flat=True)
+                .distinct()
+            )
+    if quiz_ids:
+        transaction.on_commit(
+            lambda: recount(quiz_ids, fields=["comment_count", "favorite_count", "share_count"]),
+            using=using,
+        )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_changed_user(sender, instance, **kwargs):
+    """Drop the cached auth user so password, username and is_active changes
+    (or the deletion) apply to every session on its next request."""
+    forget_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+# Read-cache invalidation (see caching.py)
+
+@receiver(post_save, sender=Quiz)
+def invalidate_quiz_saved(sender, instance, **kwargs):
+    read_cache.invalidate_on_commit("quizzes")
+
+
+@receiver(post_delete, sender=Quiz)
+def invalidate_quiz_deleted(sender, instance, **kwargs):
+    read_cache.invalidate_on_commit("quizzes", "tags")
+
+
+@receiver(m2m_changed, sender=Quiz.tags.through)
+def invalidate_quiz_tags(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        read_cache.invalidate_on_commit("quizzes", "tags")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag(sender, instance, **kwargs):
+    read_cache.invalidate_on_commit("quizzes", "tags")
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_favorites(sender, instance, **kwargs):
+    read_cache.invalidate_on_commit(f"favorites:{instance.user_id}")
+
+
+@receiver(post_save, sender=UserDirectoryEntry)
+@receiver(post_delete, sender=UserDirectoryEntry)
+def invalidate_user_directory(sender, instance, **kwargs):
+    read_cache.invalidate_on_commit("users")
+
+
+# Identity cache invalidation (see identity.py)
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Tag)
+def invalidate_identity_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins save only last_login, which the cache doesn't hold
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    identity.invalidate(sender, instance.pk)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Tag)
+def invalidate_identity_deleted(sender, instance, **kwargs):
+    identity.invalidate(sender, instance.pk)
+
+
+# Catalog change feed (see changes.py)
+
+@receiver(post_save, sender=Quiz)
+def record_quiz_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record(CatalogChange.QUIZ, [instance.pk])
+
+
+@receiver(post_delete, sender=Quiz)
+def record_quiz_deleted(sender, instance, **kwargs):
+    changes.record(CatalogChange.QUIZ, [instance.pk], deleted=True)
+
+
+@receiver(m2m_changed, sender=Quiz.tags.through)
+def record_quiz_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            changes.record(CatalogChange.QUIZ, [instance.pk])
+    elif action in ("post_add", "post_remove"):
+        changes.record(CatalogChange.QUIZ, pk_set)
+    elif action == "pre_clear":
+        # pk_set is not given for a clear
+        changes.record(CatalogChange.QUIZ, instance.quizzes.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Tag)
+def record_tag_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record(CatalogChange.TAG, [instance.pk])
+
+
+@receiver(pre_delete, sender=Tag)
+def record_tag_deleted(sender, instance, **kwargs):
+    # The cascade removes the tag from its quizzes without an m2m signal
+    changes.record(CatalogChange.QUIZ, instance.quizzes.values_list("pk", flat=True))
+    changes.record(CatalogChange.TAG, [instance.pk], deleted=True)
@@ -0,0 +1,260 @@
+"""Near-duplicate detection for questions and quizzes (MinHash + LSH).
+
+Every question's text is reduced to a MinHash signature: ``NUM_PERM``
+minimum hash values over its character shingles, where the share of equal
+positions between two signatures estimates the Jaccard similarity of the
+texts. A quiz's signature is the element-wise minimum of its questions',
+which is exactly the signature of all their shingles together, so a
+republished quiz matches even with its questions reordered or trimmed.
+
+- The signature is cut into ``BANDS`` bands of ``ROWS`` values, and each
+  band is hashed to one ``SimilarityBucket.key``. Two signatures sharing
+  any key are candidates; with 16 bands of 4 a pair at similarity 0.8 is
+  found with probability above 0.999 and one at 0.3 about 12% of the time.
+- A lookup reads at most ``PER_KEY`` rows from each of its buckets, the
+  lowest signature ids first, through the ``(key, signature)`` index, and
+  compares those candidates' signatures. Its cost is bounded by
+  ``BANDS * PER_KEY`` however many copies of a text exist. A bucket that
+  full holds copies of one short or generic text, so any of them stands
+  for the rest, and the earliest indexed is usually the original.
+- ``index_quiz`` replaces a quiz's rows; ``QuizCreateSerializer`` calls it
+  on create and update, and ``manage.py index_similarity`` (re)builds the
+  index for quizzes written through other paths.
+"""
+
+import hashlib
+import re
+import struct
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .identity import identity
+from .models import Question, Quiz, SimilarityBucket, SimilaritySignature
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+THRESHOLD = getattr(settings, "DUPLICATE_SIMILARITY_THRESHOLD", 0.7)
+# Rows read from one bucket per lookup
+PER_KEY = 32
+KEY_CHUNK = 500
+# Buckets per UNION ALL statement; SQLite allows 500 compound terms
+KEYS_PER_QUERY = 100
+
+_FORMAT = f"<{NUM_PERM}I"
+_WORDS = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(_WORDS.findall(text.lower()))
+
+
+def shingles(text):
+    text = normalize(text)
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _hashes(shingle):
+    """``NUM_PERM`` independent 32-bit hashes of one shingle."""
+    data = shingle.encode()
+    values = []
+    for seed in range(NUM_PERM // 16):
+        digest = hashlib.blake2b(data, digest_size=64, person=b"minhash%d" % seed).digest()
+        values.extend(struct.unpack("<16I", digest))
+    return values
+
+
+def signature(text):
+    """MinHash signature of ``text`` as a tuple, or None for empty text."""
+    hashed = [_hashes(shingle) for shingle in shingles(text)]
+    if not hashed:
+        return None
+    return tuple(map(min, zip(*hashed)))
+
+
+def combine(signatures):
+    """Signature of the union of the sets behind ``signatures``."""
+    signatures = [sig for sig in signatures if sig]
+    return tuple(map(min, zip(*signatures))) if signatures else None
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def band_keys(kind, sig):
+    keys = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}I", *sig[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(b"%s:%d:" % (kind.encode(), band) + rows, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def pack(sig):
+    return struct.pack(_FORMAT, *sig)
+
+
+def unpack(data):
+    return struct.unpack(_FORMAT, bytes(data))
+
+
+# Index maintenance
+
+def index_quiz(quiz, questions=None):
+    """Replace the signatures of ``quiz`` and its questions.
+
+    ``questions`` are ``(id, text)`` pairs; read from the database when
+    omitted.
+    """
+    if questions is None:
+        questions = Question.objects.filter(quiz=quiz).values_list("id", "text")
+    signed = [(pk, signature(text)) for pk, text in questions]
+    signed = [(pk, sig) for pk, sig in signed if sig]
+    rows = [(SimilaritySignature.QUESTION, pk, sig) for pk, sig in signed]
+    quiz_sig = combine(sig for _, sig in signed)
+    if quiz_sig:
+        rows.append((SimilaritySignature.QUIZ, quiz.pk, quiz_sig))
+
+    with transaction.atomic(savepoint=False):
+        SimilaritySignature.objects.filter(quiz=quiz).delete()
+        created = SimilaritySignature.objects.bulk_create(
+            [SimilaritySignature(kind=kind, object_id=pk, quiz=quiz, signature=pack(sig)) for kind, pk, sig in rows],
+            batch_size=500,
+        )
+        SimilarityBucket.objects.bulk_create(
+            [
+                SimilarityBucket(signature=row, key=key)
+                for row, (kind, _, sig) in zip(created, rows)
+                for key in band_keys(kind, sig)
+            ],
+            batch_size=1000,
+        )
+
+
+# Lookups
+
+def _bucket_rows(keys):
+    """``(key, signature_id)`` for up to ``PER_KEY`` members of each bucket,
+    lowest signature ids first; one index range read per key."""
+    table = connection.ops.quote_name(SimilarityBucket._meta.db_table)
+    key_column = connection.ops.quote_name(SimilarityBucket._meta.get_field("key").column)
+    signature_column = connection.ops.quote_name(SimilarityBucket._meta.get_field("signature").column)
+    part = (
+        f"SELECT * FROM (SELECT {key_column}, {signature_column} FROM {table} "
+        f"WHERE {key_column} = %s ORDER BY {signature_column} LIMIT {PER_KEY}) AS b{{}}"
+    )
+    rows = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(keys), KEYS_PER_QUERY):
+            chunk = keys[start:start + KEYS_PER_QUERY]
+            cursor.execute(" UNION ALL ".join(part.format(n) for n in range(len(chunk))), chunk)
+            rows.extend(cursor.fetchall())
+    return rows
+
+
+def _candidates(kind, keys_by_owner, exclude=()):
+    """``{owner: {signature_id: (object_id, quiz_id, signature)}}`` for the
+    signatures sharing a band key with each owner's keys."""
+    owners_by_key = {}
+    for owner, keys in keys_by_owner.items():
+        for key in keys:
+            owners_by_key.setdefault(key, []).append(owner)
+    found = {owner: set() for owner in keys_by_owner}
+    for key, signature_id in _bucket_rows(list(owners_by_key)):
+        for owner in owners_by_key[key]:
+            found[owner].add(signature_id)
+
+    wanted = list(set().union(*found.values()))
+    rows = {}
+    for start in range(0, len(wanted), KEY_CHUNK):
+        for pk, object_id, quiz_id, data in (
+            SimilaritySignature.objects.filter(id__in=wanted[start:start + KEY_CHUNK], kind=kind)
+            .exclude(object_id__in=exclude)
+            .values_list("id", "object_id", "quiz_id", "signature")
+        ):
+            rows[pk] = (object_id, quiz_id, unpack(data))
+    return {owner: {pk: rows[pk] for pk in ids if pk in rows} for owner, ids in found.items()}
+
+
+def _matches(sig, candidates, threshold):
+    scored = [
+        (round(similarity(sig, other), 3), object_id, quiz_id)
+        for object_id, quiz_id, other in candidates.values()
+    ]
+    return sorted((m for m in scored if m[0] >= threshold), key=lambda m: (-m[0], m[1]))
+
+
+def similar_quizzes(quiz_id, sig=None, threshold=THRESHOLD, limit=10):
+    """``[(similarity, quiz_id)]`` of quizzes resembling ``quiz_id``, best first."""
+    if sig is None:
+        row = SimilaritySignature.objects.filter(kind=SimilaritySignature.QUIZ, object_id=quiz_id).first()
+        if row is None:
+            return []
+        sig = unpack(row.signature)
+    kind = SimilaritySignature.QUIZ
+    candidates = _candidates(kind, {quiz_id: band_keys(kind, sig)}, exclude=[quiz_id])[quiz_id]
+    return [(score, other) for score, other, _ in _matches(sig, candidates, threshold)[:limit]]
+
+
+def duplicate_questions(quiz_id, threshold=THRESHOLD, limit=5):
+    """``{question_id: [(similarity, question_id, quiz_id)]}`` for the
+    questions of ``quiz_id`` that have near duplicates, in this quiz or any
+    other."""
+    kind = SimilaritySignature.QUESTION
+    own = {
+        object_id: unpack(data)
+        for object_id, data in SimilaritySignature.objects.filter(quiz_id=quiz_id, kind=kind)
+        .order_by("id")
+        .values_list("object_id", "signature")
+    }
+    candidates = _candidates(kind, {pk: band_keys(kind, sig) for pk, sig in own.items()})
+    duplicates = {}
+    for pk, sig in own.items():
+        matches = [m for m in _matches(sig, candidates[pk], threshold) if m[1] != pk][:limit]
+        if matches:
+            duplicates[pk] = matches
+    return duplicates
+
+
+def report(quiz_id, threshold=THRESHOLD):
+    """API payload: similar quizzes and, per question, its near duplicates.
+
+    Questions deleted since they were indexed are left out.
+    """
+    quizzes = similar_quizzes(quiz_id, threshold=threshold)
+    questions = duplicate_questions(quiz_id, threshold=threshold)
+    matched = [m for matches in questions.values() for m in matches]
+    cards = identity.get_many(Quiz, {other for _, other in quizzes} | {m[2] for m in matched})
+    authors = identity.get_many(User, {quiz.author_id for quiz in cards.values()})
+    texts = dict(
+        Question.objects.filter(id__in={*questions, *(m[1] for m in matched)}).values_list("id", "text")
+    )
+
+    def card(pk):
+        quiz = cards[pk]
+        author = authors.get(quiz.author_id)
+        return {"id": pk, "name": quiz.name, "icon": quiz.icon, "author": author.username if author else None}
+
+    return {
+        "threshold": threshold,
+        "quizzes": [{**card(pk), "similarity": score} for score, pk in quizzes if pk in cards],
+        "questions": [
+            {
+                "id": pk,
+                "text": texts[pk],
+                "duplicates": [
+                    {"id": other, "text": texts[other], "quiz": card(other_quiz), "similarity": score}
+                    for score, other, other_quiz in matches
+                    if other in texts and other_quiz in cards
+                ],
+            }
+            for pk, matches in questions.items()
+            if pk in texts
+        ],
+    }
@@ -0,0 +1,19 @@
+"""Background job handlers (see ``jobs.py``)."""
+
+from .changes import compact
+from .importers import run_import
+from .jobs import task
+from .models import ImportJob
+
+
+# An import that dies halfway has already written some rows, so it reports
+# failure on its ImportJob instead of being retried.
+@task("quizzes.import_questions", priority=-1, max_attempts=1)
+def import_questions(import_job_id):
+    job = ImportJob.objects.select_related("author", "quiz").get(pk=import_job_id)
+    run_import(job)
+
+
+@task("quizzes.compact_catalog_changes", priority=-2)
+def compact_catalog_changes():
+    compact()
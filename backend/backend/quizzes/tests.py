@@ -1,3 +1,1575 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from io import BytesIO, StringIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import changes, counters, exporters, import_rows, jobs, live, middleware, similarity
+from .answer_stats import answer_stats
+from .caching import TwoTierCache, read_cache
+from .auth_backends import CachedModelBackend, user_cache_key
+from .identity import IdentityCache, bucket, identity
+from .models import BackgroundJob, CatalogChange, Choice, Comment, Favorite, Gap, IdentityVersion, ImportJob, LivePlayerResult, LiveSessionRecord, Message, MessageArchive, OptionStat, Question, QuestionStat, Quiz, QuizShare
+from .renderers import FastJSONParser, FastJSONRenderer
+from .throttling import TokenBucketStore, default_store
+from .views import MessageViewSet, parse_byte_range
+
+
+# The shared read-cache tier is a directory on disk; read_cache.clear()
+# must not empty the developer's BASE_DIR/cache
+_shared_cache = {}
+
+
+def setUpModule():
+    location = tempfile.mkdtemp(prefix="quizwizz-shared-cache-")
+    override = override_settings(CACHES={**settings.CACHES, "shared": {**settings.CACHES["shared"], "LOCATION": location}})
+    override.enable()
+    _shared_cache.update(location=location, override=override)
+
+
+def tearDownModule():
+    _shared_cache["override"].disable()
+    shutil.rmtree(_shared_cache["location"], ignore_errors=True)
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite-specific")
+class QueryPlanTests(TestCase):
+    """Every query behind the hot read endpoints must be answered from an index.
+
+    Each endpoint is requested, the SELECTs it issued are re-run under
+    ``EXPLAIN QUERY PLAN`` and any ``SCAN <table>`` step that isn't driven
+    by an index fails the test.
+    """
+
+    # Django aliases repeated joins to the same table as T3, T4, ...
+    ALIAS = re.compile(r"T\d+$")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.get(username="alice")
+        cls.bob = User.objects.get(username="bob")
+        for _ in range(3):
+            Message.objects.create(sender=cls.bob, recipient=cls.alice, content="hi")
+            Message.objects.create(sender=cls.alice, recipient=cls.bob, content="hey")
+            Comment.objects.create(quiz_id="q-math-hard", user=cls.bob, text="nice")
+        QuizShare.objects.create(quiz_id="q-math-hard", sender=cls.bob, recipient=cls.alice)
+        Favorite.objects.create(user=cls.alice, quiz_id="q-math-hard")
+
+    def setUp(self):
+        # Cached endpoints would otherwise answer without running any SQL
+        read_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.tables = set(connection.introspection.table_names())
+
+    def full_scans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return self.scans_in([query["sql"] for query in ctx.captured_queries])
+
+    def scans_in(self, statements):
+        scans = []
+        with connection.cursor() as cursor:
+            for sql in statements:
+                if not sql.startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for *_, detail in cursor.fetchall():
+                    match = re.match(r"SCAN (\S+)", detail)
+                    if not match or "USING" in detail:
+                        continue
+                    target = match.group(1)
+                    if target in self.tables or self.ALIAS.match(target):
+                        scans.append(f"{detail}  <-  {sql[:120]}")
+        return scans
+
+    def assertIndexed(self, url):
+        scans = self.full_scans(url)
+        self.assertEqual(scans, [], f"{url} falls back to a full table scan")
+
+    def test_message_endpoints(self):
+        self.assertIndexed("/api/messages/")
+        self.assertIndexed(f"/api/messages/conversation/?user_id={self.bob.id}")
+        self.assertIndexed("/api/messages/conversations/")
+        self.assertIndexed("/api/messages/unread/")
+
+    def test_share_endpoints(self):
+        self.assertIndexed("/api/quiz-shares/")
+        self.assertIndexed(f"/api/quiz-shares/?partner={self.bob.id}")
+        self.assertIndexed("/api/quiz-shares/received/")
+
+    def test_favorites(self):
+        self.assertIndexed("/api/favorites/")
+
+    def test_quiz_listing_by_author_and_newest(self):
+        self.assertIndexed("/api/quizzes/?author=alice")
+        self.assertIndexed("/api/quizzes/?ordering=newest")
+
+    def test_quiz_children(self):
+        self.assertIndexed("/api/quizzes/q-math-hard/comments/")
+        self.assertIndexed("/api/quizzes/q-math-hard/questions/?limit=2")
+        self.assertIndexed("/api/quizzes/q-math-hard/header/")
+
+    def test_user_prefix_search(self):
+        self.assertIndexed("/api/users/?prefix=al")
+
+    def test_detector_catches_a_full_scan(self):
+        unindexed = Message.objects.filter(is_read=True)
+        self.assertNotEqual(self.scans_in([str(unindexed.query)]), [])
+
+
+class QuizActionQueryTests(TestCase):
+    """Detail actions must not load a quiz's questions unless they use them.
+
+    Each action runs against a 5-question and a 300-question quiz and has
+    to issue the same statements for both.
+    """
+
+    QUESTION_TABLES = ('"quizzes_question"', '"quizzes_choice"', '"quizzes_gap"')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.get(username="alice")
+        big = Quiz.objects.create(id="q-big", name="Big", author=cls.alice, question_count=300)
+        questions = Question.objects.bulk_create(
+            [Question(id=f"q-big-{n}", quiz=big, text=f"Question {n}", order=n) for n in range(300)]
+        )
+        Choice.objects.bulk_create(
+            [Choice(question=q, index=i, text=str(i), is_correct=i == 0) for q in questions for i in range(4)]
+        )
+
+    def setUp(self):
+        read_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def queries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.content)
+        return [query["sql"] for query in ctx.captured_queries]
+
+    def assertSamePlan(self, method, path, data=None):
+        small = self.queries(method, f"/api/quizzes/q-math-hard/{path}", data)
+        big = self.queries(method, f"/api/quizzes/q-big/{path}", data)
+        self.assertEqual(len(small), len(big))
+        reads = [sql for sql in big if sql.startswith("SELECT")]
+        self.assertEqual([sql for sql in reads if any(t in sql for t in self.QUESTION_TABLES)], [])
+        return big
+
+    def test_reactions_never_load_the_quiz(self):
+        sql = self.assertSamePlan("post", "like/", {"previous": None, "current": "like"})
+        self.assertEqual(len(sql), 6)  # UPDATE, change feed row, SELECT likes/dislikes
+        self.assertIn('SELECT "quizzes_quiz"."likes", "quizzes_quiz"."dislikes" FROM', sql[-1])
+        self.assertEqual(
+            self.client.post("/api/quizzes/q-big/dislike/", {"previous": "like", "current": "dislike"}, format="json").json(),
+            {"likes": 0, "dislikes": 1},
+        )
+        self.assertEqual(self.client.post("/api/quizzes/missing/like/", {"current": "like"}, format="json").status_code, 404)
+
+    def test_comments_only_check_the_quiz_exists(self):
+        sql = self.assertSamePlan("post", "comments/", {"text": "hi"})
+        self.assertEqual(len(sql), 3)  # EXISTS, INSERT comment, UPDATE comment_count
+        self.assertTrue(sql[0].startswith('SELECT 1 AS "a" FROM "quizzes_quiz"'))
+        self.assertEqual(len(self.assertSamePlan("get", "comments/")), 2)
+
+    def test_update_locks_only_the_quiz_row(self):
+        payload = {"name": "Renamed", "tags": [], "questions": [
+            {"text": "Only", "options": [{"index": 0, "text": "a", "is_correct": True}]},
+        ]}
+        # Replacing the questions scales with the quiz; reading it must not
+        sql = self.queries("put", "/api/quizzes/q-big/", payload)
+        before_writes = sql[:next(n for n, q in enumerate(sql) if q.startswith("UPDATE"))]
+        self.assertEqual([q for q in before_writes if q.startswith("SELECT")][0].count("FROM"), 1)
+        self.assertFalse(any(t in q for q in before_writes for t in self.QUESTION_TABLES))
+        # The response is read once, after the questions were replaced
+        self.assertEqual(len([q for q in sql if q.startswith('SELECT "quizzes_choice"')]), 1)
+        self.assertEqual(self.client.get("/api/quizzes/q-big/").json()["name"], "Renamed")
+
+    def test_delete_fetches_only_the_author(self):
+        sql = self.queries("delete", "/api/quizzes/q-big/")
+        first = next(q for q in sql if q.startswith("SELECT"))
+        self.assertTrue(first.startswith('SELECT "quizzes_quiz"."id", "quizzes_quiz"."author_id" FROM'))
+        self.assertFalse(any(q.startswith('SELECT "quizzes_choice"') for q in sql))
+        self.assertFalse(Quiz.objects.filter(id="q-big").exists())
+
+        self.client.force_authenticate(User.objects.get(username="bob"))
+        self.assertEqual(self.client.delete("/api/quizzes/q-math-hard/").status_code, 403)
+        self.assertEqual(self.client.put("/api/quizzes/q-math-hard/", {"name": "x", "questions": []}, format="json").status_code, 403)
+
+
+class AdminScaleTests(TestCase):
+    """Admin pages must not scale with the size of the tables they list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("root", "root@example.com", "pw")
+        big = Quiz.objects.create(id="q-big", name="Big", author=cls.admin, question_count=60)
+        Question.objects.bulk_create(
+            [Question(id=f"q-big-{n:02}", quiz=big, text=f"Question {n}", order=n) for n in range(60)]
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_question_inline_is_paginated(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/admin/quizzes/quiz/q-big/change/")
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn("Question 24", content)
+        self.assertNotIn("Question 25", content)
+        self.assertIn("?questions_page=3", content)
+        self.assertFalse(any("COUNT(" in q["sql"] and "quizzes_question" in q["sql"] for q in ctx.captured_queries))
+        # Authors and tags are picked by autocomplete, not a <select> of every row
+        self.assertNotIn('<option value="%d">' % self.admin.pk, content)
+
+        content = self.client.get("/admin/quizzes/quiz/q-big/change/?questions_page=3").content.decode()
+        self.assertIn("Question 59", content)
+        self.assertNotIn("Question 24<", content)
+
+    def test_change_lists_join_instead_of_querying_per_row(self):
+        quiz = Quiz.objects.get(id="q-math-hard")
+        Comment.objects.bulk_create([Comment(quiz=quiz, user=self.admin, text=str(n)) for n in range(30)])
+        for url in ("/admin/quizzes/comment/", "/admin/quizzes/choice/", "/admin/quizzes/question/"):
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertLess(len(ctx.captured_queries), 12, url)
+
+        response = self.client.get("/admin/quizzes/comment/?quiz=q-big")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "?quiz=q-big")  # the selected quiz is always offered
+
+    def test_counts_are_estimated_past_the_limit(self):
+        from . import admin as quiz_admin
+
+        with mock.patch.object(quiz_admin, "EXACT_COUNT_LIMIT", 10):
+            unfiltered = quiz_admin.EstimatedCountPaginator(Question.objects.all(), 5)
+            filtered = quiz_admin.EstimatedCountPaginator(Question.objects.filter(quiz_id="q-big"), 5)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertGreaterEqual(unfiltered.count, Question.objects.count())
+                self.assertEqual(filtered.count, 10)
+        self.assertNotIn("COUNT(*) FROM \"quizzes_question\"", " ".join(q["sql"] for q in ctx.captured_queries))
+
+
+class CachedAuthTests(TestCase):
+    """Session and user lookups are served from the cache on repeat requests."""
+
+    def setUp(self):
+        cache.clear()
+        caches["shared"].clear()
+        self.client = Client()
+        self.assertTrue(self.client.login(username="alice", password="alice123"))
+        self.client.get("/api/auth/current-user/")  # warm the cache
+
+    def test_repeat_request_skips_session_and_user_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/current-user/")
+        self.assertEqual(response.json()["user"]["username"], "alice")
+
+    def test_password_change_logs_out_other_sessions(self):
+        user = User.objects.get(username="alice")
+        user.set_password("another-password")
+        user.save()
+        self.assertIsNone(self.client.get("/api/auth/current-user/").json()["user"])
+
+    def test_deleted_user_is_not_served_from_cache(self):
+        User.objects.filter(username="alice").delete()
+        self.assertIsNone(self.client.get("/api/auth/current-user/").json()["user"])
+
+    def test_logout_drops_cached_user(self):
+        self.client.post("/api/auth/logout/")
+        self.assertIsNone(caches["shared"].get(user_cache_key(User.objects.get(username="alice").pk)))
+
+    def test_deactivation_reaches_other_workers(self):
+        # Another worker's per-process cache is empty; the shared entry is
+        # what it would read
+        User.objects.filter(username="alice").update(is_active=False)
+        cache.clear()
+        self.assertEqual(self.client.get("/api/auth/current-user/").json()["user"]["username"], "alice")
+        User.objects.get(username="alice").save()  # any save() invalidates
+        self.assertIsNone(self.client.get("/api/auth/current-user/").json()["user"])
+
+    def test_password_hashes_stay_out_of_the_cache(self):
+        alice = User.objects.get(username="alice")
+        entry = caches["shared"].get(user_cache_key(alice.pk))
+        self.assertNotIn("password", entry["fields"])
+        self.assertNotIn(alice.password, repr(entry))
+
+        # The cached user loads the deferred password instead of blanking it
+        user = CachedModelBackend().get_user(alice.pk)
+        self.assertEqual(user.get_deferred_fields(), {"password"})
+        user.first_name = "Alice"
+        user.save()
+        self.assertTrue(User.objects.get(pk=alice.pk).check_password("alice123"))
+
+    def test_logout_ends_the_session_in_every_worker(self):
+        key = "django.contrib.sessions.cached_db" + self.client.session.session_key
+        self.assertIsNotNone(caches["shared"].get(key))
+        self.client.post("/api/auth/logout/")
+        self.assertIsNone(caches["shared"].get(key))
+
+    def test_sessions_from_the_plain_model_backend_still_resolve(self):
+        client = Client()
+        with override_settings(AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.ModelBackend"]):
+            self.assertTrue(client.login(username="alice", password="alice123"))
+        self.assertEqual(client.get("/api/auth/current-user/").json()["user"]["username"], "alice")
+
+    def test_failed_login_checks_the_password_once(self):
+        with mock.patch("django.contrib.auth.hashers.PBKDF2PasswordHasher.verify", return_value=False) as verify:
+            self.assertFalse(Client().login(username="alice", password="wrong"))
+        self.assertEqual(verify.call_count, 1)
+
+
+class TwoTierCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = TwoTierCache(alias="default")
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def produce():
+            calls.append(1)
+            time.sleep(0.05)
+            return {"value": 42}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_set("quizzes", "k", produce)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"value": 42}] * 8)
+        stats = self.cache.stats()["namespaces"]["quizzes"]
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["coalesced"], 7)
+
+    def test_invalidation_reaches_other_processes(self):
+        other = TwoTierCache(alias="default")  # same shared tier, own LRU
+        self.cache.get_or_set("tags", "list", lambda: ["old"])
+        self.assertEqual(other.get_or_set("tags", "list", lambda: ["unused"]), ["old"])
+
+        self.cache.invalidate("tags")
+        self.assertEqual(self.cache.get_or_set("tags", "list", lambda: ["new"]), ["new"])
+        with mock.patch("quizzes.caching.VERSION_CHECK_INTERVAL", 0):
+            self.assertEqual(other.get_or_set("tags", "list", lambda: ["unused"]), ["new"])
+
+    def test_concurrent_invalidations_never_share_a_version(self):
+        self.cache.invalidate("tags")
+        first = self.cache.version("tags")
+        self.cache.invalidate("tags")
+        self.assertNotEqual(self.cache.version("tags"), first)
+
+    def test_shared_tier_add_has_one_winner(self):
+        shared = caches["shared"]
+        self.assertTrue(shared._dir.startswith(_shared_cache["location"]))
+        results = []
+        threads = [threading.Thread(target=lambda n=n: results.append(shared.add("lock:k", n, 10))) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+        # An expired entry is replaced, a live one is not
+        shared.set("lock:dead", "old", -1)
+        self.assertTrue(shared.add("lock:dead", "new", 10))
+        self.assertFalse(shared.add("lock:dead", "newer", 10))
+        self.assertEqual(shared.get("lock:dead"), "new")
+
+    def test_value_depends_on_every_namespace(self):
+        self.cache.get_or_set(("favorites:1", "quizzes"), "list", lambda: "v1")
+        self.cache.invalidate("quizzes")
+        self.assertEqual(self.cache.get_or_set(("favorites:1", "quizzes"), "list", lambda: "v2"), "v2")
+
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        read_cache.clear()
+        identity.clear()
+        self.alice = User.objects.get(username="alice")
+
+    def test_quiz_list_resolves_authors_and_tags_without_joins(self):
+        self.client.get("/api/quizzes/")
+        read_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            quizzes = self.client.get("/api/quizzes/").json()
+        sql = [q["sql"] for q in ctx.captured_queries]
+        self.assertFalse(any('"auth_user"' in q or 'FROM "quizzes_tag"' in q for q in sql), sql)
+        self.assertEqual(next(q for q in quizzes if q["id"] == "q-math-hard")["author"], "alice")
+
+    def test_edits_reach_other_processes_within_the_check_interval(self):
+        other = IdentityCache()  # another worker's cache
+        self.assertEqual(other.get(User, self.alice.pk).username, "alice")
+
+        self.alice.username = "alicia"
+        self.alice.save()
+        self.assertEqual(identity.get(User, self.alice.pk).username, "alicia")
+        with mock.patch("quizzes.identity.CHECK_INTERVAL", 60), self.assertNumQueries(0):
+            self.assertEqual(other.get(User, self.alice.pk).username, "alice")
+        with mock.patch("quizzes.identity.CHECK_INTERVAL", 0):
+            self.assertEqual(other.get(User, self.alice.pk).username, "alicia")
+
+        self.assertIsNone(other.get(Quiz, "missing"))
+        Quiz.objects.filter(id="q-math-hard").delete()
+        with mock.patch("quizzes.identity.CHECK_INTERVAL", 0):
+            self.assertIsNone(other.get(Quiz, "q-math-hard"))
+
+    def test_an_edit_drops_only_its_own_bucket(self):
+        other = IdentityCache()
+        bob = next(
+            user for user in User.objects.exclude(pk=self.alice.pk)
+            if bucket("auth.user", user.pk) != bucket("auth.user", self.alice.pk)
+        )
+        other.get_many(User, [self.alice.pk, bob.pk])
+
+        self.alice.username = "alicia"
+        self.alice.save()
+        self.assertEqual(
+            IdentityVersion.objects.filter(name__startswith="auth.user:").count(), 1
+        )
+        with mock.patch("quizzes.identity.CHECK_INTERVAL", 0), self.assertNumQueries(2):
+            # The version check and a reload of alice only
+            rows = other.get_many(User, [self.alice.pk, bob.pk])
+        self.assertEqual(rows[self.alice.pk].username, "alicia")
+        self.assertEqual(rows[bob.pk].username, bob.username)
+
+    def test_logins_do_not_flush_the_cache(self):
+        identity.get(User, self.alice.pk)
+        self.assertTrue(self.client.login(username="alice", password="alice123"))
+        with mock.patch("quizzes.identity.CHECK_INTERVAL", 60), self.assertNumQueries(0):
+            identity.get(User, self.alice.pk)
+
+
+class DuplicateDetectionTests(TestCase):
+    QUESTIONS = [
+        "Which planet in our solar system has the most moons orbiting it?",
+        "What is the chemical symbol for the element gold on the periodic table?",
+        "Who painted the ceiling of the Sistine Chapel in Vatican City?",
+        "In which year did the first person walk on the surface of the Moon?",
+    ]
+
+    def setUp(self):
+        read_cache.clear()
+        identity.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+
+    def create(self, name, texts):
+        questions = [
+            {"text": text, "options": [{"index": 0, "text": "A", "is_correct": True}, {"index": 1, "text": "B", "is_correct": False}]}
+            for text in texts
+        ]
+        response = self.client.post("/api/quizzes/", {"name": name, "questions": questions}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_copied_quiz_is_flagged_and_listed(self):
+        original = self.create("Trivia", self.QUESTIONS)
+        self.assertIsNone(original["duplicate_warning"])
+
+        # Reordered, punctuation and case changed
+        copy = self.create("Trivia (copy)", [text.upper().rstrip("?") for text in reversed(self.QUESTIONS)])
+        warning = copy["duplicate_warning"]
+        self.assertEqual(warning["quizzes"][0]["id"], original["id"])
+        self.assertEqual(warning["quizzes"][0]["author"], "alice")
+        self.assertEqual(len(warning["questions"]), 4)
+
+        # Rebuilding the index gives the same answer
+        out = StringIO()
+        call_command("index_similarity", "--quiz", original["id"], "--quiz", copy["id"], stdout=out)
+        self.assertIn("Indexed 2", out.getvalue())
+
+        with CaptureQueriesContext(connection) as ctx:
+            report = self.client.get(f"/api/quizzes/{original['id']}/duplicates/").json()
+        self.assertEqual([quiz["id"] for quiz in report["quizzes"]], [copy["id"]])
+        matched = {q["text"]: q["duplicates"][0]["quiz"]["id"] for q in report["questions"]}
+        self.assertEqual(matched, {text: copy["id"] for text in self.QUESTIONS})
+        lookups = [q["sql"] for q in ctx.captured_queries if '"quizzes_similaritybucket"' in q["sql"]]
+        self.assertTrue(lookups)
+        with connection.cursor() as cursor:
+            for sql in lookups:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+                self.assertFalse([step for step in plan if step.startswith("SCAN quizzes_similarity")], plan)
+
+    def test_repeated_question_within_a_quiz(self):
+        quiz = self.create("Repeats", [self.QUESTIONS[0], "Which planet of our solar system has the most moons orbiting it", "Unrelated"])
+        # Each of the pair is reported as the other's duplicate
+        self.assertEqual(len(quiz["duplicate_warning"]["questions"]), 2)
+        self.assertEqual(quiz["duplicate_warning"]["quizzes"], [])
+
+    def test_crowded_buckets_are_read_in_bounded_slices(self):
+        quizzes = [self.create(f"Quiz {n}", ["True or false?", self.QUESTIONS[n % 4] + str(n)]) for n in range(5)]
+        kind = similarity.SimilaritySignature.QUESTION
+        keys = similarity.band_keys(kind, similarity.signature("True or false?"))
+        first_two = set(
+            similarity.SimilaritySignature.objects.filter(kind=kind, quiz_id__in=[q["id"] for q in quizzes[:2]])
+            .filter(buckets__key__in=keys)
+            .values_list("id", flat=True)
+        )
+
+        with mock.patch.object(similarity, "PER_KEY", 2), CaptureQueriesContext(connection) as ctx:
+            rows = similarity._bucket_rows(keys)
+            duplicates = similarity.duplicate_questions(quizzes[-1]["id"])
+        self.assertEqual(len(rows), 2 * len(set(keys)))
+        self.assertEqual({signature_id for _, signature_id in rows}, first_two)
+        # Still flagged, against the earliest copies
+        self.assertEqual({quiz for _, _, quiz in next(iter(duplicates.values()))}, {q["id"] for q in quizzes[:2]})
+
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + ctx.captured_queries[0]["sql"])
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertFalse([step for step in plan if step.startswith("SCAN quizzes_similarity")], plan)
+        self.assertIn("key=?", " ".join(plan))
+
+    def test_unrelated_quizzes_are_not_flagged(self):
+        self.create("Trivia", self.QUESTIONS)
+        other = self.create("Cooking", [
+            "How long should you rest a steak after cooking it on a hot grill?",
+            "Which herb is the main ingredient of a classic Genovese pesto sauce?",
+        ])
+        self.assertIsNone(other["duplicate_warning"])
+        response = self.client.get(f"/api/quizzes/{other['id']}/duplicates/", {"threshold": 2})
+        self.assertEqual(response.status_code, 400)
+
+
+calls = []
+
+
+@jobs.task("tests.record", max_attempts=2)
+def record_call(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError("boom")
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def age_heartbeat(self, job, seconds):
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def test_claims_by_priority_once(self):
+        low = jobs.enqueue("tests.record", {"value": "low"})
+        high = jobs.enqueue("tests.record", {"value": "high"}, priority=5)
+        self.assertEqual(jobs.enqueue("tests.record", {"value": "x"}, idempotency_key="k").pk,
+                         jobs.enqueue("tests.record", {"value": "y"}, idempotency_key="k").pk)
+
+        first = jobs.claim("w1")
+        self.assertEqual((first.pk, first.status, first.attempts), (high.pk, BackgroundJob.RUNNING, 1))
+        self.assertIsNotNone(first.heartbeat_at)
+        self.assertEqual(jobs.claim("w2").pk, low.pk)
+        self.assertTrue(jobs.execute(first))
+        self.assertEqual(BackgroundJob.objects.get(pk=high.pk).status, BackgroundJob.DONE)
+        self.assertEqual(calls, ["high"])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue("tests.record", {"value": 1, "fail": True})
+        with self.assertLogs("quizzes.jobs", "WARNING"):
+            self.assertFalse(jobs.execute(jobs.claim("w")))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), (BackgroundJob.QUEUED, 1, ""))
+        self.assertIn("boom", job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIsNone(jobs.claim("w"))  # still backing off
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("quizzes.jobs", "WARNING"):
+            jobs.execute(jobs.claim("w"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (BackgroundJob.FAILED, 2))
+
+    def test_only_jobs_without_heartbeat_are_recovered(self):
+        job = jobs.enqueue("tests.record", {"value": 1})
+        running = jobs.claim("w1")
+        BackgroundJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(600), (0, 0))  # long-running, but alive
+
+        self.age_heartbeat(job, 601)
+        self.assertEqual(jobs.requeue_stale(600), (1, 0))
+        rerun = jobs.claim("w2")
+        self.assertEqual(rerun.attempts, 2)
+
+        # The first worker wakes up: its outcome must not overwrite the rerun
+        with self.assertLogs("quizzes.jobs", "WARNING"):
+            self.assertFalse(jobs.execute(running))
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).status, BackgroundJob.RUNNING)
+
+        self.age_heartbeat(job, 601)
+        self.assertEqual(jobs.requeue_stale(600), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertIn("heartbeat", job.last_error)
+
+
+    def test_workers_beat_within_their_stale_window(self):
+        jobs.enqueue("tests.record", {"value": 1})
+        with mock.patch.object(jobs, "Heartbeat", wraps=jobs.Heartbeat) as heartbeat:
+            jobs.run_worker(threading.Event(), once=True, stale_after=30)
+        self.assertEqual(heartbeat.call_args.kwargs["interval"], 10)
+        self.assertEqual(calls, [1])
+
+
+class ExportTests(TestCase):
+    url = "/api/quizzes/q-math-hard/export/"
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        return response, b"".join(response.streaming_content) if response.streaming else response.content
+
+    def test_parse_byte_range(self):
+        self.assertEqual(parse_byte_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_byte_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_byte_range("bytes=95-200", 100), (95, 99))
+        self.assertEqual(parse_byte_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_byte_range("bytes=-500", 100), (0, 99))
+        for bad in ("bytes=100-", "bytes=5-2", "bytes=-0", "bytes=a-b", "bytes="):
+            self.assertEqual(parse_byte_range(bad, 100), (None, None), bad)
+
+    def test_full_download_can_be_verified_and_resumed(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        etag = response["ETag"]
+        self.assertEqual(json.loads(body)["id"], "q-math-hard")
+
+        # Resume after the first 10 bytes
+        response, rest = self.get(Range="bytes=10-", If_Range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-{len(body) - 1}/{len(body)}")
+        self.assertEqual(int(response["Content-Length"]), len(rest))
+        self.assertEqual(body[:10] + rest, body)
+
+        response, tail = self.get(Range="bytes=-5")
+        self.assertEqual((response.status_code, tail), (206, body[-5:]))
+
+    def test_one_pass_backs_the_headers_and_the_body(self):
+        exporter = mock.Mock(wraps=exporters.iter_quiz_json)
+        with mock.patch.dict(exporters.EXPORTERS, {"json": (exporter, "application/json")}):
+            response, body = self.get()
+            partial, rest = self.get(Range="bytes=10-")
+        self.assertEqual(exporter.call_count, 2)
+        self.assertEqual(response["ETag"], f'"{hashlib.sha1(body).hexdigest()}"')
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        self.assertEqual((partial.status_code, rest), (206, body[10:]))
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        _, body = self.get()
+        response, _ = self.get(Range=f"bytes={len(body)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(body)}")
+
+        # The quiz changed since the client's copy: start over
+        response, again = self.get(Range="bytes=10-", If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(again, body)
+
+    def test_csv_rows(self):
+        response = self.client.get(self.url, {"format": "csv"})
+        rows = list(csv.reader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][:3], ["question_id", "order", "text"])
+        options = Choice.objects.filter(question__quiz_id="q-math-hard").count()
+        self.assertEqual(len(rows) - 1, options)
+
+
+class ImportTests(TestCase):
+    CSV = (
+        "question_id,text,option_index,option_text,option_is_correct\n"
+        "a,Capital of France?,0,Paris,1\n"
+        "a,Capital of France?,1,Lyon,0\n"
+        "b,No correct option,0,x,0\n"
+        "c,Bad flag,0,y,maybe\n"
+        "d,Largest ocean?,0,Pacific,yes\n"
+    )
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp(prefix="quizwizz-media-")
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+
+    def upload(self, filename, content, **data):
+        return self.client.post(
+            "/api/quizzes/import/", {"file": SimpleUploadedFile(filename, content.encode()), **data}, format="multipart"
+        )
+
+    def test_parsers_stream_groups(self):
+        meta, total, groups = import_rows.parse_csv(BytesIO(self.CSV.encode()))
+        groups = list(groups)
+        self.assertEqual((meta, total, len(groups)), ({}, 4, 4))
+        self.assertEqual([line for line, _ in groups[0]], [2, 3])
+
+        document = {"questions": [{"text": "Q", "options": ["a", "b"], "correct_indices": [1]}], "name": "After"}
+        with mock.patch.object(import_rows, "READ_SIZE", 5):
+            meta, total, groups = import_rows.parse_json(BytesIO(json.dumps(document).encode()))
+            self.assertEqual((meta, total), ({"name": "After"}, 1))
+            self.assertEqual(list(groups), [[(1, document["questions"][0])]])
+
+        for bad in (b"", b'{"name": "x"}', b"[1,", b"[1] trailing", b"\xff"):
+            with self.assertRaises(import_rows.ImportFormatError, msg=bad):
+                import_rows.parse_json(BytesIO(bad))
+        with self.assertRaises(import_rows.ImportFormatError):
+            import_rows.parse_csv(BytesIO(b"question,answer\n1,2\n"))
+
+    def test_import_reports_row_errors(self):
+        job = self.upload("bank.csv", self.CSV, name="Bank").json()
+        self.assertEqual(job["status"], ImportJob.PENDING)
+        jobs.execute(jobs.claim("w"))
+
+        job = self.client.get(f"/api/quizzes/import/{job['id']}/").json()
+        self.assertEqual(job["status"], ImportJob.DONE)
+        self.assertEqual((job["total_rows"], job["processed_rows"]), (4, 4))
+        self.assertEqual((job["imported_questions"], job["error_count"]), (2, 3))
+        self.assertEqual(
+            job["errors"],
+            [
+                {"row": 4, "error": "question needs at least one correct option"},
+                {"row": 5, "error": "is_correct must be true/false, got 'maybe'"},
+                {"row": 5, "error": "question needs at least one option"},
+            ],
+        )
+        quiz = Quiz.objects.get(id=job["quiz_id"])
+        self.assertEqual((quiz.name, quiz.question_count), ("Bank", 2))
+        self.assertEqual(list(quiz.questions.order_by("order").values_list("text", flat=True)),
+                         ["Capital of France?", "Largest ocean?"])
+        self.assertEqual(os.listdir(os.path.join(self.media, "imports")), [])
+
+    def test_unreadable_file_fails_the_job(self):
+        job = self.upload("bank.json", '{"questions": [')
+        jobs.execute(jobs.claim("w"))
+        job = ImportJob.objects.get(id=job.json()["id"])
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn("Invalid JSON", job.detail)
+        self.assertIsNone(job.quiz_id)
+
+    def test_oversized_and_foreign_uploads_are_refused(self):
+        with mock.patch("quizzes.views.MAX_UPLOAD_SIZE", 10):
+            self.assertEqual(self.upload("bank.csv", self.CSV).status_code, 413)
+        self.assertEqual(self.upload("bank.txt", self.CSV).status_code, 400)
+        other = Quiz.objects.exclude(author__username="alice").first()
+        self.assertEqual(self.upload("bank.csv", self.CSV, quiz_id=other.id).status_code, 403)
+        self.assertFalse(ImportJob.objects.exists())
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.store = TokenBucketStore(clock=lambda: self.now)
+
+    def test_bucket_allows_a_burst_then_refills(self):
+        # 3 requests per minute: one token every 20 s
+        self.assertEqual([self.store.consume("k", 3, 3 / 60) for _ in range(3)], [0.0] * 3)
+        self.assertAlmostEqual(self.store.consume("k", 3, 3 / 60), 20.0)
+        self.now = 20.0
+        self.assertEqual(self.store.consume("k", 3, 3 / 60), 0.0)
+        self.assertEqual(self.store.consume("other", 3, 3 / 60), 0.0)
+
+    def test_sweeps_are_rate_limited(self):
+        self.store.SWEEP_THRESHOLD = 3
+        with mock.patch.object(self.store, "_sweep", wraps=self.store._sweep) as sweep:
+            # Every bucket is busy until t=1, so sweeping frees nothing
+            for n in range(50):
+                self.store.consume(n, 1, 1)
+            self.assertEqual((sweep.call_count, len(self.store)), (1, 50))
+            self.now = 1.0
+            self.store.consume("late", 1, 1)
+            self.assertEqual(sweep.call_count, 2)
+        self.assertEqual(len(self.store), 1)
+
+    def test_throttled_endpoint_returns_429(self):
+        default_store.clear()
+        self.addCleanup(default_store.clear)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="alice"))
+        url = "/api/quizzes/q-math-hard/comments/"
+        statuses = [client.post(url, {"text": f"c{n}"}, format="json").status_code for n in range(11)]
+        self.assertEqual(statuses[:10], [201] * 10)
+        self.assertEqual(statuses[10], 429)
+        self.assertIn("Retry-After", client.post(url, {"text": "again"}, format="json"))
+        # Reads on the same action are never throttled
+        self.assertEqual(client.get(url).status_code, 200)
+
+
+class CompressionTests(TestCase):
+    url = "/api/quizzes/"
+
+    def setUp(self):
+        read_cache.clear()
+        # The seeded catalog is smaller than the default threshold
+        patcher = mock.patch.object(middleware.CompressionMiddleware, "min_size", 200)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_renderer_matches_the_stdlib_output(self):
+        data = {"id": 1, "price": Decimal("1.5"), "nested": [{"a": None}], 2: "non-str key"}
+        fast = json.loads(FastJSONRenderer().render(data))
+        self.assertEqual(fast, json.loads(JSONRenderer().render(data)))
+        self.assertEqual(FastJSONParser().parse(BytesIO(b'{"x": [1, 2]}')), {"x": [1, 2]})
+
+    def test_renderer_keeps_drf_datetimes_and_escaping(self):
+        moment = timezone.now().replace(microsecond=123456)
+        data = {"created_at": moment, "text": "line\u2028break\u2029end"}
+        rendered = FastJSONRenderer().render(data)
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertIn(b'"created_at":"%sZ"' % moment.replace(tzinfo=None).isoformat().encode(), rendered)
+        self.assertIn(b"line\\u2028break\\u2029end", rendered)
+
+    @unittest.skipUnless(middleware.brotli, "brotli is not installed")
+    def test_brotli_responses_are_padded(self):
+        plain = self.client.get(self.url).content
+        lengths = set()
+        for _ in range(10):
+            response = self.client.get(self.url, headers={"Accept-Encoding": "gzip, br"})
+            self.assertEqual(response["Content-Encoding"], "br")
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(middleware.brotli.decompress(response.content), plain)
+            self.assertEqual(int(response["Content-Length"]), len(response.content))
+            lengths.add(len(response.content))
+        self.assertGreater(len(lengths), 1)
+
+    def test_gzip_and_identity_fallbacks(self):
+        plain = self.client.get(self.url).content
+        response = self.client.get(self.url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain)
+        # Small responses and ranged downloads are sent as-is
+        small = self.client.get("/api/quizzes/missing/", headers={"Accept-Encoding": "gzip, br"})
+        self.assertFalse(small.has_header("Content-Encoding"))
+        export = self.client.get("/api/quizzes/q-math-hard/export/", headers={"Accept-Encoding": "gzip, br"})
+        self.assertFalse(export.has_header("Content-Encoding"))
+
+
+class CachedEndpointTests(TestCase):
+    def setUp(self):
+        read_cache.clear()
+        self.client = APIClient()
+
+    def test_quiz_list_is_cached_until_a_quiz_changes(self):
+        self.client.get("/api/quizzes/")
+        with self.assertNumQueries(0):
+            self.client.get("/api/quizzes/")
+
+        quiz = Quiz.objects.get(id="q-math-hard")
+        quiz.name = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            quiz.save()
+        names = [row["name"] for row in self.client.get("/api/quizzes/").json()]
+        self.assertIn("Renamed", names)
+
+    def test_new_user_shows_up_in_directory(self):
+        self.client.get("/api/users/?prefix=a")
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username="aaron", password="x")
+        usernames = [u["username"] for u in self.client.get("/api/users/?prefix=a").json()["users"]]
+        self.assertIn("aaron", usernames)
+
+
+class UserDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ("Alma", "albert", "ALVIN", "alžběta", "zed"):
+            User.objects.create_user(username=name, password="x")
+
+    def setUp(self):
+        read_cache.clear()
+
+    def search(self, **params):
+        return self.client.get("/api/users/", params).json()
+
+    def test_prefix_search_is_case_insensitive_and_paged(self):
+        first = self.search(prefix="AL", page_size=2)
+        rest = self.search(prefix="AL", page_size=2, page=first["next_page"])
+        last = self.search(prefix="AL", page_size=2, page=rest["next_page"])
+        names = [u["username"] for page in (first, rest, last) for u in page["users"]]
+        self.assertEqual(names, ["albert", "alice", "Alma", "ALVIN", "alžběta"])
+        self.assertIsNone(last["next_page"])
+        self.assertEqual(set(first["users"][0]), {"id", "username"})
+        self.assertEqual(self.search(prefix="alž")["users"][0]["username"], "alžběta")
+
+    def test_renames_follow_the_user(self):
+        user = User.objects.get(username="zed")
+        self.assertEqual(self.search(prefix="ze")["users"][0]["id"], user.pk)
+        user.username = "Zoe"
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.search(prefix="ze")["users"], [])
+        self.assertEqual(self.search(prefix="zo")["users"], [{"id": user.pk, "username": "Zoe"}])
+        # Logins save last_login only and leave the directory alone
+        with CaptureQueriesContext(connection) as ctx:
+            user.save(update_fields=["last_login"])
+        self.assertFalse(any("quizzes_userdirectoryentry" in q["sql"] for q in ctx.captured_queries))
+
+    def test_without_params_lists_everyone(self):
+        usernames = [u["username"] for u in self.search()["users"]]
+        self.assertEqual(len(usernames), User.objects.count())
+        self.assertNotIn("next_page", self.search())
+
+
+class BulkShareTests(TestCase):
+    url = "/api/quiz-shares/bulk/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+        self.bob = User.objects.get(username="bob")
+        self.charlie = User.objects.get(username="charlie")
+
+    def share(self, recipient_ids, quiz_id="q-math-hard"):
+        return self.client.post(self.url, {"quiz_id": quiz_id, "recipient_ids": recipient_ids, "message": "try"}, format="json")
+
+    def test_reports_new_existing_and_unknown_recipients(self):
+        before = Quiz.objects.get(id="q-math-hard").share_count
+        response = self.share([self.bob.id, self.charlie.id, self.bob.id, 999999])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {
+            "quiz_id": "q-math-hard",
+            "shared": [self.bob.id, self.charlie.id],
+            "already_shared": [],
+            "not_found": [999999],
+        })
+        self.assertEqual(Quiz.objects.get(id="q-math-hard").share_count, before + 2)
+        self.assertEqual(QuizShare.objects.get(recipient=self.bob, quiz_id="q-math-hard").message, "try")
+
+        again = self.share([self.bob.id])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual((again.json()["shared"], again.json()["already_shared"]), ([], [self.bob.id]))
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        users = User.objects.bulk_create([User(username=f"r{n}") for n in range(40)])
+        with CaptureQueriesContext(connection) as few:
+            self.share([u.id for u in users[:2]])
+        with CaptureQueriesContext(connection) as many:
+            self.share([u.id for u in users[2:]])
+        self.assertEqual(len(few), len(many))
+
+    def test_unknown_quiz_is_rejected(self):
+        self.assertEqual(self.share([self.bob.id], quiz_id="missing").status_code, 400)
+        self.assertEqual(self.share([]).status_code, 400)
+
+
+class AsyncEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.get(username="alice")
+        cls.bob = User.objects.get(username="bob")
+        Message.objects.create(sender=cls.bob, recipient=cls.alice, content="hi")
+        Message.objects.create(sender=cls.alice, recipient=cls.bob, content="hey")
+        QuizShare.objects.create(quiz_id="q-math-hard", sender=cls.bob, recipient=cls.alice)
+
+    def setUp(self):
+        read_cache.clear()
+        self.client.force_login(self.alice)
+
+    def test_payloads_match_the_sync_endpoints(self):
+        for sync, params in (
+            ("/api/quizzes/", {}),
+            ("/api/quizzes/q-math-hard/", {}),
+            ("/api/messages/conversation/", {"user_id": self.bob.id}),
+            ("/api/quiz-shares/received/", {}),
+            ("/api/auth/current-user/", {}),
+        ):
+            with self.subTest(sync):
+                expected = self.client.get(sync, params)
+                response = self.client.get(sync.replace("/api/", "/api/async/", 1), params)
+                self.assertEqual((expected.status_code, response.status_code), (200, 200))
+                self.assertEqual(response.json(), expected.json())
+
+    def test_errors(self):
+        self.assertEqual(self.client.get("/api/async/quizzes/missing/").status_code, 404)
+        self.assertEqual(self.client.get("/api/async/messages/conversation/").status_code, 400)
+        bad = self.client.get("/api/async/messages/conversation/", {"user_id": self.bob.id, "since": "soon"})
+        self.assertEqual(bad.status_code, 400)
+        self.assertEqual(self.client.post("/api/async/quizzes/").status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/async/auth/current-user/").json(), {"user": None})
+        self.assertEqual(self.client.get("/api/async/messages/conversation/", {"user_id": self.bob.id}).status_code, 401)
+
+
+class QuestionEndpointTests(TestCase):
+    base = "/api/quizzes/q-math-hard/questions/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+
+    def play_order(self):
+        return [row["id"] for row in self.client.get(self.base).json()["results"]]
+
+    def test_header_loads_no_questions(self):
+        with CaptureQueriesContext(connection) as ctx:
+            header = self.client.get("/api/quizzes/q-math-hard/header/").json()
+        self.assertFalse(any(re.match(r'SELECT [^()]* FROM "quizzes_(question|choice)"', q["sql"]) for q in ctx.captured_queries))
+        self.assertFalse(header["multi_answer"])
+        quiz = Quiz.objects.get(id="q-math-hard")
+        self.assertEqual((header["name"], header["question_count"]), (quiz.name, quiz.questions.count()))
+        self.assertEqual(header["author"], quiz.author.username)
+        self.assertNotIn("questions", header)
+        self.client.post(self.base, {"text": "Pick two", "options": [
+            {"index": 0, "text": "a", "is_correct": True}, {"index": 1, "text": "b", "is_correct": True},
+        ]}, format="json")
+        self.assertTrue(self.client.get("/api/quizzes/q-math-hard/header/").json()["multi_answer"])
+        self.assertEqual(self.client.get("/api/quizzes/missing/header/").status_code, 404)
+
+    def test_slices_cover_the_play_order(self):
+        full = self.play_order()
+        seen, offset = [], 0
+        while offset is not None:
+            page = self.client.get(self.base, {"offset": offset, "limit": 1}).json()
+            self.assertEqual(page["offset"], offset)
+            seen += [row["id"] for row in page["results"]]
+            offset = page["next_offset"]
+        self.assertEqual(seen, full)
+        self.assertEqual(self.client.get(self.base, {"offset": len(full)}).json()["results"], [])
+        self.assertIn("options", self.client.get(self.base, {"limit": 1}).json()["results"][0])
+        self.assertEqual(self.client.get("/api/quizzes/missing/questions/").status_code, 404)
+
+    def test_insert_keeps_ids_and_updates_count(self):
+        before = self.play_order()
+        response = self.client.post(
+            self.base,
+            {"text": "New", "order": 1, "options": [{"index": 0, "text": "a", "is_correct": True}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.play_order(), before[:1] + [response.json()["id"]] + before[1:])
+        self.assertEqual(Quiz.objects.get(id="q-math-hard").question_count, len(before) + 1)
+
+    def test_reorder_is_one_bulk_update(self):
+        order = list(reversed(self.play_order()))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.base + "reorder/", {"order": order}, format="json")
+        self.assertEqual(response.status_code, 200)
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.play_order(), order)
+
+    def test_patch_touches_only_changed_options(self):
+        qid = self.play_order()[0]
+        options = self.client.get(self.base + qid + "/").json()["options"]
+        options[1]["text"] = "changed"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(self.base + qid + "/", {"options": options}, format="json")
+        self.assertEqual(response.status_code, 200)
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("UPDATE", "INSERT", "DELETE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('"quizzes_choice"', writes[0])
+
+    def test_only_the_author_can_edit(self):
+        self.client.force_authenticate(User.objects.get(username="bob"))
+        qid = self.play_order()[0]
+        self.assertEqual(self.client.delete(self.base + qid + "/").status_code, 403)
+
+
+class GapQuestionTests(TestCase):
+    base = "/api/quizzes/q-math-hard/questions/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+
+    def test_structured_gaps_round_trip(self):
+        gaps = [
+            {"explanation": "plus", "options": [{"index": 0, "text": "+", "is_correct": True}, {"index": 1, "text": "-"}]},
+            {"options": [{"index": 2, "text": "4", "is_correct": True}, {"index": 3, "text": "5"}]},
+        ]
+        response = self.client.post(self.base, {"text": "2 _ 2 = _", "gaps": gaps}, format="json")
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body["type"], Question.FILL_GAP)
+        self.assertEqual([gap["explanation"] for gap in body["gaps"]], ["plus", ""])
+        self.assertEqual([[o["text"] for o in gap["options"]] for gap in body["gaps"]], [["+", "-"], ["4", "5"]])
+        self.assertEqual(body["correct_indices"], [0, 2])
+
+    def test_legacy_encoding_is_stored_structured(self):
+        response = self.client.post(
+            self.base,
+            {
+                "text": "_ + 1 = 2",
+                "explanation": '{"0": "one"}',
+                "options": [{"index": 0, "text": "__G0__1", "is_correct": True}, {"index": 1, "text": "__G0__2"}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        question = Question.objects.get(pk=response.json()["id"])
+        self.assertEqual(question.type, Question.FILL_GAP)
+        self.assertEqual(question.explanation, "")
+        self.assertEqual(list(question.options.values_list("text", flat=True)), ["1", "2"])
+        self.assertEqual(Gap.objects.get(question=question).explanation, "one")
+
+    def test_fill_gap_without_gaps_is_rejected(self):
+        response = self.client.post(
+            self.base, {"text": "_", "type": "fill_gap", "options": [{"index": 0, "text": "a"}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class AnswerStatsTests(TestCase):
+    url = "/api/quizzes/q-math-hard/"
+
+    def setUp(self):
+        self.client = APIClient()
+        self.addCleanup(answer_stats.flush)
+
+    def submit(self, selected_a, selected_b):
+        answers = [
+            {"question_id": "q-math-hard-a", "selected": selected_a},
+            {"question_id": "q-math-hard-b", "selected": selected_b},
+        ]
+        response = self.client.post(self.url + "answers/", {"answers": answers}, format="json")
+        self.assertEqual(response.status_code, 202)
+
+    def test_answers_are_written_in_one_batch(self):
+        for attempt in range(20):
+            self.submit([0] if attempt % 4 else [1], [attempt % 4])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(answer_stats.flush(), 40)
+        writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+        self.assertEqual(len(writes), 4)  # insert + update per stats table
+
+        self.client.force_authenticate(User.objects.get(username="alice"))
+        with self.assertNumQueries(3):
+            stats = self.client.get(self.url + "stats/").json()["questions"]
+        first = stats[0]
+        self.assertEqual((first["question_id"], first["answers"], first["correct"]), ("q-math-hard-a", 20, 15))
+        self.assertEqual(first["options"], [{"index": 0, "selections": 15}, {"index": 1, "selections": 5}])
+
+    def test_flushes_accumulate(self):
+        self.submit([0], [2])
+        answer_stats.flush()
+        self.submit([1], [2])
+        answer_stats.flush()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+        stats = self.client.get(self.url + "stats/").json()["questions"]
+        self.assertEqual([(row["answers"], row["correct"]) for row in stats], [(2, 1), (2, 2)])
+
+    def test_unknown_indices_never_reach_the_stats(self):
+        self.submit([0, 0, -3, 10**9], [2, 2])
+        answer_stats.flush()
+        picks = set(OptionStat.objects.values_list("question_id", "index", "selections"))
+        self.assertEqual(picks, {("q-math-hard-a", 0, 1), ("q-math-hard-b", 2, 1)})
+        self.assertEqual(QuestionStat.objects.get(question_id="q-math-hard-a").correct, 0)
+
+    def test_stats_are_author_only(self):
+        self.client.force_authenticate(User.objects.get(username="bob"))
+        self.assertEqual(self.client.get(self.url + "stats/").status_code, 403)
+
+
+class MessageArchiveTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.get(username="alice")
+        self.bob = User.objects.get(username="bob")
+        self.charlie = User.objects.get(username="charlie")
+        old = timezone.now() - timedelta(days=400)
+        pairs = [(self.alice, self.bob), (self.bob, self.alice)] * 6 + [(self.alice, self.charlie)] * 3
+        self.messages = Message.objects.bulk_create(
+            [Message(sender=s, recipient=r, content=f"m{n}") for n, (s, r) in enumerate(pairs)]
+        )
+        # Eight old alice/bob messages and all of alice/charlie expire
+        expired = [m.id for m in self.messages[:8] + self.messages[12:]]
+        Message.objects.filter(id__in=expired).update(created_at=old)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_archive_moves_expired_messages_in_batches(self):
+        out = StringIO()
+        call_command("archive_messages", "--batch-size", "3", stdout=out)
+        self.assertIn("Archived 11 message(s) in 4 run(s)", out.getvalue())
+        self.assertEqual(Message.objects.count(), 4)
+        self.assertEqual(MessageArchive.objects.filter(user_low=self.alice, user_high=self.bob).count(), 3)
+        # Nothing left to do the second time
+        call_command("archive_messages", stdout=StringIO())
+        self.assertEqual(MessageArchive.objects.count(), 4)
+
+    def test_history_reads_the_archive_only_on_demand(self):
+        call_command("archive_messages", stdout=StringIO())
+        url = "/api/messages/history/"
+        page = self.client.get(url, {"user_id": self.bob.id, "page_size": 3}).json()
+        self.assertEqual([m["content"] for m in page["results"]], ["m9", "m10", "m11"])
+        self.assertEqual(page["next_before_id"], self.messages[9].id)
+
+        with CaptureQueriesContext(connection) as ctx:
+            page = self.client.get(url, {"user_id": self.bob.id, "before_id": page["next_before_id"]}).json()
+        self.assertEqual([m["content"] for m in page["results"]], ["m8"])
+        self.assertEqual((page["next_before_id"], page["has_archived"]), (None, True))
+        self.assertFalse(any("data" in q["sql"] and "quizzes_messagearchive" in q["sql"] for q in ctx.captured_queries))
+
+        page = self.client.get(url, {"user_id": self.bob.id, "before_id": self.messages[8].id, "archived": 1, "page_size": 5}).json()
+        self.assertEqual([m["content"] for m in page["results"]], ["m3", "m4", "m5", "m6", "m7"])
+        self.assertTrue(all(m["archived"] for m in page["results"]))
+        self.assertEqual(page["results"][0]["sender"], {"id": self.bob.id, "username": "bob"})
+        page = self.client.get(url, {"user_id": self.bob.id, "before_id": page["next_before_id"], "archived": 1}).json()
+        self.assertEqual([m["content"] for m in page["results"]], ["m0", "m1", "m2"])
+        self.assertIsNone(page["next_before_id"])
+
+        # The hot conversation endpoint no longer sees archived rows
+        conversation = self.client.get("/api/messages/conversation/", {"user_id": self.bob.id}).json()
+        self.assertEqual(len(conversation), 4)
+
+    def test_history_requires_a_session(self):
+        url = "/api/messages/history/"
+        params = {"user_id": self.bob.id, "sender_id": self.alice.id, "archived": 1}
+        self.assertEqual(APIClient().get(url, params).status_code, 403)
+        self.assertEqual(APIClient().get("/api/messages/conversations/", {"sender_id": self.alice.id}).status_code, 403)
+
+    def test_fully_archived_partners_stay_in_the_inbox(self):
+        call_command("archive_messages", stdout=StringIO())
+        self.assertFalse(Message.objects.filter(recipient=self.charlie).exists())
+        entries = self.client.get("/api/messages/conversations/").json()["results"]
+        self.assertEqual([e["user"]["username"] for e in entries], ["bob", "charlie"])
+        self.assertEqual(entries[1]["last_message"]["content"], "m14")
+        self.assertTrue(entries[1]["archived"])
+
+        page = self.client.get("/api/messages/conversations/", {"page_size": 1, "page": 2}).json()
+        self.assertEqual([e["user"]["username"] for e in page["results"]], ["charlie"])
+        self.assertIsNone(page["next_page"])
+
+
+class ConversationListTests(TestCase):
+    url = "/api/messages/conversations/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.get(username="alice")
+        cls.bob = User.objects.get(username="bob")
+        cls.charlie = User.objects.get(username="charlie")
+        Message.objects.create(sender=cls.bob, recipient=cls.alice, content="one")
+        Message.objects.create(sender=cls.bob, recipient=cls.alice, content="two")
+        Message.objects.create(sender=cls.alice, recipient=cls.charlie, content="x" * 500)
+        Message.objects.create(sender=cls.charlie, recipient=cls.alice, content="read", is_read=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_partners_by_last_activity_with_unread_counts(self):
+        entries = self.client.get(self.url).json()["results"]
+        self.assertEqual([e["user"]["username"] for e in entries], ["charlie", "bob"])
+        self.assertEqual([e["unread_count"] for e in entries], [0, 2])
+        self.assertEqual(entries[0]["last_message"]["content"], "read")
+        self.assertEqual(entries[1]["last_message"]["content"], "two")
+
+        Message.objects.create(sender=self.alice, recipient=self.bob, content="y" * 500)
+        entries = self.client.get(self.url).json()["results"]
+        self.assertEqual(entries[0]["user"]["id"], self.bob.id)
+        self.assertEqual(entries[0]["last_message"]["sender_id"], self.alice.id)
+        self.assertEqual(len(entries[0]["last_message"]["content"]), MessageViewSet.PREVIEW_LENGTH)
+
+    def test_pages(self):
+        first = self.client.get(self.url, {"page_size": 1}).json()
+        second = self.client.get(self.url, {"page_size": 1, "page": first["next_page"]}).json()
+        self.assertEqual([e["user"]["username"] for e in first["results"] + second["results"]], ["charlie", "bob"])
+        self.assertIsNone(second["next_page"])
+
+        self.client.force_authenticate(User.objects.create_user(username="newbie", password="x"))
+        self.assertEqual(self.client.get(self.url).json(), {"results": [], "next_page": None})
+
+
+class PollingWatermarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.get(username="alice")
+        cls.bob = User.objects.get(username="bob")
+        cls.charlie = User.objects.get(username="charlie")
+        cls.old = Message.objects.create(sender=cls.bob, recipient=cls.alice, content="old")
+        cls.share = QuizShare.objects.create(quiz_id="q-math-hard", sender=cls.bob, recipient=cls.alice)
+        QuizShare.objects.create(quiz_id="q-math-hard", sender=cls.charlie, recipient=cls.alice)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def ids(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["id"] for row in response.json()]
+
+    def test_conversation_returns_only_newer_messages(self):
+        url = "/api/messages/conversation/"
+        watermark = {"user_id": self.bob.id, "since_id": self.old.id, "since": self.old.created_at.isoformat()}
+        self.assertEqual(self.ids(url, **watermark), [])
+        new = Message.objects.create(sender=self.alice, recipient=self.bob, content="new")
+        Message.objects.create(sender=self.charlie, recipient=self.alice, content="elsewhere")
+        self.assertEqual(self.ids(url, **watermark), [new.id])
+        self.assertEqual(self.ids(url, user_id=self.bob.id), [self.old.id, new.id])
+
+    def test_shares_filter_by_partner_and_watermark(self):
+        self.assertEqual(self.ids("/api/quiz-shares/", partner=self.bob.id), [self.share.id])
+        self.assertEqual(self.ids("/api/quiz-shares/", partner=self.bob.id, since_id=self.share.id), [])
+        newer = QuizShare.objects.create(quiz_id="q-math-hard", sender=self.alice, recipient=self.bob)
+        self.assertEqual(self.ids("/api/quiz-shares/", partner=self.bob.id, since_id=self.share.id), [newer.id])
+        self.assertEqual(len(self.ids("/api/quiz-shares/received/", since_id=self.share.id)), 1)
+
+    def test_malformed_watermarks_are_rejected(self):
+        url = "/api/messages/conversation/"
+        self.assertEqual(self.client.get(url, {"user_id": self.bob.id, "since": "yesterday"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"user_id": self.bob.id, "since_id": "x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/quiz-shares/", {"partner": "abc"}).status_code, 400)
+
+
+class ChangeFeedTests(TestCase):
+    url = "/api/quizzes/changes/"
+
+    def setUp(self):
+        read_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(username="alice"))
+
+    def test_client_catches_up_from_the_list_sequence(self):
+        seq = int(self.client.get("/api/quizzes/")["X-Catalog-Seq"])
+        self.client.post("/api/quizzes/q-math-hard/like/", {"previous": None, "current": "like"}, format="json")
+        created = self.client.post(
+            "/api/quizzes/",
+            {"name": "Fresh", "tags": ["brand-new"], "questions": []},
+            format="json",
+        ).json()
+        deleted = Quiz.objects.filter(author__username="alice").exclude(id__in=["q-math-hard", created["id"]]).first()
+        self.client.delete(f"/api/quizzes/{deleted.id}/")
+
+        feed = self.client.get(self.url, {"since": seq}).json()
+        self.assertFalse(feed["reset"] or feed["more"])
+        cards = {card["id"]: card for card in feed["quizzes"]}
+        self.assertEqual(set(cards), {"q-math-hard", created["id"]})
+        self.assertEqual(cards["q-math-hard"]["likes"], Quiz.objects.get(id="q-math-hard").likes)
+        self.assertEqual(cards[created["id"]]["tags"], ["brand-new"])
+        self.assertEqual(feed["deleted_quizzes"], [deleted.id])
+        self.assertEqual([tag["name"] for tag in feed["tags"]], ["brand-new"])
+
+        self.assertEqual(self.client.get(self.url, {"since": feed["seq"]}).json()["quizzes"], [])
+
+    def test_pages_follow_the_sequence(self):
+        first = self.client.get(self.url, {"since": 0, "limit": 2}).json()
+        self.assertTrue(first["more"])
+        rest = self.client.get(self.url, {"since": first["seq"], "limit": 1000}).json()
+        seen = [card["id"] for card in first["quizzes"] + rest["quizzes"]]
+        self.assertEqual(sorted(seen), sorted(Quiz.objects.values_list("id", flat=True)))
+
+    def test_compaction_drops_old_tombstones_and_resets_stale_clients(self):
+        seq = changes.latest()
+        Quiz.objects.get(id="q-math-hard").delete()
+        CatalogChange.objects.filter(deleted=True).update(changed_at=timezone.now() - timedelta(days=365))
+        self.assertEqual(changes.compact(), 1)
+        self.assertFalse(CatalogChange.objects.filter(deleted=True).exists())
+
+        self.assertTrue(self.client.get(self.url, {"since": seq}).json()["reset"])
+        self.assertFalse(self.client.get(self.url, {"since": changes.latest()}).json()["reset"])
+
+
+class CounterTests(TestCase):
+    def counts(self, quiz_id="q-math-hard"):
+        return Quiz.objects.values("question_count", "comment_count", "favorite_count", "share_count").get(id=quiz_id)
+
+    def test_write_paths_keep_counts_current(self):
+        before = self.counts()
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="bob"))
+        client.post("/api/quizzes/q-math-hard/comments/", {"text": "nice"}, format="json")
+        for _ in range(2):
+            client.post("/api/favorites/", {"quiz_id": "q-math-hard"}, format="json")
+        after = self.counts()
+        self.assertEqual(after["comment_count"], before["comment_count"] + 1)
+        self.assertEqual(after["favorite_count"], before["favorite_count"] + 1)
+
+        client.delete("/api/favorites/q-math-hard/")
+        self.assertEqual(self.counts()["favorite_count"], before["favorite_count"])
+        self.assertEqual(counters.recount(), 0)
+
+    def test_bump_never_goes_below_zero(self):
+        Quiz.objects.filter(id="q-math-hard").update(share_count=0)
+        self.assertEqual(counters.bump("q-math-hard", share_count=-1), 1)
+        self.assertEqual(self.counts()["share_count"], 0)
+        self.assertEqual(counters.bump("q-math-hard", share_count=0), 0)
+        self.assertEqual(counters.bump("missing", share_count=1), 0)
+
+    def test_deleting_a_user_recounts_other_quizzes(self):
+        bob = User.objects.get(username="bob")
+        Comment.objects.create(quiz_id="q-math-hard", user=bob, text="bye")
+        Favorite.objects.get_or_create(quiz_id="q-math-hard", user=bob)
+        counters.recount()
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.delete()
+        self.assertEqual(counters.drifted().count(), 0)
+
+    def test_repair_counters_reports_and_fixes_drift(self):
+        Quiz.objects.filter(id="q-math-hard").update(favorite_count=42)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command("repair_counters", "--verify", stdout=out)
+        self.assertIn("q-math-hard: favorite_count 42 ->", out.getvalue())
+
+        call_command("repair_counters", "--field", "favorite_count", stdout=StringIO())
+        self.assertEqual(self.counts()["favorite_count"], Favorite.objects.filter(quiz_id="q-math-hard").count())
+        out = StringIO()
+        call_command("repair_counters", "--verify", stdout=out)
+        self.assertIn("All counters match.", out.getvalue())
+
+    def test_recount_only_touches_drifted_quizzes(self):
+        Quiz.objects.filter(id="q-math-hard").update(question_count=99, comment_count=99)
+        seq = changes.latest()
+        self.assertEqual(counters.recount(), 1)
+        quiz = Quiz.objects.get(id="q-math-hard")
+        self.assertEqual(quiz.question_count, quiz.questions.count())
+        self.assertEqual(quiz.comment_count, quiz.comments.count())
+        self.assertEqual(
+            list(CatalogChange.objects.filter(seq__gt=seq).values_list("object_id", flat=True)),
+            ["q-math-hard"],
+        )
+
+        seq = changes.latest()
+        Quiz.objects.filter(id="q-math-hard").update(comment_count=99)
+        self.assertEqual(counters.recount(), 1)
+        self.assertEqual(changes.latest(), seq)
+        self.assertEqual(counters.recount(), 0)
+
+
+class LiveSessionTests(TestCase):
+    players = 500
+
+    def setUp(self):
+        default_store.clear()
+        self.addCleanup(default_store.clear)
+        self.addCleanup(live.sessions.clear)
+        self.addCleanup(answer_stats.flush)
+
+    async def start(self, client):
+        await client.aforce_login(await User.objects.aget(username="alice"))
+        response = await client.post("/api/live/", {"quiz_id": "q-math-hard"}, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["code"]
+
+    async def test_live_game_with_many_players(self):
+        host, client = AsyncClient(), AsyncClient()
+        code = await self.start(host)
+        session = live.sessions.get(code)
+        players = []
+        for n in range(self.players):
+            response = await client.post(f"/api/live/{code}/join/", {"name": f"p{n}"}, content_type="application/json")
+            players.append(response.json())
+
+        async def poll(player):
+            params = {"version": session.version, "wait": 5, "player": player["player_id"], "token": player["token"]}
+            return (await client.get(f"/api/live/{code}/", params)).json()
+
+        # Every waiting poll returns with the question as soon as the host opens it
+        polls = [asyncio.ensure_future(poll(player)) for player in players]
+        while len(session.changed) < self.players:
+            await asyncio.sleep(0.01)
+        self.assertEqual((await host.post(f"/api/live/{code}/next/")).status_code, 200)
+        states = await asyncio.gather(*polls)
+        self.assertTrue(all(state["status"] == live.QUESTION for state in states))
+        self.assertNotIn("is_correct", states[0]["question"]["options"][0])
+        self.assertNotIn("leaderboard", states[0])
+
+        # q-math-hard-a: option 0 is correct
+        responses = await asyncio.gather(*(
+            client.post(
+                f"/api/live/{code}/answer/",
+                {**player, "selected": [n % 2]},
+                content_type="application/json",
+            )
+            for n, player in enumerate(players)
+        ))
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        again = await client.post(f"/api/live/{code}/answer/", {**players[0], "selected": [0]}, content_type="application/json")
+        self.assertEqual(again.status_code, 409)
+
+        state = (await host.post(f"/api/live/{code}/next/")).json()
+        self.assertEqual((state["status"], state["correct_indices"]), (live.REVEAL, [0]))
+        self.assertEqual(state["leaderboard"][0]["name"], "p0")
+        self.assertEqual(len(state["leaderboard"]), live.LEADERBOARD_SIZE)
+
+        self.assertEqual((await host.post(f"/api/live/{code}/end/")).json()["status"], live.FINISHED)
+        await host.post(f"/api/live/{code}/end/")  # saved once only
+        record = await LiveSessionRecord.objects.aget(code=code)
+        self.assertEqual(record.player_count, self.players)
+        self.assertEqual(await LivePlayerResult.objects.filter(session=record, correct=1).acount(), self.players // 2)
+        await sync_to_async(answer_stats.flush)()
+        stat = await QuestionStat.objects.aget(question_id="q-math-hard-a")
+        self.assertEqual((stat.answers, stat.correct), (self.players, self.players // 2))
+
+    async def test_only_the_host_controls_the_session(self):
+        code = await self.start(AsyncClient())
+        other = AsyncClient()
+        await other.aforce_login(await User.objects.aget(username="bob"))
+        self.assertEqual((await other.post(f"/api/live/{code}/next/")).status_code, 403)
+        response = await other.post(f"/api/live/{code}/answer/", {"player_id": "x", "token": "y", "selected": [0]}, content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+    async def test_idle_sessions_expire(self):
+        host = AsyncClient()
+        code = await self.start(host)
+        live.sessions.get(code).changed_at -= live.IDLE_TTL + 1
+        self.assertEqual((await host.get(f"/api/live/{code}/")).status_code, 404)
+        fresh = await self.start(host)
+        self.assertEqual(list(live.sessions._sessions), [fresh])
+
+    async def test_joins_are_throttled_per_address(self):
+        code = await self.start(AsyncClient())
+        rates = {**settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], "live_join_ip": "2/min"}
+        client = AsyncClient()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates}):
+            statuses = [
+                (await client.post(f"/api/live/{code}/join/", {"name": f"p{n}"}, content_type="application/json"))
+                for n in range(3)
+            ]
+        self.assertEqual([response.status_code for response in statuses], [201, 201, 429])
+        self.assertEqual(statuses[2]["Retry-After"], "30")
+        self.assertEqual(len(live.sessions.get(code).players), 2)
+
+    async def test_junk_answers_are_not_stored(self):
+        host, client = AsyncClient(), AsyncClient()
+        code = await self.start(host)
+        player = (await client.post(f"/api/live/{code}/join/", {"name": "p"}, content_type="application/json")).json()
+        await host.post(f"/api/live/{code}/next/")
+        answer = f"/api/live/{code}/answer/"
+        bad = await client.post(answer, {**player, "selected": ["0"]}, content_type="application/json")
+        self.assertEqual(bad.status_code, 400)
+        with self.assertRaises(live.LiveError):
+            live.sessions.get(code).answer(live.sessions.get(code).players[player["player_id"]], [0, "1"])
+        junk = [-1, 0, 0, 10**9] + list(range(100, 600))
+        response = await client.post(answer, {**player, "selected": junk}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(live.sessions.get(code).players[player["player_id"]].answers["q-math-hard-a"]["selected"], [0])
+
+        await host.post(f"/api/live/{code}/end/")
+        await sync_to_async(answer_stats.flush)()
+        picks = [row async for row in OptionStat.objects.values_list("question_id", "index", "selections")]
+        self.assertEqual(picks, [("q-math-hard-a", 0, 1)])
+        self.assertEqual((await QuestionStat.objects.aget(question_id="q-math-hard-a")).correct, 0)
@@ -0,0 +1,147 @@
+"""Token-bucket throttling for write-heavy endpoints.
+
+Buckets live in a process-local store, so checking a request never touches
+the database or an external cache. Views opt in by declaring
+``throttle_scopes`` (action name -> scope) or a single ``throttle_scope``;
+rates are read from ``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]`` using the
+keys ``"<scope>_user"`` and ``"<scope>_ip"``.
+"""
+
+import threading
+import time
+from functools import lru_cache
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_rate(rate):
+    """Turn ``"10/min"`` into ``(capacity, tokens_per_second)``."""
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    capacity = int(num)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+class TokenBucketStore:
+    """Thread-safe in-memory map of ``key -> (tokens, last_refill, full_at)``."""
+
+    # Idle buckets are swept once the store grows past this many keys, at
+    # most once per SWEEP_INTERVAL seconds: with that many clients active,
+    # a sweep frees little and must not run on every request.
+    SWEEP_THRESHOLD = 10000
+    SWEEP_INTERVAL = 1.0
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = float("-inf")
+
+    def consume(self, key, capacity, refill_rate):
+        """Take one token from ``key``'s bucket.
+
+        Returns ``0.0`` when the request is allowed, otherwise the number of
+        seconds until a token becomes available.
+        """
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill_rate
+            full_at = now + (capacity - tokens) / refill_rate
+            self._buckets[key] = (tokens, now, full_at)
+            if len(self._buckets) > self.SWEEP_THRESHOLD and now >= self._next_sweep:
+                self._sweep(now)
+                self._next_sweep = now + self.SWEEP_INTERVAL
+            return wait
+
+    def _sweep(self, now):
+        # A bucket that has had time to refill completely is identical to a
+        # missing one, so it can be dropped without changing any decision.
+        stale = [key for key, bucket in self._buckets.items() if bucket[2] <= now]
+        for key in stale:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+default_store = TokenBucketStore()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Base class: resolves the view's scope and consumes from a bucket.
+
+    Only unsafe methods are throttled; reads on the same action pass through.
+    """
+
+    store = default_store
+    rate_suffix = None
+
+    def __init__(self):
+        self.wait_time = 0.0
+
+    def get_scope(self, request, view):
+        scopes = getattr(view, "throttle_scopes", None)
+        if scopes:
+            return scopes.get(getattr(view, "action", None))
+        return getattr(view, "throttle_scope", None)
+
+    def get_ident_key(self, request):
+        raise NotImplementedError(".get_ident_key() must be overridden")
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        scope = self.get_scope(request, view)
+        if not scope:
+            return True
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.rate_suffix}"))
+        if rate is None:
+            return True
+        ident = self.get_ident_key(request)
+        if ident is None:
+            return True
+        capacity, refill_rate = rate
+        self.wait_time = self.store.consume(f"{scope}:{ident}", capacity, refill_rate)
+        return self.wait_time == 0.0
+
+    def wait(self):
+        return self.wait_time or None
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Per-account limit; anonymous requests are left to the IP throttle."""
+
+    rate_suffix = "user"
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"u{request.user.pk}"
+        return None
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    """Per-client-address limit, applied to every request."""
+
+    rate_suffix = "ip"
+
+    def get_ident_key(self, request):
+        return f"ip{self.get_ident(request)}"
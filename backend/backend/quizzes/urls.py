@@ -1,6 +1,8 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path
 
+from . import async_views, live_views
+
 from .views import (
     QuizViewSet, 
     UploadImageView,
@@ -9,6 +11,8 @@ from .views import (
     LogoutView,
     CurrentUserView,
     UserListView,
+    TagListView,
+    CacheStatsView,
     MessageViewSet,
     QuizShareViewSet,
     FavoriteViewSet,
@@ -27,4 +31,19 @@ urlpatterns = [
     path("auth/logout/", LogoutView.as_view(), name="logout"),
     path("auth/current-user/", CurrentUserView.as_view(), name="current-user"),
     path("users/", UserListView.as_view(), name="user-list"),
+    path("tags/", TagListView.as_view(), name="tag-list"),
+    path("cache/stats/", CacheStatsView.as_view(), name="cache-stats"),
+    # Async read paths (served without a worker thread under ASGI)
+    path("async/quizzes/", async_views.quiz_list, name="async-quiz-list"),
+    path("async/quizzes/<str:id>/", async_views.quiz_detail, name="async-quiz-detail"),
+    path("async/messages/conversation/", async_views.conversation, name="async-conversation"),
+    path("async/quiz-shares/received/", async_views.shares_received, name="async-shares-received"),
+    path("async/auth/current-user/", async_views.current_user, name="async-current-user"),
+    # Live sessions (long-polled, state held in memory by live.py)
+    path("live/", live_views.create_session, name="live-create"),
+    path("live/<str:code>/", live_views.session_state, name="live-state"),
+    path("live/<str:code>/join/", live_views.join_session, name="live-join"),
+    path("live/<str:code>/answer/", live_views.answer, name="live-answer"),
+    path("live/<str:code>/next/", live_views.advance, name="live-next"),
+    path("live/<str:code>/end/", live_views.end_session, name="live-end"),
 ] + router.urls
@@ -1,18 +1,45 @@
 from rest_framework import mixins, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import RowNumber, Substr
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
+import hashlib
 import os
 import uuid
 
-from .models import Quiz, Favorite, Comment
-from .serializers import QuizCreateSerializer, QuizListSerializer, QuizSerializer, FavoriteSerializer, CommentSerializer
+from . import archive, changes, similarity
+from .answer_stats import answer_key, answer_stats, grade, known_selection
+from .caching import read_cache
+from .counters import bump
+from .exporters import EXPORTERS, read_range, snapshot
+from .identity import identity
+from .import_rows import PARSERS
+from .importers import MAX_UPLOAD_SIZE, save_upload
+from .jobs import enqueue
+from .models import Quiz, Question, Choice, Favorite, Comment, ImportJob, OptionStat, QuestionStat, Tag
+from .renderers import CSVRenderer, FastJSONRenderer
+from .serializers import (
+    QuizCreateSerializer,
+    QuizListSerializer,
+    QuizSerializer,
+    QuizHeaderSerializer,
+    QuestionSerializer,
+    QuestionCreateSerializer,
+    FavoriteSerializer,
+    CommentSerializer,
+    ImportJobSerializer,
+    prime_cards,
+)
 
 class QuizViewSet(
     mixins.ListModelMixin,
@@ -31,33 +58,109 @@ class QuizViewSet(
         "update": QuizCreateSerializer,
         "partial_update": QuizCreateSerializer,
     }
+    throttle_scopes = {
+        "comments": "comment",
+        "like": "reaction",
+        "dislike": "reaction",
+        "answers": "answer",
+        "import_questions": "upload",
+    }
 
     def get_queryset(self):
+        if self.action == "list":
+            # question_count is stored on the quiz, so the list needs no questions;
+            # authors and tags come from the identity cache (prime_cards).
+            # Optional ?author=<username> and ?ordering=newest use the
+            # (author, name) and created_at indexes.
+            quizzes = Quiz.objects.all()
+            author = self.request.query_params.get("author")
+            if author:
+                quizzes = quizzes.filter(author__username=author)
+            if self.request.query_params.get("ordering") == "newest":
+                return quizzes.order_by("-created_at")
+            return quizzes.order_by("name")
+        if self.action in ("update", "partial_update"):
+            # The serializer replaces tags and questions and the response is
+            # built from a fresh read, so only the quiz row itself is needed.
+            # Locked so concurrent edits of one quiz apply one after another.
+            return Quiz.objects.select_for_update()
+        if self.action == "destroy":
+            return Quiz.objects.select_for_update().only("id", "author_id")
+        return self._detail_queryset()
+
+    def _detail_queryset(self):
         return (
-            Quiz.objects.all()
-            .prefetch_related("tags", "questions__options")
+            Quiz.objects.prefetch_related("tags", "questions__options", "questions__gaps")
             .order_by("name")
         )
 
     def get_serializer_class(self):
         return self.serializer_action_map.get(self.action, QuizSerializer)
 
+    def list(self, request, *args, **kwargs):
+        author = request.query_params.get("author", "")
+        ordering = request.query_params.get("ordering", "")
+        seq, payload = read_cache.get_or_set(
+            "quizzes",
+            f"catalog:{hashlib.sha1(author.encode()).hexdigest()}:{ordering == 'newest'}",
+            self._catalog,
+        )
+        return Response(payload, headers={"X-Catalog-Seq": str(seq)})
+
+    def _catalog(self):
+        # The sequence is read first, so a client continuing from it with
+        # /changes/ can only see a change twice, never miss one
+        seq = changes.latest()
+        return seq, list(self.get_serializer(prime_cards(self.get_queryset()), many=True).data)
+
+    @action(detail=False, methods=["get"], permission_classes=[AllowAny])
+    def changes(self, request):
+        """Catalog changes after ``?since=<seq>`` (from ``X-Catalog-Seq`` on
+        the list, or the ``seq`` of the previous page).
+
+        Returns changed quiz cards and tags, ids of deleted ones, the
+        ``seq`` to continue from and whether ``more`` pages follow. With
+        ``reset`` the client is too far behind and must reload the list.
+        """
+        try:
+            since = int(request.query_params.get("since", ""))
+            limit = int(request.query_params.get("limit", changes.PAGE_SIZE))
+        except ValueError:
+            raise ValidationError({"since": "since and limit must be integers."})
+        limit = max(min(limit, changes.MAX_PAGE_SIZE), 1)
+        return Response(changes.feed(max(since, 0), limit))
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Republishing with changes is legitimate, so copies only warn
+        found = similarity.report(response.data["id"])
+        found["questions"] = [q for q in found["questions"] if q["duplicates"]]
+        response.data["duplicate_warning"] = found if found["quizzes"] or found["questions"] else None
+        return response
+
     def perform_create(self, serializer):
         # Set author to the authenticated user (required)
         serializer.save(author=self.request.user)
 
-    def perform_update(self, serializer):
-        # Ensure only the author can update their quiz
-        quiz = self.get_object()
-        if quiz.author != self.request.user:
-            from rest_framework.exceptions import PermissionDenied
-            raise PermissionDenied("You can only edit your own quizzes.")
-        serializer.save()
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop("partial", False)
+        with transaction.atomic():
+            quiz = self.get_object()
+            # Ensure only the author can update their quiz
+            if quiz.author_id != request.user.id:
+                raise PermissionDenied("You can only edit your own quizzes.")
+            serializer = self.get_serializer(quiz, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        return Response(QuizSerializer(self._detail_queryset().get(pk=quiz.pk)).data)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            return super().destroy(request, *args, **kwargs)
 
     def perform_destroy(self, instance):
         # Ensure only the author can delete their quiz
-        if instance.author != self.request.user:
-            from rest_framework.exceptions import PermissionDenied
+        if instance.author_id != self.request.user.id:
             raise PermissionDenied("You can only delete your own quizzes.")
         instance.delete()
 
@@ -70,7 +173,9 @@ class QuizViewSet(
         POST: create a new comment for the quiz; requires authenticated user.
         """
 
-        quiz = self.get_object()
+        # Only the quiz's existence matters here, not the quiz itself
+        if not Quiz.objects.filter(id=id).exists():
+            raise NotFound("Quiz not found")
 
         if request.method.lower() == "post":
             if not request.user or not request.user.is_authenticated:
@@ -85,7 +190,8 @@ class QuizViewSet(
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            comment = Comment.objects.create(quiz=quiz, user=request.user, text=text)
+            comment = Comment.objects.create(quiz_id=id, user=request.user, text=text)
+            bump(id, comment_count=1)
             data = CommentSerializer(comment).data
             return Response(data, status=status.HTTP_201_CREATED)
 
@@ -102,7 +208,7 @@ class QuizViewSet(
         page = max(page, 1)
         page_size = max(min(page_size, 100), 1)
 
-        qs = Comment.objects.filter(quiz=quiz).select_related("user").order_by("-created_at")
+        qs = Comment.objects.filter(quiz_id=id).select_related("user").order_by("-created_at")
         start = (page - 1) * page_size
         end = start + page_size + 1  # fetch one extra to detect next page
         items = list(qs[start:end])
@@ -118,39 +224,356 @@ class QuizViewSet(
             "next_page": next_page,
         })
 
-    @action(detail=True, methods=["post"])
-    def like(self, request, id=None):
-        quiz = self.get_object()
-        previous = request.data.get("previous")
-        current = request.data.get("current")
+    @action(detail=True, methods=["get"])
+    def duplicates(self, request, id=None):
+        """Quizzes resembling this one, and near duplicates of each of its
+        questions in any quiz (including this one).
 
-        if previous == "like" and current is None:
-            quiz.likes = max(quiz.likes - 1, 0)
-        elif previous == "dislike" and current == "like":
-            quiz.dislikes = max(quiz.dislikes - 1, 0)
-            quiz.likes += 1
-        elif previous is None and current == "like":
-            quiz.likes += 1
+        Query param: threshold, the minimum estimated similarity (0.5-1,
+        default 0.7).
+        """
+        if identity.get(Quiz, id) is None:
+            raise NotFound("Quiz not found")
+        try:
+            threshold = float(request.query_params.get("threshold", similarity.THRESHOLD))
+        except ValueError:
+            raise ValidationError({"threshold": "Expected a number."})
+        if not 0.5 <= threshold <= 1:
+            raise ValidationError({"threshold": "Must be between 0.5 and 1."})
+        return Response(similarity.report(id, threshold))
+
+    @action(detail=True, methods=["get"])
+    def header(self, request, id=None):
+        """Quiz metadata and counters, without any questions.
+
+        ``multi_answer`` tells the play screen whether any question has more
+        than one correct option (it then uses checkboxes throughout), which
+        it can't see before every slice of questions is loaded.
+        """
+        several_correct = (
+            Choice.objects.filter(question__quiz=models.OuterRef("pk"), is_correct=True)
+            .values("question")
+            .annotate(n=models.Count("pk"))
+            .filter(n__gt=1)
+        )
+        quiz = get_object_or_404(Quiz.objects.annotate(multi_answer=models.Exists(several_correct)), id=id)
+        return Response(QuizHeaderSerializer(prime_cards([quiz])[0]).data)
 
-        quiz.save()
-        return Response({"likes": quiz.likes, "dislikes": quiz.dislikes})
+    @action(detail=True, methods=["get", "post"], url_path="questions")
+    def questions(self, request, id=None):
+        """Return one slice of a quiz's questions in play order, or add one.
 
-    @action(detail=True, methods=["post"])
-    def dislike(self, request, id=None):
-        quiz = self.get_object()
-        previous = request.data.get("previous")
-        current = request.data.get("current")
+        GET query params: offset (default 0), limit (default 20, max 100).
+        Only the requested slice and its options are loaded.
+        POST: one question with its options; ``order`` is the position to
+        insert it at (appended when omitted).
+        """
+        if request.method == "POST":
+            return self._create_question(request, id)
+
+        try:
+            offset = int(request.query_params.get("offset", "0"))
+        except ValueError:
+            offset = 0
+        try:
+            limit = int(request.query_params.get("limit", "20"))
+        except ValueError:
+            limit = 20
+        offset = max(offset, 0)
+        limit = max(min(limit, 100), 1)
+
+        if identity.get(Quiz, id) is None:
+            raise NotFound("Quiz not found")
+
+        qs = (
+            Question.objects.filter(quiz_id=id)
+            .order_by("order", "id")
+            .prefetch_related("options", "gaps")
+        )
+        items = list(qs[offset:offset + limit + 1])  # one extra to detect more
+        has_more = len(items) > limit
+
+        return Response({
+            "results": QuestionSerializer(items[:limit], many=True).data,
+            "offset": offset,
+            "next_offset": offset + limit if has_more else None,
+        })
+
+    @action(
+        detail=True,
+        methods=["get", "put", "patch", "delete"],
+        url_path=r"questions/(?P<qid>(?!reorder/)[^/.]+)",
+    )
+    def question_detail(self, request, id=None, qid=None):
+        """Read, edit or delete one question without resending the quiz.
+
+        PUT/PATCH only write the fields and options that changed; an
+        ``order`` in the body moves the question to that position.
+        """
+        if request.method == "GET":
+            question = get_object_or_404(Question.objects.prefetch_related("options", "gaps"), quiz_id=id, id=qid)
+            return Response(QuestionSerializer(question).data)
+
+        quiz = self._own_quiz(id)
+        question = get_object_or_404(Question.objects.prefetch_related("options", "gaps"), quiz=quiz, id=qid)
+
+        if request.method == "DELETE":
+            with transaction.atomic():
+                question.delete()
+                bump(quiz.pk, question_count=-1)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = QuestionCreateSerializer(question, data=request.data, partial=request.method == "PATCH")
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            question = serializer.save()
+            if "order" in serializer.validated_data:
+                current = self._play_order(quiz)
+                ids = [pk for pk in current if pk != question.pk]
+                ids.insert(serializer.validated_data["order"], question.pk)
+                self._apply_order(ids, current)
+        return Response(QuestionSerializer(question).data)
+
+    @action(detail=True, methods=["post"], url_path="questions/reorder")
+    def reorder_questions(self, request, id=None):
+        """Set the play order. Body: ``{"order": [question ids]}`` listing
+        every question once; only rows whose position changed are written,
+        in a single bulk UPDATE."""
+        quiz = self._own_quiz(id)
+        ordered = request.data.get("order")
+        current = self._play_order(quiz)
+        if (
+            not isinstance(ordered, list)
+            or len(ordered) != len(set(ordered))
+            or set(ordered) != current.keys()
+        ):
+            raise ValidationError({"order": "Must list every question of the quiz exactly once."})
+        moved = self._apply_order(ordered, current)
+        return Response({"order": ordered, "moved": moved})
+
+    @action(detail=True, methods=["post"], permission_classes=[AllowAny])
+    def answers(self, request, id=None):
+        """Record the first-attempt answers of one play-through.
+
+        Body: ``{"answers": [{"question_id": ..., "selected": [option
+        indices]}]}``. Answers are graded here and counted towards the
+        quiz's stats on the next batch flush.
+        """
+        answers = request.data.get("answers")
+        if not isinstance(answers, list) or len(answers) > 500:
+            raise ValidationError({"answers": "Must be a list of at most 500 answers."})
+        for answer in answers:
+            if (
+                not isinstance(answer, dict)
+                or not isinstance(answer.get("question_id"), str)
+                or not isinstance(answer.get("selected"), list)
+                or not all(isinstance(index, int) for index in answer["selected"])
+            ):
+                raise ValidationError({"answers": "Each answer needs a question_id and a list of selected indices."})
+        if identity.get(Quiz, id) is None:
+            raise NotFound("Quiz not found")
+
+        key = answer_key(id, {answer["question_id"] for answer in answers})
+        recorded = 0
+        for answer in answers:
+            options = key.get(answer["question_id"])
+            if options is None:
+                continue
+            selected, all_known = known_selection(options, answer["selected"])
+            correct = all_known and grade(options, selected)
+            answer_stats.record(id, answer["question_id"], selected, correct)
+            recorded += 1
+        return Response({"recorded": recorded}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def stats(self, request, id=None):
+        """Per-question correct rates and per-option pick counts, read from
+        the pre-aggregated stats tables. Only the author can see them."""
+        if not request.user.is_authenticated:
+            return Response({"detail": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+        quiz = self._own_quiz(id)
+        picks = {}
+        for question_id, index, selections in OptionStat.objects.filter(quiz=quiz).order_by("index").values_list(
+            "question_id", "index", "selections"
+        ):
+            picks.setdefault(question_id, []).append({"index": index, "selections": selections})
+        rows = (
+            QuestionStat.objects.filter(quiz=quiz)
+            .order_by("question__order", "question_id")
+            .values_list("question_id", "question__text", "answers", "correct")
+        )
+        return Response({
+            "quiz_id": quiz.id,
+            "questions": [
+                {
+                    "question_id": question_id,
+                    "text": text,
+                    "answers": answers,
+                    "correct": correct,
+                    "correct_rate": round(correct / answers, 3) if answers else None,
+                    "options": picks.get(question_id, []),
+                }
+                for question_id, text, answers, correct in rows
+            ],
+        })
+
+    def _own_quiz(self, id):
+        quiz = get_object_or_404(Quiz.objects.only("id", "author_id"), id=id)
+        if quiz.author_id != self.request.user.id:
+            raise PermissionDenied("You can only edit your own quizzes.")
+        return quiz
+
+    def _play_order(self, quiz):
+        """``{question_id: order}`` in play order."""
+        return dict(
+            Question.objects.filter(quiz=quiz).order_by("order", "id").values_list("id", "order")
+        )
+
+    def _apply_order(self, ordered_ids, current):
+        """Number questions by their position in ``ordered_ids``, writing
+        only the rows that moved."""
+        moved = [
+            Question(id=pk, order=position)
+            for position, pk in enumerate(ordered_ids)
+            if current.get(pk) != position
+        ]
+        if moved:
+            Question.objects.bulk_update(moved, ["order"])
+        return len(moved)
+
+    def _create_question(self, request, id):
+        quiz = self._own_quiz(id)
+        serializer = QuestionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            current = self._play_order(quiz)
+            position = min(serializer.validated_data.get("order", len(current)), len(current))
+            question = serializer.save(quiz=quiz, order=position)
+            ids = list(current)
+            ids.insert(position, question.pk)
+            self._apply_order(ids, {**current, question.pk: position})
+            bump(quiz.pk, question_count=1)
+        question = Question.objects.prefetch_related("options", "gaps").get(pk=question.pk)
+        return Response(QuestionSerializer(question).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="import", parser_classes=[MultiPartParser, FormParser])
+    def import_questions(self, request):
+        """Start a bulk import from an uploaded CSV or JSON file.
+
+        Form fields: file (required, at most ``IMPORT_MAX_UPLOAD_SIZE``
+        bytes), quiz_id (append to one of your quizzes) or name (title for
+        the new quiz). Returns the job to poll at
+        ``/api/quizzes/import/{job_id}/``.
+        """
+        too_large = Response(
+            {"detail": f"File is larger than {MAX_UPLOAD_SIZE // (1024 * 1024)} MB."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        # Refuse before the body is parsed and spooled when the client says
+        try:
+            if int(request.META.get("CONTENT_LENGTH") or 0) > MAX_UPLOAD_SIZE + 64 * 1024:
+                return too_large
+        except ValueError:
+            pass
+        file_obj = request.FILES.get("file")
+        if not file_obj:
+            return Response({"detail": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if file_obj.size > MAX_UPLOAD_SIZE:
+            return too_large
+        kind = os.path.splitext(file_obj.name)[1].lower().lstrip(".")
+        if kind not in PARSERS:
+            return Response({"detail": "File must be .csv or .json"}, status=status.HTTP_400_BAD_REQUEST)
+
+        quiz = None
+        quiz_id = request.data.get("quiz_id")
+        if quiz_id:
+            quiz = get_object_or_404(Quiz.objects.only("id", "author_id"), id=quiz_id)
+            if quiz.author_id != request.user.id:
+                raise PermissionDenied("You can only import into your own quizzes.")
+
+        job = ImportJob.objects.create(
+            author=request.user,
+            quiz=quiz,
+            format=kind,
+            options={"name": request.data.get("name", "")},
+        )
+        save_upload(job, file_obj)
+        enqueue("quizzes.import_questions", {"import_job_id": str(job.pk)}, idempotency_key=f"import:{job.pk}")
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["get"], url_path=r"import/(?P<job_id>[0-9a-f-]{36})")
+    def import_status(self, request, job_id=None):
+        job = get_object_or_404(ImportJob, id=job_id, author_id=request.user.id)
+        return Response(ImportJobSerializer(job).data)
+
+    @action(detail=True, methods=["get"], renderer_classes=[FastJSONRenderer, CSVRenderer])
+    def export(self, request, id=None):
+        """Download the quiz as JSON or CSV (``?format=json|csv``).
+
+        The export is generated once, inside one transaction, into a spooled
+        snapshot; its ``ETag`` and ``Content-Length`` describe exactly the
+        bytes that are streamed. A client can tell a cut-off download and
+        resume it with ``Range: bytes=`` and ``If-Range`` (206).
+        """
+        # ``?format=`` is resolved by content negotiation: only the two
+        # renderers above get this far
+        export_format = request.accepted_renderer.format
+        exporter, content_type = EXPORTERS[export_format]
+        with transaction.atomic():
+            quiz = get_object_or_404(Quiz.objects.select_related("author").prefetch_related("tags"), id=id)
+            spool, total, etag = snapshot(exporter(quiz))
+        byte_range = request.headers.get("Range", "")
+        if_range = request.headers.get("If-Range")
+        # Multiple ranges, other units, and ranges against an older version
+        # get the whole file
+        partial = byte_range.startswith("bytes=") and "," not in byte_range and if_range in (None, etag)
+        start, end = parse_byte_range(byte_range, total) if partial else (0, total - 1)
+        if start is None:
+            spool.close()
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{total}"
+            return response
+        response = StreamingHttpResponse(
+            read_range(spool, start, end),
+            content_type=content_type,
+            status=206 if partial else 200,
+        )
+        if partial:
+            response["Content-Range"] = f"bytes {start}-{end}/{total}"
+        response["Content-Length"] = str(end - start + 1)
+        response["ETag"] = etag
+        response["Accept-Ranges"] = "bytes"
+        response["Content-Disposition"] = f'attachment; filename="{quiz.id}.{export_format}"'
+        return response
+
+    # (previous, current) reaction -> change to (likes, dislikes), per endpoint
+    REACTIONS = {
+        "like": {("like", None): (-1, 0), ("dislike", "like"): (1, -1), (None, "like"): (1, 0)},
+        "dislike": {("dislike", None): (0, -1), ("like", "dislike"): (-1, 1), (None, "dislike"): (0, 1)},
+    }
 
-        if previous == "dislike" and current is None:
-            quiz.dislikes = max(quiz.dislikes - 1, 0)
-        elif previous == "like" and current == "dislike":
-            quiz.likes = max(quiz.likes - 1, 0)
-            quiz.dislikes += 1
-        elif previous is None and current == "dislike":
-            quiz.dislikes += 1
+    @action(detail=True, methods=["post"])
+    def like(self, request, id=None):
+        return self._react(request, id, "like")
 
-        quiz.save()
-        return Response({"likes": quiz.likes, "dislikes": quiz.dislikes})
+    @action(detail=True, methods=["post"])
+    def dislike(self, request, id=None):
+        return self._react(request, id, "dislike")
+
+    def _react(self, request, id, reaction):
+        """Apply the reaction change in one UPDATE and read back the two
+        counters; the quiz itself is never loaded."""
+        transition = tuple(
+            value if isinstance(value, str) else None
+            for value in (request.data.get("previous"), request.data.get("current"))
+        )
+        likes, dislikes = self.REACTIONS[reaction].get(transition, (0, 0))
+        with transaction.atomic():
+            bump(id, likes=likes, dislikes=dislikes)
+        counts = Quiz.objects.filter(id=id).values("likes", "dislikes").first()
+        if counts is None:
+            raise NotFound("Quiz not found")
+        return Response(counts)
 
 
 class FavoriteViewSet(viewsets.ModelViewSet):
@@ -176,6 +599,15 @@ class FavoriteViewSet(viewsets.ModelViewSet):
             .prefetch_related("quiz__tags")
         )
 
+    def list(self, request, *args, **kwargs):
+        # Embeds quiz cards, so it also depends on the catalog namespace
+        payload = read_cache.get_or_set(
+            (f"favorites:{request.user.pk}", "quizzes"),
+            "list",
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+        )
+        return Response(payload)
+
     def get_object(self):
         quiz_id = self.kwargs.get(self.lookup_field)
         queryset = self.filter_queryset(self.get_queryset())
@@ -190,9 +622,14 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump(instance.quiz_id, favorite_count=-1)
+
 
 class UploadImageView(APIView):
     parser_classes = (MultiPartParser, FormParser)
+    throttle_scope = "upload"
     # Use Django's configured upload limit; fall back to 5 MB if not set
     MAX_FILE_SIZE = getattr(settings, "FILE_UPLOAD_MAX_MEMORY_SIZE", 5 * 1024 * 1024)
 
@@ -235,8 +672,8 @@ class UploadImageView(APIView):
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from rest_framework.permissions import AllowAny
-from .models import Message, QuizShare
-from .serializers import UserSerializer, MessageSerializer, QuizShareSerializer
+from .models import Message, QuizShare, UserDirectoryEntry
+from .serializers import UserSerializer, MessageSerializer, QuizShareSerializer, QuizShareBulkSerializer
 
 
 class LoginView(APIView):
@@ -329,18 +766,141 @@ class CurrentUserView(APIView):
 
 
 class UserListView(APIView):
-    """List all users (for messaging and sharing)"""
+    """List users for the messaging and sharing pickers.
+
+    Without query params every user is returned (legacy behaviour). With
+    ``prefix`` and/or ``page`` the response is a case-insensitive prefix
+    search over ``UserDirectoryEntry``, paginated like quiz comments and
+    cached per prefix in the ``users`` namespace of the read cache.
+    """
     permission_classes = [AllowAny]
+    CACHE_TTL = getattr(settings, "USER_DIRECTORY_CACHE_TTL", 300)
 
     def get(self, request):
-        users = User.objects.all().order_by("username")
-        return Response({"users": UserSerializer(users, many=True).data})
+        params = request.query_params
+        if "prefix" not in params and "page" not in params:
+            payload = read_cache.get_or_set("users", "all", self._all, ttl=self.CACHE_TTL)
+            return Response(payload)
+
+        prefix = UserDirectoryEntry.normalize(params.get("prefix", "").strip())
+        try:
+            page = int(params.get("page", "1"))
+        except ValueError:
+            page = 1
+        try:
+            page_size = int(params.get("page_size", "20"))
+        except ValueError:
+            page_size = 20
+        page = max(page, 1)
+        page_size = max(min(page_size, 100), 1)
+
+        digest = hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+        payload = read_cache.get_or_set(
+            "users",
+            f"prefix:{digest}:{page}:{page_size}",
+            lambda: self._search(prefix, page, page_size),
+            ttl=self.CACHE_TTL,
+        )
+        return Response(payload)
+
+    def _all(self):
+        rows = UserDirectoryEntry.objects.order_by("username").values_list("user_id", "username")
+        return {"users": [{"id": pk, "username": username} for pk, username in rows]}
+
+    def _search(self, prefix, page, page_size):
+        qs = UserDirectoryEntry.objects.order_by("username_normalized", "user_id")
+        if prefix:
+            # A range scan on the normalized column stays on the index on
+            # every backend, unlike LIKE/ILIKE with an escape clause.
+            qs = qs.filter(
+                username_normalized__gte=prefix,
+                username_normalized__lt=prefix + "\U0010ffff",
+            )
+        start = (page - 1) * page_size
+        rows = list(qs.values_list("user_id", "username")[start:start + page_size + 1])
+        return {
+            "users": [{"id": pk, "username": username} for pk, username in rows[:page_size]],
+            "next_page": page + 1 if len(rows) > page_size else None,
+        }
+
+
+class TagListView(APIView):
+    """All tags with the number of quizzes using each, for filters and pickers."""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(read_cache.get_or_set("tags", "list", self._tags))
+
+    def _tags(self):
+        tags = (
+            Tag.objects.annotate(quiz_count=models.Count("quizzes"))
+            .filter(quiz_count__gt=0)
+            .order_by("name")
+            .values_list("name", "quiz_count")
+        )
+        return [{"name": name, "quiz_count": count} for name, count in tags]
+
+
+class CacheStatsView(APIView):
+    """Read-cache hit rates for the process that serves the request."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), **read_cache.stats()})
+
+
+def filter_since(queryset, params):
+    """Apply the ``since``/``since_id`` polling watermark to ``queryset``.
+
+    ``since`` (ISO timestamp) is a range on ``created_at`` and lets the
+    per-pair ``created_at`` indexes answer an unchanged poll with a single
+    probe; ``since_id`` drops rows at or below the last id the client has,
+    which also disambiguates rows sharing the boundary timestamp.
+    """
+    since = params.get("since")
+    if since:
+        parsed = parse_datetime(since)
+        if parsed is None:
+            raise ValidationError({"since": "Expected an ISO 8601 timestamp."})
+        queryset = queryset.filter(created_at__gte=parsed)
+    since_id = params.get("since_id")
+    if since_id:
+        try:
+            queryset = queryset.filter(id__gt=int(since_id))
+        except ValueError:
+            raise ValidationError({"since_id": "Expected an integer id."})
+    return queryset
+
+
+def parse_byte_range(header, total):
+    """Parse a single ``bytes=`` range against ``total`` bytes.
+
+    Returns inclusive ``(start, end)``, or ``(None, None)`` when the range
+    cannot be satisfied.
+    """
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return None, None
+            start, end = max(total - suffix, 0), total - 1
+        else:
+            start = int(first)
+            end = min(int(last), total - 1) if last else total - 1
+    except ValueError:
+        return None, None
+    if start >= total or start > end:
+        return None, None
+    return start, end
 
 
 class MessageViewSet(viewsets.ModelViewSet):
     """Messages between users"""
     serializer_class = MessageSerializer
     permission_classes = [AllowAny]
+    throttle_scopes = {"create": "message"}
+    PREVIEW_LENGTH = 120
 
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
@@ -397,10 +957,133 @@ class MessageViewSet(viewsets.ModelViewSet):
         messages = Message.objects.filter(
             models.Q(sender=user, recipient_id=other_user_id) |
             models.Q(sender_id=other_user_id, recipient=user)
-        ).select_related("sender", "recipient").order_by("created_at")
+        )
+        messages = filter_since(messages, request.query_params)
+        messages = messages.select_related("sender", "recipient").order_by("created_at")
 
         return Response(MessageSerializer(messages, many=True).data)
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def history(self, request):
+        """Page back through a conversation, including archived messages.
+
+        Query params: user_id, before_id (the ``next_before_id`` of the
+        previous page), page_size (default 50), archived=1 to read past the
+        live messages into the archive. Without ``archived`` the response
+        only says whether archived messages exist.
+        """
+        user = request.user
+        try:
+            other_id = int(request.query_params["user_id"])
+            before_id = request.query_params.get("before_id")
+            before_id = int(before_id) if before_id else None
+            page_size = int(request.query_params.get("page_size", archive.PAGE_SIZE))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "user_id is required; user_id, before_id and page_size must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = max(min(page_size, archive.MAX_PAGE_SIZE), 1)
+        include_archived = request.query_params.get("archived") in ("1", "true")
+
+        results, next_before_id, archived = archive.history(
+            user, other_id, before_id, page_size, include_archived
+        )
+        return Response({
+            "results": results,
+            "next_before_id": next_before_id,
+            "has_archived": archived,
+        })
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def conversations(self, request):
+        """List conversation partners, most recently active first.
+
+        Each entry carries the partner, a preview of the last message and the
+        number of unread messages from that partner. Computed in one query
+        with window functions partitioned by partner. Partners whose messages
+        have all been archived follow from ``archive.archived_partners``,
+        merged in by last activity and flagged ``archived``.
+        Query params: page (1-based), page_size (default 20).
+        """
+        user = request.user
+        try:
+            page = int(request.query_params.get("page", "1"))
+        except ValueError:
+            page = 1
+        try:
+            page_size = int(request.query_params.get("page_size", "20"))
+        except ValueError:
+            page_size = 20
+        page = max(page, 1)
+        page_size = max(min(page_size, 100), 1)
+
+        partner = models.Case(
+            models.When(sender=user, then=models.F("recipient_id")),
+            default=models.F("sender_id"),
+        )
+        by_partner = {"partition_by": [partner]}
+        qs = (
+            Message.objects.filter(models.Q(sender=user) | models.Q(recipient=user))
+            .annotate(
+                partner_id=partner,
+                preview=Substr("content", 1, self.PREVIEW_LENGTH),
+                partner_username=models.Case(
+                    models.When(sender=user, then=models.F("recipient__username")),
+                    default=models.F("sender__username"),
+                ),
+                position=models.Window(
+                    RowNumber(), order_by=[models.F("created_at").desc(), models.F("id").desc()], **by_partner
+                ),
+                unread_count=models.Window(
+                    models.Count("id", filter=models.Q(recipient=user, is_read=False)), **by_partner
+                ),
+            )
+            .filter(position=1)
+            .order_by("-created_at", "-id")
+            .values("id", "sender_id", "preview", "created_at", "partner_id", "partner_username", "unread_count")
+        )
+
+        # Both sources are ordered, so the page lies within the first
+        # ``end`` rows of each
+        start = (page - 1) * page_size
+        end = start + page_size + 1
+        entries = [
+            {
+                "user": {"id": row["partner_id"], "username": row["partner_username"]},
+                "last_message": {
+                    "id": row["id"],
+                    "sender_id": row["sender_id"],
+                    "content": row["preview"],
+                    "created_at": row["created_at"],
+                },
+                "unread_count": row["unread_count"],
+            }
+            for row in qs[:end]
+        ]
+        entries.extend(archive.archived_partners(user, end))
+        entries.sort(key=lambda entry: (entry["last_message"]["created_at"], entry["last_message"]["id"]), reverse=True)
+        rows = entries[start:end]
+        results = rows[:page_size]
+        return Response({
+            "results": results,
+            "next_page": page + 1 if len(rows) > page_size else None,
+        })
+
+    @action(detail=False, methods=["get"])
+    def unread(self, request):
+        """Unread message counts for the current user, total and per sender."""
+        if not request.user.is_authenticated:
+            return Response({"total": 0, "by_sender": {}})
+        counts = (
+            Message.objects.filter(recipient=request.user, is_read=False)
+            .values_list("sender_id")
+            .annotate(n=models.Count("id"))
+            .order_by()
+        )
+        by_sender = {sender_id: n for sender_id, n in counts}
+        return Response({"total": sum(by_sender.values()), "by_sender": by_sender})
+
     @action(detail=True, methods=["post"])
     def mark_read(self, request, pk=None):
         """Mark a message as read"""
@@ -414,6 +1097,7 @@ class QuizShareViewSet(viewsets.ModelViewSet):
     """Quiz shares between users"""
     serializer_class = QuizShareSerializer
     permission_classes = [AllowAny]
+    throttle_scopes = {"create": "share", "bulk": "share"}
 
     @method_decorator(csrf_exempt)
     def dispatch(self, *args, **kwargs):
@@ -424,10 +1108,25 @@ class QuizShareViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return QuizShare.objects.none()
 
-        # Get shares sent to or from the user
-        return QuizShare.objects.filter(
-            models.Q(sender=user) | models.Q(recipient=user)
-        ).select_related("sender", "recipient", "quiz").order_by("-created_at")
+        # Get shares sent to or from the user, optionally only those
+        # exchanged with one partner and newer than the client's watermark
+        partner_id = self.request.query_params.get("partner")
+        if partner_id:
+            try:
+                partner_id = int(partner_id)
+            except ValueError:
+                raise ValidationError({"partner": "Expected a user id."})
+            shares = QuizShare.objects.filter(
+                models.Q(sender=user, recipient_id=partner_id) |
+                models.Q(sender_id=partner_id, recipient=user)
+            )
+        else:
+            shares = QuizShare.objects.filter(
+                models.Q(sender=user) | models.Q(recipient=user)
+            )
+        if self.action == "list":
+            shares = filter_since(shares, self.request.query_params)
+        return shares.select_related("sender", "recipient", "quiz").order_by("-created_at")
 
     def perform_create(self, serializer):
         # Set sender from request user, or allow for demo
@@ -445,6 +1144,36 @@ class QuizShareViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump(instance.quiz_id, share_count=-1)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Share one quiz with a list of recipients.
+
+        Body: quiz_id, recipient_ids (list of user ids), optional message.
+        Recipients that already had the quiz from this sender are reported
+        in ``already_shared`` instead of failing the request.
+        """
+        if request.user.is_authenticated:
+            sender = request.user
+        else:
+            # For demo purposes, mirror perform_create
+            sender_id = request.data.get("sender_id")
+            sender = User.objects.filter(id=sender_id).first() if sender_id else None
+            if sender is None:
+                return Response(
+                    {"detail": "Sender required"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        serializer = QuizShareBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save(sender=sender)
+        status_code = status.HTTP_201_CREATED if result["shared"] else status.HTTP_200_OK
+        return Response(result, status=status_code)
+
     @action(detail=False, methods=["get"])
     def received(self, request):
         """Get quizzes shared with current user"""
@@ -457,9 +1186,8 @@ class QuizShareViewSet(viewsets.ModelViewSet):
         if not user:
             return Response({"shares": []})
 
-        shares = QuizShare.objects.filter(
-            recipient=user
-        ).select_related("sender", "recipient", "quiz").order_by("-created_at")
+        shares = filter_since(QuizShare.objects.filter(recipient=user), request.query_params)
+        shares = shares.select_related("sender", "recipient", "quiz").order_by("-created_at")
 
         return Response(QuizShareSerializer(shares, many=True).data)
 
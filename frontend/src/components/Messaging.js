@@ -7,6 +7,8 @@ import { API_BASE_URL } from '../config';
 import LoginModal from "./LoginModal.js";
 import RegisterModal from "./RegisterModal.js";
 
+const CONVERSATIONS_PAGE_SIZE = 30;
+
 function Messaging() {
     const { user, allUsers, isAuthenticated, loading: authLoading } = useAuth();
     const { unreadByUser, markConversationAsRead, loadUnreadCounts, loadUnviewedQuizzes } = useMessages();
@@ -22,10 +24,20 @@ function Messaging() {
     const [loading, setLoading] = useState(false);
     const [searchTerm, setSearchTerm] = useState('');
     const [conversationUsers, setConversationUsers] = useState([]);
+    // Next page of the conversation list: null when every partner is loaded
+    const [conversationsNextPage, setConversationsNextPage] = useState(null);
+    const [loadingMoreConversations, setLoadingMoreConversations] = useState(false);
+    const morePagesLoaded = useRef(false);
+    const userListEndRef = useRef(null);
     const messagesEndRef = useRef(null);
     const messageInputRef = useRef(null);
     const isFirstLoad = useRef(true);
     const prevItemsLength = useRef(0);
+    const lastMessageRef = useRef(null);
+    const lastShareRef = useRef(null);
+    // Cursor into archived history: null when there is nothing older to load
+    const [olderBeforeId, setOlderBeforeId] = useState(null);
+    const [loadingOlder, setLoadingOlder] = useState(false);
 
     const conversationItems = useMemo(() => {
         const mappedMessages = messages.map(msg => ({
@@ -113,67 +125,118 @@ function Messaging() {
         }
     }, [selectedUser]);
 
+    // Partners ordered by last activity, computed server-side
+    const fetchConversationPage = (page) => axios.get(`${API_BASE_URL}/messages/conversations/`, {
+        params: { page, page_size: CONVERSATIONS_PAGE_SIZE },
+        withCredentials: true,
+    });
+
+    const mergeUsers = (first, rest) => {
+        const seen = new Set(first.map(u => u.id));
+        return [...first, ...rest.filter(u => !seen.has(u.id))];
+    };
+
+    // Polls refresh the first page only; partners from pages loaded on
+    // scroll stay below it
     const loadConversationUsers = async () => {
         if (!user) return;
         
         try {
-            // Get all messages for current user
-            const response = await axios.get(`${API_BASE_URL}/messages/`, {
-                withCredentials: true,
-            });
-            
-            // Create a map of user ID -> last message timestamp
-            const userLastMessage = {};
-            
-            response.data.forEach(msg => {
-                const otherUserId = msg.sender.id === user.id ? msg.recipient.id : msg.sender.id;
-                const messageTime = new Date(msg.created_at).getTime();
-                
-                // Keep only the most recent message time for each user
-                if (!userLastMessage[otherUserId] || messageTime > userLastMessage[otherUserId]) {
-                    userLastMessage[otherUserId] = messageTime;
-                }
-            });
-            
-            // Filter allUsers to only include users with conversations and sort by last message
-            const usersWithConversations = allUsers
-                .filter(u => userLastMessage[u.id])
-                .sort((a, b) => userLastMessage[b.id] - userLastMessage[a.id]);
-            
-            setConversationUsers(usersWithConversations);
+            const response = await fetchConversationPage(1);
+            const firstPage = response.data.results.map(entry => entry.user);
+            setConversationUsers(prev => mergeUsers(firstPage, prev));
+            if (!morePagesLoaded.current) {
+                setConversationsNextPage(response.data.next_page);
+            }
         } catch (error) {
             console.error('Error loading conversation users:', error);
             setConversationUsers([]);
         }
     };
 
+    const loadMoreConversations = async () => {
+        if (conversationsNextPage === null || loadingMoreConversations) return;
+        setLoadingMoreConversations(true);
+        try {
+            const response = await fetchConversationPage(conversationsNextPage);
+            setConversationUsers(prev => mergeUsers(prev, response.data.results.map(entry => entry.user)));
+            morePagesLoaded.current = true;
+            setConversationsNextPage(response.data.next_page);
+        } catch (error) {
+            console.error('Error loading more conversations:', error);
+        } finally {
+            setLoadingMoreConversations(false);
+        }
+    };
+
+    // Load the next page once the end of the user list scrolls into view
+    useEffect(() => {
+        if (searchTerm || conversationsNextPage === null || loadingMoreConversations) return;
+        if (!userListEndRef.current) return;
+
+        const observer = new IntersectionObserver((entries) => {
+            if (entries[0].isIntersecting) {
+                loadMoreConversations();
+            }
+        }, {
+            root: null,
+            rootMargin: '0px',
+            threshold: 1.0,
+        });
+        observer.observe(userListEndRef.current);
+
+        return () => observer.disconnect();
+    }, [searchTerm, conversationsNextPage, loadingMoreConversations]);
+
+    const watermarkParams = (item) => (
+        item ? { since_id: item.id, since: item.created_at } : {}
+    );
+
+    const appendNew = (prev, incoming) => {
+        const seen = new Set(prev.map(item => item.id));
+        const fresh = incoming.filter(item => !seen.has(item.id));
+        return fresh.length ? [...prev, ...fresh] : prev;
+    };
+
     const loadConversation = async (userId, silent = false) => {
         if (!silent) {
             setLoading(true);
+            lastMessageRef.current = null;
+            lastShareRef.current = null;
         }
         try {
-            const params = { user_id: userId };
             if (user) {
+                // Silent polls only ask for rows newer than what we already have
                 const [messagesResponse, sharesResponse] = await Promise.all([
                     axios.get(`${API_BASE_URL}/messages/conversation/`, {
-                        params,
+                        params: { user_id: userId, ...watermarkParams(silent && lastMessageRef.current) },
                         withCredentials: true,
                     }),
                     axios.get(`${API_BASE_URL}/quiz-shares/`, {
+                        params: { partner: userId, ...watermarkParams(silent && lastShareRef.current) },
                         withCredentials: true,
                     }),
                 ]);
 
-                setMessages(messagesResponse.data);
-
-                const relevantShares = sharesResponse.data
-                    .filter(share => (
-                        (share.sender.id === user.id && share.recipient.id === userId) ||
-                        (share.sender.id === userId && share.recipient.id === user.id)
-                    ))
+                const newMessages = messagesResponse.data;
+                const newShares = [...sharesResponse.data]
                     .sort((a, b) => new Date(a.created_at) - new Date(b.created_at));
 
-                setConversationShares(relevantShares);
+                if (newMessages.length) {
+                    lastMessageRef.current = newMessages[newMessages.length - 1];
+                }
+                if (newShares.length) {
+                    lastShareRef.current = newShares[newShares.length - 1];
+                }
+
+                if (silent) {
+                    setMessages(prev => appendNew(prev, newMessages));
+                    setConversationShares(prev => appendNew(prev, newShares));
+                } else {
+                    setMessages(newMessages);
+                    setConversationShares(newShares);
+                    checkArchive(userId, newMessages[0]);
+                }
             } else {
                 setMessages([]);
                 setConversationShares([]);
@@ -187,6 +250,46 @@ function Messaging() {
         }
     };
 
+    // Older messages are archived on the server; only ask whether any exist
+    // here and fetch them when the user asks for them
+    const checkArchive = async (userId, oldest) => {
+        setOlderBeforeId(null);
+        try {
+            const response = await axios.get(`${API_BASE_URL}/messages/history/`, {
+                params: { user_id: userId, page_size: 1, ...(oldest ? { before_id: oldest.id } : {}) },
+                withCredentials: true,
+            });
+            if (response.data.has_archived) {
+                setOlderBeforeId(oldest ? oldest.id : 0);
+            }
+        } catch (error) {
+            console.error('Error checking archived messages:', error);
+        }
+    };
+
+    const loadOlderMessages = async () => {
+        if (!selectedUser || olderBeforeId === null) return;
+        setLoadingOlder(true);
+        try {
+            const response = await axios.get(`${API_BASE_URL}/messages/history/`, {
+                params: {
+                    user_id: selectedUser.id,
+                    archived: 1,
+                    ...(olderBeforeId ? { before_id: olderBeforeId } : {}),
+                },
+                withCredentials: true,
+            });
+            const older = response.data.results;
+            prevItemsLength.current += older.length;  // prepending should not scroll
+            setMessages(prev => [...older, ...prev]);
+            setOlderBeforeId(response.data.next_before_id);
+        } catch (error) {
+            console.error('Error loading older messages:', error);
+        } finally {
+            setLoadingOlder(false);
+        }
+    };
+
     const handleOpenSharedQuiz = async (share) => {
         if (!share?.quiz_data?.id) return;
 
@@ -305,6 +408,11 @@ function Messaging() {
                                 </button>
                             ))
                         )}
+                        {!searchTerm && conversationsNextPage !== null && (
+                            <div ref={userListEndRef} className="no-users">
+                                {loadingMoreConversations ? 'Loading...' : ''}
+                            </div>
+                        )}
                     </div>
                 </div>
 
@@ -327,6 +435,15 @@ function Messaging() {
                             </div>
 
                             <div className="messages-list">
+                                {!loading && olderBeforeId !== null && (
+                                    <button
+                                        className="load-older-button"
+                                        onClick={loadOlderMessages}
+                                        disabled={loadingOlder}
+                                    >
+                                        {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                                    </button>
+                                )}
                                 {loading ? (
                                     <div className="loading-messages">
                                         <p>Loading messages...</p>
@@ -34,25 +34,13 @@ export const MessagesProvider = ({ children }) => {
         if (!user) return;
         
         try {
-            const response = await axios.get(`${API_BASE_URL}/messages/`, {
+            // Counts are grouped server-side instead of fetching every message
+            const response = await axios.get(`${API_BASE_URL}/messages/unread/`, {
                 withCredentials: true,
             });
             
-            // Count unread messages where current user is recipient
-            const unreadMessages = response.data.filter(
-                msg => msg.recipient.id === user.id && !msg.is_read
-            );
-            
-            setUnreadCount(unreadMessages.length);
-            
-            // Group unread messages by sender
-            const unreadBySender = {};
-            unreadMessages.forEach(msg => {
-                const senderId = msg.sender.id;
-                unreadBySender[senderId] = (unreadBySender[senderId] || 0) + 1;
-            });
-            
-            setUnreadByUser(unreadBySender);
+            setUnreadCount(response.data.total);
+            setUnreadByUser(response.data.by_sender);
         } catch (error) {
             console.error('Error loading unread counts:', error);
         }
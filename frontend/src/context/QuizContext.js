@@ -1,4 +1,4 @@
-import { createContext, useCallback, useContext, useEffect, useMemo, useState } from 'react';
+import { createContext, useCallback, useContext, useEffect, useMemo, useRef, useState } from 'react';
 
 import { API_BASE_URL } from '../config';
 
@@ -8,6 +8,7 @@ const QuizContext = createContext({
   error: null,
   refresh: async () => {},
   getQuiz: async () => undefined,
+  getCachedQuiz: () => null,
   registerTemporaryQuiz: () => {},
   createQuiz: async () => {},
 });
@@ -19,6 +20,9 @@ export function QuizProvider({ children }) {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
+  // Catalog sequence the list is up to date with (see /quizzes/changes/)
+  const catalogSeq = useRef(null);
+
   const fetchQuizzes = useCallback(async () => {
     setLoading(true);
     try {
@@ -26,8 +30,10 @@ export function QuizProvider({ children }) {
       if (!response.ok) {
         throw new Error(`Failed to load quizzes (${response.status})`);
       }
+      const seq = response.headers.get('X-Catalog-Seq');
       const data = await response.json();
       data.sort((a, b) => a.name.localeCompare(b.name));
+      catalogSeq.current = seq === null ? null : Number(seq);
       setQuizzes(data);
       setError(null);
     } catch (err) {
@@ -38,10 +44,57 @@ export function QuizProvider({ children }) {
     }
   }, []);
 
+  // Apply only what changed since the last load; falls back to a full
+  // reload when the server has compacted changes we haven't seen
+  const syncQuizzes = useCallback(async () => {
+    if (catalogSeq.current === null) {
+      await fetchQuizzes();
+      return;
+    }
+    try {
+      let more = true;
+      while (more) {
+        const response = await fetch(`${API_BASE_URL}/quizzes/changes/?since=${catalogSeq.current}`);
+        if (!response.ok) {
+          throw new Error(`Failed to sync quizzes (${response.status})`);
+        }
+        const feed = await response.json();
+        if (feed.reset) {
+          await fetchQuizzes();
+          return;
+        }
+        if (feed.quizzes.length || feed.deleted_quizzes.length) {
+          const changed = new Map(feed.quizzes.map((quiz) => [quiz.id, quiz]));
+          const removed = new Set([...feed.deleted_quizzes, ...changed.keys()]);
+          setQuizzes((prev) =>
+            [...prev.filter((q) => !removed.has(q.id)), ...changed.values()].sort((a, b) =>
+              a.name.localeCompare(b.name)
+            )
+          );
+          setQuizDetails((prev) => {
+            const next = { ...prev };
+            removed.forEach((id) => delete next[id]);
+            return next;
+          });
+        }
+        catalogSeq.current = feed.seq;
+        more = feed.more;
+      }
+      setError(null);
+    } catch (err) {
+      console.error('Failed to sync quizzes', err);
+    }
+  }, [fetchQuizzes]);
+
   useEffect(() => {
     fetchQuizzes();
   }, [fetchQuizzes]);
 
+  useEffect(() => {
+    window.addEventListener('focus', syncQuizzes);
+    return () => window.removeEventListener('focus', syncQuizzes);
+  }, [syncQuizzes]);
+
   const getQuiz = useCallback(
     async (quizId) => {
       if (!quizId) {
@@ -64,6 +117,12 @@ export function QuizProvider({ children }) {
     [quizDetails, tempQuizzes]
   );
 
+  // A full quiz that is already loaded (or only exists locally), without fetching
+  const getCachedQuiz = useCallback(
+    (quizId) => tempQuizzes[quizId] || quizDetails[quizId] || null,
+    [quizDetails, tempQuizzes]
+  );
+
   const registerTemporaryQuiz = useCallback((quiz) => {
     if (!quiz?.id) {
       return;
@@ -191,14 +250,15 @@ export function QuizProvider({ children }) {
       quizzes,
       loading,
       error,
-      refresh: fetchQuizzes,
+      refresh: syncQuizzes,
       getQuiz,
+      getCachedQuiz,
       registerTemporaryQuiz,
       createQuiz,
       updateQuiz,
       deleteQuiz,
     }),
-    [quizzes, loading, error, fetchQuizzes, getQuiz, registerTemporaryQuiz, createQuiz, updateQuiz, deleteQuiz]
+    [quizzes, loading, error, syncQuizzes, getQuiz, getCachedQuiz, registerTemporaryQuiz, createQuiz, updateQuiz, deleteQuiz]
   );
 
   return <QuizContext.Provider value={value}>{children}</QuizContext.Provider>;
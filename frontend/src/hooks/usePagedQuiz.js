@@ -0,0 +1,113 @@
+import { useEffect, useRef, useState } from 'react';
+
+import { API_BASE_URL } from '../config';
+import { useQuizList } from '../context/QuizContext';
+
+const PAGE_SIZE = 10;
+// Fetch the next slice once the player is this close to the last loaded question
+const PREFETCH_AHEAD = 3;
+const RETRY_DELAY = 2000;
+
+async function fetchJson(url) {
+  const response = await fetch(url);
+  if (!response.ok) {
+    throw new Error(`Quiz not found (${response.status})`);
+  }
+  return response.json();
+}
+
+const fetchSlice = (quizId, offset) =>
+  fetchJson(`${API_BASE_URL}/quizzes/${quizId}/questions/?offset=${offset}&limit=${PAGE_SIZE}`);
+
+/**
+ * Load a quiz for playing: the header first, then its questions one slice
+ * at a time, a few questions ahead of ``index``. A quiz that is already
+ * loaded in full (or only exists locally) is used as is.
+ *
+ * ``quiz.questions`` holds the questions loaded so far; ``totalQuestions``
+ * is the quiz's question count.
+ */
+export function usePagedQuiz(quizId, index) {
+  const { getCachedQuiz } = useQuizList();
+  const [state, setState] = useState({ quiz: null, nextOffset: null, loading: true, error: null });
+  const [retry, setRetry] = useState(0);
+  const cachedQuizRef = useRef(getCachedQuiz);
+  cachedQuizRef.current = getCachedQuiz;
+  // Offset of the slice being fetched, so each slice is requested once
+  const inflightRef = useRef(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    inflightRef.current = null;
+    if (!quizId) {
+      setState({ quiz: null, nextOffset: null, loading: false, error: 'Missing quiz id' });
+      return () => {
+        cancelled = true;
+      };
+    }
+    const cached = cachedQuizRef.current(quizId);
+    if (cached) {
+      setState({ quiz: cached, nextOffset: null, loading: false, error: null });
+      return () => {
+        cancelled = true;
+      };
+    }
+    setState({ quiz: null, nextOffset: null, loading: true, error: null });
+    Promise.all([fetchJson(`${API_BASE_URL}/quizzes/${quizId}/header/`), fetchSlice(quizId, 0)])
+      .then(([header, slice]) => {
+        if (cancelled) {
+          return;
+        }
+        setState({
+          quiz: { ...header, questions: slice.results },
+          nextOffset: slice.next_offset,
+          loading: false,
+          error: null,
+        });
+      })
+      .catch((error) => {
+        if (cancelled) {
+          return;
+        }
+        setState({ quiz: null, nextOffset: null, loading: false, error: error.message || 'Failed to load quiz' });
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [quizId]);
+
+  const loaded = state.quiz?.questions?.length || 0;
+  const { nextOffset } = state;
+
+  useEffect(() => {
+    if (nextOffset === null || inflightRef.current === nextOffset || index + PREFETCH_AHEAD < loaded) {
+      return;
+    }
+    // Not cancelled when the player moves on: the slice is still needed
+    inflightRef.current = nextOffset;
+    fetchSlice(quizId, nextOffset)
+      .then((slice) => {
+        setState((prev) => {
+          if (prev.quiz?.id !== quizId || prev.nextOffset !== nextOffset) {
+            return prev;
+          }
+          return {
+            ...prev,
+            quiz: { ...prev.quiz, questions: [...prev.quiz.questions, ...slice.results] },
+            nextOffset: slice.next_offset,
+          };
+        });
+      })
+      .catch((error) => {
+        console.error('Failed to load questions', error);
+        setTimeout(() => {
+          inflightRef.current = null;
+          setRetry((n) => n + 1);
+        }, RETRY_DELAY);
+      });
+  }, [quizId, index, loaded, nextOffset, retry]);
+
+  const totalQuestions = nextOffset === null ? loaded : state.quiz?.question_count ?? loaded;
+
+  return { quiz: state.quiz, loading: state.loading, error: state.error, totalQuestions };
+}
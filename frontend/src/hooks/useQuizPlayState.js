@@ -29,8 +29,10 @@ export function useQuizPlayState(quiz, currentQuestion, isFillGapQuestion) {
   const toastTimeoutRef = useRef(null);
   const incorrectTimeoutRef = useRef(null);
 
-  // Check if quiz has any multi-answer questions
+  // Check if quiz has any multi-answer questions; a quiz played slice by
+  // slice gets this from its header
   const quizHasMultiAnswer = useMemo(() => {
+    if (typeof quiz?.multi_answer === 'boolean') return quiz.multi_answer;
     if (!quiz?.questions) return false;
     return quiz.questions.some(q => {
       const correctCount = q.options?.filter(opt => opt.is_correct).length || 0;
@@ -1,6 +1,7 @@
 import { useMemo } from 'react';
 import { Link, useParams, useSearchParams } from 'react-router-dom';
 import { useQuizDetail } from '../hooks/useQuizDetail';
+import { isFillGapQuestion, questionGaps } from '../utils/gapEncoding';
 
 function Review() {
   const { quizId } = useParams();
@@ -40,22 +41,6 @@ function Review() {
     return <div className="empty">Quiz not found.</div>;
   }
 
-  // Helper function to decode gap option text
-  const decodeGapOptionText = (text) => {
-    if (typeof text !== 'string') return text;
-    const match = text.match(/^__G\d+__(.*)$/);
-    return match ? match[1] : text;
-  };
-
-  // Check if question is fill-in-the-gap type
-  const isFillGapQuestion = (question) => {
-    if (!question.text || typeof question.text !== 'string') return false;
-    if (!Array.isArray(question.options) || question.options.length === 0) return false;
-    const hasGap = /_{1,}/.test(question.text);
-    const hasEncodedOptions = question.options.some((opt) => typeof opt.text === 'string' && /^__G\d+__/.test(opt.text));
-    return hasGap && hasEncodedOptions;
-  };
-
   return (
     <div>
       <h2 className="section-title">Quiz Review</h2>
@@ -195,34 +180,8 @@ function Review() {
               ) : (
                 // Fill-in-the-gap question
                 (() => {
-                  const gapMap = new Map();
-                  question.options.forEach((opt) => {
-                    if (typeof opt.text !== 'string') return;
-                    const match = opt.text.match(/^__G(\d+)__(.*)$/);
-                    if (!match) return;
-                    const gIdx = parseInt(match[1], 10);
-                    if (!gapMap.has(gIdx)) {
-                      gapMap.set(gIdx, []);
-                    }
-                    gapMap.get(gIdx).push({ ...opt, decodedText: match[2] });
-                  });
-
-                  const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
-                  
-                  // Parse gap explanations once
-                  let gapExplanations = {};
-                  if (question.explanation) {
-                    try {
-                      gapExplanations = JSON.parse(question.explanation);
-                    } catch {
-                      // If parsing fails, explanations will be empty
-                    }
-                  }
-
-                  return gapIndices.map((gIdx) => {
-                    const options = gapMap.get(gIdx);
+                  return questionGaps(question).map(({ index: gIdx, options, explanation: gapExplanation }) => {
                     const userGapAnswer = userAnswer?.[gIdx];
-                    const gapExplanation = gapExplanations[gIdx];
 
                     return (
                       <div key={gIdx} style={{ marginBottom: '16px' }}>
@@ -278,7 +237,7 @@ function Review() {
                                 <div className="row" style={{ gap: '8px', alignItems: 'center' }}>
                                   {isCorrect && <span style={{ color: 'var(--success)', fontWeight: 'bold', fontSize: '16px' }}>✓</span>}
                                   {wasSelected && hasIncorrectAttempts && !isCorrect && <span style={{ color: 'var(--danger)', fontWeight: 'bold', fontSize: '16px' }}>✗</span>}
-                                  <span style={{ color: 'var(--text)' }}>{opt.decodedText}</span>
+                                  <span style={{ color: 'var(--text)' }}>{opt.text}</span>
                                 </div>
                                 {wasSelected && hasIncorrectAttempts && !isCorrect && (
                                   <span style={{ 
@@ -1,4 +1,4 @@
-import { stripGapMarker } from '../../utils/gapEncoding';
+import { isFillGapQuestion, questionGaps, stripGapMarker } from '../../utils/gapEncoding';
 
 /**
  * Component for previewing the quiz before publishing
@@ -84,9 +84,9 @@ function PreviewScreen({
                 <div className="preview-options">
                   {(() => {
                     const options = Array.isArray(question.options) ? question.options : [];
-                    const hasEncodedGaps = options.some((opt) => typeof opt.text === 'string' && /^__G\d+__/.test(opt.text));
+                    const hasGaps = isFillGapQuestion(question);
 
-                    if (!hasEncodedGaps) {
+                    if (!hasGaps) {
                       return options.map((option, oIndex) => (
                         <div key={oIndex} className={`preview-option ${option.is_correct ? 'correct' : ''}`}>
                           <span className="option-check">
@@ -100,24 +100,10 @@ function PreviewScreen({
                       ));
                     }
 
-                    const gapMap = new Map();
-                    options.forEach((option) => {
-                      if (typeof option.text !== 'string') return;
-                      const match = option.text.match(/^__G(\d+)__(.*)$/);
-                      if (!match) return;
-                      const gapIndex = parseInt(match[1], 10);
-                      if (!gapMap.has(gapIndex)) {
-                        gapMap.set(gapIndex, []);
-                      }
-                      gapMap.get(gapIndex).push(option);
-                    });
-
-                    const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
-
-                    return gapIndices.map((gapIndex) => (
+                    return questionGaps(question).map(({ index: gapIndex, options: gapOptions }) => (
                       <div key={gapIndex} className="preview-gap-group">
                         <span className="pill">Gap {gapIndex + 1}</span>
-                        {gapMap.get(gapIndex).map((option, oIndex) => (
+                        {gapOptions.map((option, oIndex) => (
                           <div key={oIndex} className={`preview-option ${option.is_correct ? 'correct' : ''}`}>
                             <span className="option-check">
                               {option.is_correct ? '✓' : '○'}
@@ -1,4 +1,4 @@
-import { stripGapMarker } from '../../utils/gapEncoding';
+import { isFillGapQuestion, questionGaps, stripGapMarker } from '../../utils/gapEncoding';
 
 /**
  * Component for displaying the list of saved questions with edit/remove actions
@@ -57,9 +57,9 @@ function QuestionsList({
             <div className="question-preview__options">
               {(() => {
                 const options = Array.isArray(question.options) ? question.options : [];
-                const hasEncodedGaps = options.some((opt) => typeof opt.text === 'string' && /^__G\d+__/.test(opt.text));
+                const hasGaps = isFillGapQuestion(question);
 
-                if (!hasEncodedGaps) {
+                if (!hasGaps) {
                   return options.map((option, oIndex) => (
                     <div key={oIndex} className="option-preview">
                       <span className={`option-check ${option.is_correct ? 'correct' : ''}`}>
@@ -70,28 +70,10 @@ function QuestionsList({
                   ));
                 }
 
-                const gapMap = new Map();
-                options.forEach((option) => {
-                  if (typeof option.text !== 'string') {
-                    return;
-                  }
-                  const match = option.text.match(/^__G(\d+)__(.*)$/);
-                  if (!match) {
-                    return;
-                  }
-                  const gapIndex = parseInt(match[1], 10);
-                  if (!gapMap.has(gapIndex)) {
-                    gapMap.set(gapIndex, []);
-                  }
-                  gapMap.get(gapIndex).push(option);
-                });
-
-                const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
-
-                return gapIndices.map((gapIndex) => (
+                return questionGaps(question).map(({ index: gapIndex, options: gapOptions }) => (
                   <div key={gapIndex} className="gap-options-group">
                     <span className="pill">Gap {gapIndex + 1}</span>
-                    {gapMap.get(gapIndex).map((option, oIndex) => (
+                    {gapOptions.map((option, oIndex) => (
                       <div key={oIndex} className="option-preview">
                         <span className={`option-check ${option.is_correct ? 'correct' : ''}`}>
                           {option.is_correct ? '✓' : ''}
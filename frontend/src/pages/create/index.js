@@ -5,7 +5,7 @@ import { useQuizList } from '../../context/QuizContext';
 import { useAuth } from '../../context/AuthContext';
 import { API_BASE_URL } from '../../config';
 import { useQuestionValidation } from '../../hooks/useQuestionValidation';
-import { encodeGapOptions, decodeGapOptions } from '../../utils/gapEncoding';
+import { encodeGapOptions, decodeGapOptions, isFillGapQuestion } from '../../utils/gapEncoding';
 
 import MetadataForm from './MetadataForm';
 import QuestionEditor from './QuestionEditor';
@@ -509,11 +509,9 @@ function CreateQuiz() {
   const loadQuestionForEditing = useCallback((index, question) => {
     setEditingQuestionIndex(index);
 
-    const hasEncodedGaps = question.options.some((opt) => typeof opt.text === 'string' && /^__G\d+__/.test(opt.text));
-
-    if (hasEncodedGaps) {
+    if (isFillGapQuestion(question)) {
       setSelectedQuestionType('fill_gap');
-      const gapOptions = decodeGapOptions(question.options, question.explanation);
+      const gapOptions = decodeGapOptions(question);
       setCurrentQuestion({
         text: question.text,
         image_url: question.image_url || '',
@@ -626,7 +624,15 @@ function CreateQuiz() {
       } else {
         // Create new quiz
         const newQuiz = await createQuiz(quizData);
-        sessionStorage.setItem('quizSuccessMessage', 'Quiz created successfully');
+        const warning = newQuiz.duplicate_warning;
+        let message = 'Quiz created successfully';
+        if (warning?.quizzes?.length) {
+          const similar = warning.quizzes[0];
+          message += `. It looks similar to "${similar.name}"${similar.author ? ` by ${similar.author}` : ''}`;
+        } else if (warning?.questions?.length) {
+          message += `. ${warning.questions.length} question(s) look like duplicates of existing ones`;
+        }
+        sessionStorage.setItem('quizSuccessMessage', message);
         navigate(`/quiz/${newQuiz.id}`);
       }
     } catch (err) {
@@ -13,7 +13,7 @@ function GapQuestion({
   onGapSelectionChange,
 }) {
   const parts = currentQuestion.text.split(/(_{1,})/);
-  const gapMap = groupOptionsByGap(currentQuestion.options || []);
+  const gapMap = groupOptionsByGap(currentQuestion);
   const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
 
   let gapCounter = 0;
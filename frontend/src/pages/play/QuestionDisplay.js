@@ -1,6 +1,6 @@
 import GapQuestion from './GapQuestion';
 import OptionsDisplay from './OptionsDisplay';
-import { groupOptionsByGap } from '../../utils/gapEncoding';
+import { groupOptionsByGap, gapExplanations as explanationsByGap } from '../../utils/gapEncoding';
 
 /**
  * Component for displaying the current question with its options/gaps
@@ -25,15 +25,7 @@ function QuestionDisplay({
   onGapSelectionChange,
   onSubmit,
 }) {
-  // Parse gap explanations for fill-in-the-gap questions
-  let gapExplanations = {};
-  if (isFillGapQuestion && currentQuestion.explanation) {
-    try {
-      gapExplanations = JSON.parse(currentQuestion.explanation);
-    } catch {
-      // If parsing fails, explanations will be empty
-    }
-  }
+  const gapExplanations = isFillGapQuestion ? explanationsByGap(currentQuestion) : {};
 
   return (
     <div className="card">
@@ -83,7 +75,7 @@ function QuestionDisplay({
           {isFillGapQuestion ? (
             // For fill-in-the-gap questions, show explanation per gap
             (() => {
-              const gapMap = groupOptionsByGap(currentQuestion.options || []);
+              const gapMap = groupOptionsByGap(currentQuestion);
               const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
               
               return gapIndices.map((gIdx) => {
@@ -1,9 +1,10 @@
 import { useEffect, useMemo, useState } from 'react';
 import { useNavigate, useParams } from 'react-router-dom';
 
-import { useQuizDetail } from '../../hooks/useQuizDetail';
+import { usePagedQuiz } from '../../hooks/usePagedQuiz';
 import { useQuizPlayState } from '../../hooks/useQuizPlayState';
-import { isFillGapQuestion as checkIsFillGapQuestion, groupOptionsByGap } from '../../utils/gapEncoding';
+import { reportAnswers } from '../../utils/answerStats';
+import { isFillGapQuestion as checkIsFillGapQuestion, groupOptionsByGap, gapExplanations } from '../../utils/gapEncoding';
 
 import QuestionDisplay from './QuestionDisplay';
 
@@ -13,12 +14,14 @@ import QuestionDisplay from './QuestionDisplay';
 function Play() {
   const { quizId } = useParams();
   const navigate = useNavigate();
-  const { quiz, loading, error } = useQuizDetail(quizId);
   const [showQuitDialog, setShowQuitDialog] = useState(false);
 
   // Need a temporary state to hold index before we get it from playState
   const [tempIndex, setTempIndex] = useState(0);
 
+  // Questions arrive in slices while the player goes through the quiz
+  const { quiz, loading, error, totalQuestions } = usePagedQuiz(quizId, tempIndex);
+
   const currentQuestion = useMemo(() => {
     if (!quiz || !quiz.questions || quiz.questions.length === 0) {
       return null;
@@ -32,16 +35,11 @@ function Play() {
 
   // Check if current question has explanation
   const hasExplanation = useMemo(() => {
-    if (!currentQuestion?.explanation) return false;
+    if (!currentQuestion) return false;
     if (isFillGapQuestion) {
-      try {
-        const gapExplanations = JSON.parse(currentQuestion.explanation);
-        return Object.keys(gapExplanations).length > 0;
-      } catch {
-        return false;
-      }
+      return Object.keys(gapExplanations(currentQuestion)).length > 0;
     }
-    return true;
+    return !!currentQuestion.explanation;
   }, [currentQuestion, isFillGapQuestion]);
 
   const playState = useQuizPlayState(quiz, currentQuestion, isFillGapQuestion);
@@ -80,20 +78,18 @@ function Play() {
     resetQuestionState,
   } = playState;
 
-  const totalQuestions = quiz?.questions?.length || 0;
-
   // Sync tempIndex with actual index from playState
   useEffect(() => {
     setTempIndex(index);
   }, [index]);
 
   useEffect(() => {
-    if (quiz && quiz.questions && quiz.questions.length === 0 && !loading && !error) {
+    if (quiz && totalQuestions === 0 && !loading && !error) {
       const answersParam = encodeURIComponent(JSON.stringify(userAnswersRef.current));
       const incorrectParam = encodeURIComponent(JSON.stringify(incorrectAttemptsRef.current));
       navigate(`/results/${quiz.id}?score=0&wrong=&answers=${answersParam}&incorrect=${incorrectParam}`);
     }
-  }, [quiz, loading, error, navigate]);
+  }, [quiz, totalQuestions, loading, error, navigate]);
 
   const handleSubmit = (overrideIndex) => {
     if (!quiz || !currentQuestion || processing || reveal) {
@@ -103,7 +99,7 @@ function Play() {
     let isCorrect = false;
 
     if (isFillGapQuestion) {
-      const gapMap = groupOptionsByGap(currentQuestion.options || []);
+      const gapMap = groupOptionsByGap(currentQuestion);
       const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
       if (gapIndices.length === 0) {
         return;
@@ -161,6 +157,7 @@ function Play() {
                 : 0;
               const answersParam = encodeURIComponent(JSON.stringify(userAnswersRef.current));
               const incorrectParam = encodeURIComponent(JSON.stringify(incorrectAttemptsRef.current));
+              reportAnswers(quiz.id, userAnswersRef.current, incorrectAttemptsRef.current);
               navigate(`/results/${quiz.id}?score=${score}&wrong=${wrongIds.join(',')}&answers=${answersParam}&incorrect=${incorrectParam}`);
             } else {
               resetQuestionState();
@@ -241,6 +238,7 @@ function Play() {
               : 0;
             const answersParam = encodeURIComponent(JSON.stringify(userAnswersRef.current));
             const incorrectParam = encodeURIComponent(JSON.stringify(incorrectAttemptsRef.current));
+            reportAnswers(quiz.id, userAnswersRef.current, incorrectAttemptsRef.current);
             navigate(`/results/${quiz.id}?score=${score}&wrong=${wrongIds.join(',')}&answers=${answersParam}&incorrect=${incorrectParam}`);
           } else {
             resetQuestionState();
@@ -311,6 +309,7 @@ function Play() {
         : 0;
       const answersParam = encodeURIComponent(JSON.stringify(userAnswersRef.current));
       const incorrectParam = encodeURIComponent(JSON.stringify(incorrectAttemptsRef.current));
+      reportAnswers(quiz.id, userAnswersRef.current, incorrectAttemptsRef.current);
       navigate(`/results/${quiz.id}?score=${score}&wrong=${wrongIds.join(',')}&answers=${answersParam}&incorrect=${incorrectParam}`);
     } else {
       resetQuestionState();
@@ -333,7 +332,7 @@ function Play() {
   }
 
   if (!currentQuestion) {
-    return null;
+    return index < totalQuestions ? <div className="muted">Loading question...</div> : null;
   }
 
   const disabledForQuestion = new Set(disabledOptions[currentQuestion.id] || []);
@@ -0,0 +1,41 @@
+import { API_BASE_URL } from '../config';
+
+/**
+ * Convert a stored answer into a list of selected option indices
+ * @param {number|Array|Object} answer - Single index, list of indices, or gapIndex -> option index map
+ * @returns {Array} - Selected option indices
+ */
+function selectedIndices(answer) {
+  if (answer === null || answer === undefined) return [];
+  if (Array.isArray(answer)) return answer;
+  if (typeof answer === 'object') return Object.values(answer).filter((value) => typeof value === 'number');
+  return [answer];
+}
+
+/**
+ * Send the first attempt at each question to the quiz's answer stats.
+ * Fire-and-forget: a failure never blocks showing the results.
+ * @param {string} quizId - Quiz ID
+ * @param {Object} userAnswers - questionId -> final answer
+ * @param {Object} incorrectAttempts - questionId -> list of wrong attempts, oldest first
+ */
+export function reportAnswers(quizId, userAnswers, incorrectAttempts) {
+  const answers = Object.keys(userAnswers).map((questionId) => {
+    const attempts = incorrectAttempts[questionId];
+    const first = attempts && attempts.length > 0 ? attempts[0] : userAnswers[questionId];
+    return { question_id: questionId, selected: selectedIndices(first) };
+  });
+  if (answers.length === 0) return;
+
+  const csrfToken = document.cookie.split('; ').find(row => row.startsWith('csrftoken='))?.split('=')[1];
+  fetch(`${API_BASE_URL}/quizzes/${quizId}/answers/`, {
+    method: 'POST',
+    credentials: 'include',
+    keepalive: true,
+    headers: {
+      'Content-Type': 'application/json',
+      ...(csrfToken ? { 'X-CSRFToken': csrfToken } : {}),
+    },
+    body: JSON.stringify({ answers }),
+  }).catch(() => {});
+}
@@ -1,14 +1,17 @@
 /**
- * Utility functions for encoding and decoding fill-in-the-gap quiz questions.
- * Gap options are encoded with a marker format: __G{gapIndex}__{optionText}
+ * Utility functions for fill-in-the-gap quiz questions.
+ * The API returns gap questions with type 'fill_gap' and a structured
+ * `gaps` list. Questions still being edited locally (and those from older
+ * servers) encode gap options with a marker format: __G{gapIndex}__{optionText}
  */
 
 /**
- * Check if a question is a fill-in-the-gap type by analyzing text and options
- * @param {Object} question - Question object with text and options
- * @returns {boolean} - True if question contains gaps and encoded options
+ * Check if a question is a fill-in-the-gap type
+ * @param {Object} question - Question object with type, text and options
+ * @returns {boolean} - True for 'fill_gap' questions or ones with encoded options
  */
 export function isFillGapQuestion(question) {
+  if (question?.type === 'fill_gap') return true;
   if (!question?.text || typeof question.text !== 'string') return false;
   if (!Array.isArray(question.options) || question.options.length === 0) return false;
   
@@ -73,52 +76,62 @@ export function encodeGapOptions(gapOptions) {
 }
 
 /**
- * Decode flat options array back into per-gap structure
- * @param {Array} options - Flat options array with encoded gap markers
- * @param {string} explanationJSON - JSON string of gap explanations
+ * Per-gap editor state for a saved question
+ * @param {Object} question - Question from the API (or with encoded options)
  * @returns {Array} - Array of gap objects with options and explanations
  */
-export function decodeGapOptions(options, explanationJSON = '') {
-  if (!Array.isArray(options)) return [];
-  
-  const gapMap = new Map();
-  
-  options.forEach((option) => {
-    if (typeof option.text !== 'string') return;
-    const match = option.text.match(/^__G(\d+)__(.*)$/);
-    if (!match) return;
-    const gapIndex = parseInt(match[1], 10);
-    if (!gapMap.has(gapIndex)) {
-      gapMap.set(gapIndex, []);
-    }
-    gapMap.get(gapIndex).push({
-      text: match[2],
-      is_correct: option.is_correct,
-      image_url: option.image_url || '',
-    });
-  });
-  
-  // Parse gap explanations
-  let gapExplanations = {};
-  if (explanationJSON) {
-    try {
-      gapExplanations = JSON.parse(explanationJSON);
-    } catch (e) {
-      // Not JSON, ignore
-    }
+export function decodeGapOptions(question) {
+  return questionGaps(question).map((gap) => ({
+    options: gap.options.map((opt) => ({
+      text: opt.text,
+      is_correct: opt.is_correct,
+      image_url: opt.image_url || '',
+    })),
+    explanation: gap.explanation || '',
+  }));
+}
+
+/**
+ * Per-gap options and explanations of a question
+ * @param {Object} question - Question from the API (or with encoded options)
+ * @returns {Array} - Array of { index, explanation, options } sorted by gap index
+ */
+export function questionGaps(question) {
+  if (Array.isArray(question?.gaps) && question.gaps.length > 0) {
+    return question.gaps;
   }
-  
-  const gapOptions = [];
-  const gapIndices = Array.from(gapMap.keys()).sort((a, b) => a - b);
-  
-  gapIndices.forEach((gapIndex) => {
-    gapOptions.push({
-      options: gapMap.get(gapIndex),
-      explanation: gapExplanations[gapIndex] || '',
-    });
+  const explanations = parseGapExplanations(question?.explanation);
+  const gapMap = groupEncodedOptions(question?.options);
+  return Array.from(gapMap.keys())
+    .sort((a, b) => a - b)
+    .map((gapIndex) => ({
+      index: gapIndex,
+      explanation: explanations[gapIndex] || '',
+      options: gapMap.get(gapIndex).map(({ option, label }) => ({ ...option, text: label })),
+    }));
+}
+
+/**
+ * Map of gapIndex -> explanation for a question
+ * @param {Object} question - Question object
+ * @returns {Object} - Explanations keyed by gap index (gaps without one are omitted)
+ */
+export function gapExplanations(question) {
+  const explanations = {};
+  questionGaps(question).forEach((gap) => {
+    if (gap.explanation) explanations[gap.index] = gap.explanation;
   });
-  
-  return gapOptions;
+  return explanations;
+}
+
+function parseGapExplanations(explanationJSON) {
+  if (!explanationJSON) return {};
+  try {
+    const parsed = JSON.parse(explanationJSON);
+    return parsed && typeof parsed === 'object' ? parsed : {};
+  } catch (e) {
+    return {};
+  }
 }
 
 /**
@@ -133,11 +146,23 @@ export function stripGapMarker(text) {
 }
 
 /**
- * Group options by gap index for display/selection
- * @param {Array} options - Flat options array with gap markers
+ * Group a question's options by gap index for display/selection
+ * @param {Object} question - Question object
  * @returns {Map} - Map of gapIndex -> array of { option, label, globalIndex }
  */
-export function groupOptionsByGap(options) {
+export function groupOptionsByGap(question) {
+  const gapMap = new Map();
+  questionGaps(question).forEach((gap) => {
+    gapMap.set(gap.index, gap.options.map((opt) => ({
+      option: opt,
+      label: opt.text,
+      globalIndex: opt.index,
+    })));
+  });
+  return gapMap;
+}
+
+function groupEncodedOptions(options) {
   const gapMap = new Map();
   
   if (!Array.isArray(options)) return gapMap;